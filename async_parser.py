@@ -0,0 +1,371 @@
+import asyncio
+import logging
+
+from collections import deque
+
+from delta import vacancy_key
+from extractors import extract_vacancy_data, parse_pool
+from sinks import XmlSink
+from vacancy_parser import NordseeParser, PageUnavailable
+
+
+def _import_aiohttp():
+    """
+    Import aiohttp when the first async crawl starts, it is an optional
+    dependency
+    :return: aiohttp module or None when it is not installed
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    return aiohttp
+
+
+class AsyncNordseeParser(NordseeParser):
+    """
+    Parser for https://karriere.nordsee.com running in an asyncio event
+    loop, so one loop runs many crawls at once. Pages are fetched with
+    aiohttp; without aiohttp installed the blocking transport runs in the
+    default executor of the loop instead. The blocking methods of
+    NordseeParser like run and iter_vacancies keep working as well.
+
+        async with AsyncNordseeParser(max_workers=8) as parser:
+            async for vacancy in parser.aiter_vacancies(timeout=600):
+                ...
+    """
+
+    def __init__(self, max_workers=4, session=None, parse_executor=None,
+                 **kwargs):
+        """
+        Initialize parser
+        :param max_workers: max amount of pages fetched at the same time
+        :param session: aiohttp.ClientSession to fetch pages with, by default
+        a session is opened with the parser
+        :param parse_executor: executor to parse detail pages in, by default
+        a process pool of parse_workers processes, or the event loop itself
+        when parse_workers is 0
+        :param kwargs: other NordseeParser arguments, except journal and
+        delta which are not supported here
+        """
+        if kwargs.get('journal') is not None or kwargs.get('delta'):
+            raise ValueError('journal and delta are supported by '
+                             'NordseeParser only')
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.session = session
+        self.parse_executor = parse_executor
+        self._own_session = False
+        self._own_parse_executor = False
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    @property
+    def is_open(self):
+        return self._semaphore is not None
+
+    async def open(self):
+        """
+        Open http session and parse executor
+        """
+        self._semaphore = asyncio.Semaphore(max(self.max_workers, 1))
+        if self.parse_executor is None and self.parse_workers:
+            self.parse_executor = parse_pool(self.parse_workers)
+            self._own_parse_executor = True
+        if self.session is not None:
+            return
+
+        aiohttp = _import_aiohttp()
+        if aiohttp is None:
+            logging.info('aiohttp is not installed, pages are fetched in '
+                         'executor threads')
+            return
+        self.session = aiohttp.ClientSession(
+            headers={'User-Agent':
+                     self.transport.session.headers['User-Agent']},
+            connector=aiohttp.TCPConnector(
+                limit_per_host=max(self.max_workers, 1), ssl=False),
+            timeout=aiohttp.ClientTimeout(total=self.REQUEST_TIMEOUT))
+        self._own_session = True
+
+    async def close(self):
+        """
+        Close http session and parse executor opened by the parser
+        """
+        if self._own_session:
+            await self.session.close()
+            self.session = None
+            self._own_session = False
+        if self._own_parse_executor:
+            self.parse_executor.shutdown(wait=False)
+            self.parse_executor = None
+            self._own_parse_executor = False
+        self._semaphore = None
+
+    async def _get_page_content_async(self, url, params=None):
+        """
+        Awaitable _get_page_content
+        :param url: page url
+        :param params: query params
+        :return: bytes page body or None when the page can not be fetched
+        """
+        async with self._semaphore:
+            if self.session is None:
+                return await asyncio.get_event_loop().run_in_executor(
+                    None, self._get_page_content, url, params)
+
+            with self.metrics.span('get_page_content', url=url,
+                                   params=params):
+                try:
+                    return await self._fetch(url, params)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.metrics.inc('errors', stage='get_page_content')
+                    logging.info('Can not get page {}: {}'.format(url,
+                                                                  str(e)))
+
+    async def _fetch(self, url, params=None):
+        """
+        Make GET request with the aiohttp session when the rate limiter
+        allows it, revalidating cached page when there is a page cache
+        :param url: page url
+        :param params: query params
+        :return: bytes page body
+        """
+        entry = None
+        headers = {}
+        if self.page_cache is not None:
+            url = self.transport.build_url(url, params)
+            params = None
+            entry = await _blocking(self.page_cache.lookup, url)
+            headers = self.page_cache.conditional_headers(entry)
+
+        loop = asyncio.get_event_loop()
+        for _ in range(self.THROTTLED_RETRIES + 1):
+            delay = self.rate_limiter.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = loop.time()
+            async with self.session.get(url, params=params,
+                                        headers=headers) as response:
+                self.metrics.inc('http_requests', status=response.status)
+                if self.rate_limiter.record(
+                        url, response.status, loop.time() - started,
+                        retry_after=response.headers.get('Retry-After')):
+                    continue
+                if response.status == 304 and entry:
+                    self.metrics.inc('cache_hits', cache='page')
+                    await _blocking(self.page_cache.touch, url)
+                    return entry['body']
+                # error pages are not vacancies
+                response.raise_for_status()
+                content = await response.read()
+                break
+        else:
+            response.raise_for_status()
+
+        self.metrics.inc('http_bytes', len(content))
+        if self.page_cache is not None and response.status == 200:
+            await _blocking(self.page_cache.store, url, content,
+                            response.headers.get('ETag'),
+                            response.headers.get('Last-Modified'))
+        return content
+
+    async def _get_list_page_async(self, page):
+        """
+        Awaitable _get_list_page
+        :param page: int page number
+        :return: list of Vacancy or None when the page can not be fetched
+        """
+        content = await self._get_page_content_async(
+            self.VACANCY_LIST_URL, params=self._page_params(page))
+        if content is None:
+            return None
+        return self._get_common_vacancy_info(page, content=content)
+
+    async def _iter_list_pages_async(self, deadline):
+        """
+        Awaitable _iter_list_pages: the first page gives the pages amount,
+        the remaining pages are fetched concurrently in order
+        :param deadline: loop time when the crawl is over, None for no limit
+        :return: async generator of lists of Vacancy
+        """
+        content = await _until(self._get_page_content_async(
+            self.VACANCY_LIST_URL), deadline)
+        if content is None:
+            raise PageUnavailable(self.VACANCY_LIST_URL)
+        pages_amount, vacancy_info_list = self._get_first_list_page(content)
+        seen = set(vacancy_key(info_item) for info_item in vacancy_info_list)
+        yield vacancy_info_list
+
+        pages = iter(range(1, pages_amount))
+        pending = deque()
+
+        def submit():
+            page = next(pages, None)
+            if page is not None:
+                pending.append((page, asyncio.ensure_future(
+                    self._get_list_page_async(page))))
+
+        for _ in range(max(self.max_workers, 1)):
+            submit()
+        try:
+            while pending:
+                page, task = pending.popleft()
+                new = self._new_list_vacancies(
+                    page, pages_amount, await _until(task, deadline), seen)
+                if new is None:
+                    return
+                if new:
+                    yield new
+                submit()
+        finally:
+            await _cancel(task for _, task in pending)
+
+    async def _get_vacancy_data_async(self, vacancy_url, content):
+        """
+        Parse vacancy page in the parse executor
+        :param vacancy_url: vacancy url
+        :param content: vacancy page content
+        :return: dict with vacancy data
+        """
+        with self.metrics.span('get_vacancy_data', url=vacancy_url):
+            if self.parse_executor is None:
+                vacancy_data = self.extractor.vacancy_data(content)
+            else:
+                vacancy_data = await asyncio.get_event_loop().run_in_executor(
+                    self.parse_executor, extract_vacancy_data,
+                    self.extractor_name, content)
+        logging.info('Vacancy data got: {}'.format(vacancy_url))
+        return vacancy_data
+
+    async def _get_vacancy_async(self, info_item):
+        """
+        Awaitable _get_vacancy
+        :param info_item: Vacancy with common vacancy info
+        :return: Vacancy or None when the page can not be fetched
+        """
+        content = await self._get_page_content_async(info_item['url'])
+        if content is None:
+            self._skip_vacancy(info_item)
+            return None
+
+        vacancy_data = None
+        if self.page_cache is not None:
+            vacancy_data = await _blocking(self._get_cached_vacancy_data,
+                                           info_item, content)
+        if vacancy_data is None:
+            vacancy_data = await self._get_vacancy_data_async(
+                info_item['url'], content)
+            if self.page_cache is not None:
+                await _blocking(self._cache_vacancy_data, info_item, content,
+                                vacancy_data)
+        return self._complete_vacancy(info_item, vacancy_data)
+
+    async def aiter_vacancies(self, queue_size=50, timeout=None):
+        """
+        Lazily crawl vacancies in the order of the vacancy list pages.
+        Closing the generator or cancelling the task consuming it cancels
+        every pending request
+        :param queue_size: max amount of vacancies fetched ahead of the
+        consumer
+        :param timeout: seconds for the whole crawl, asyncio.TimeoutError
+        is raised when they are over, None for no limit
+        :return: async generator of Vacancy
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_event_loop().time() + timeout
+        opened = not self.is_open
+        if opened:
+            await self.open()
+
+        list_pages = self._iter_list_pages_async(deadline)
+        pending = deque()
+        try:
+            async for vacancy_info_list in list_pages:
+                for info_item in vacancy_info_list:
+                    if len(pending) >= queue_size:
+                        vacancy = await _until(pending.popleft(), deadline)
+                        if vacancy is not None:
+                            yield vacancy
+                    pending.append(asyncio.ensure_future(
+                        self._get_vacancy_async(info_item)))
+
+            while pending:
+                vacancy = await _until(pending.popleft(), deadline)
+                if vacancy is not None:
+                    yield vacancy
+        finally:
+            await _cancel(pending)
+            await list_pages.aclose()
+            if opened:
+                await self.close()
+
+    async def run_async(self, sink=None, timeout=None):
+        """
+        Crawl vacancies to sink
+        :param sink: sink to write vacancies to, by default the xml file
+        :param timeout: seconds for the whole crawl, None for no limit
+        :return: sink
+        """
+        if sink is None:
+            sink = XmlSink(self._get_output_filepath())
+
+        vacancies = self.aiter_vacancies(timeout=timeout)
+        try:
+            with self.metrics.span('run'), sink:
+                async for vacancy in vacancies:
+                    sink.write(vacancy)
+        finally:
+            await vacancies.aclose()
+        logging.info('{} vacancies written'.format(sink.count))
+        logging.info('Metrics: {}'.format(self.metrics.write_snapshot()))
+        return sink
+
+
+async def _blocking(func, *args):
+    """
+    Run blocking call like page cache sqlite and file I/O in the default
+    executor, so it does not stop the event loop
+    :param func: callable
+    :param args: positional arguments of func
+    :return: result of func
+    """
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+async def _until(awaitable, deadline):
+    """
+    Await until deadline
+    :param awaitable: coroutine or future
+    :param deadline: loop time, None for no limit
+    :return: result of awaitable
+    """
+    if deadline is None:
+        return await awaitable
+    remaining = deadline - asyncio.get_event_loop().time()
+    if remaining <= 0:
+        # do not leave the coroutine never awaited
+        asyncio.ensure_future(awaitable).cancel()
+        raise asyncio.TimeoutError()
+    return await asyncio.wait_for(awaitable, remaining)
+
+
+async def _cancel(tasks):
+    """
+    Cancel tasks and wait until they are finished
+    :param tasks: iterable of futures
+    """
+    tasks = list(tasks)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
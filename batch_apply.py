@@ -0,0 +1,340 @@
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from cv_cache import CvCache
+from exchanger import get_default_cv_cache
+from extractors import get_identifier
+from http_exchanger import FormExpired, HttpExchanger
+from metrics import Metrics
+from transport import percentile
+
+
+def read_jobs(filepath):
+    """
+    Read applications from json lines file, every line is user data like
+    nordsee_test.json with the `vacancy_url` to apply for
+    :param filepath: path of the json lines file
+    :return: generator of (vacancy_url, user_data)
+    """
+    with open(filepath, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            user_data = json.loads(line)
+            vacancy_url = user_data.pop('vacancy_url', None)
+            if not vacancy_url:
+                raise ValueError('Line {} has no vacancy_url'.format(number))
+            yield vacancy_url, user_data
+
+
+def job_key(vacancy_url, user_data):
+    """
+    Key of application in the ledger.
+    Raises ValueError when the user data has no email
+    :param vacancy_url: url of vacancy page
+    :param user_data: dict with user data
+    :return: tuple (email, vacancy identifier or url)
+    """
+    email = (user_data.get('email') or '').strip().lower()
+    if not email:
+        raise ValueError('Job for {} has no email'.format(vacancy_url))
+    return email, get_identifier(vacancy_url) or vacancy_url
+
+
+class ApplicationLedger:
+    """
+    SQLite ledger of applications keyed by email and vacancy identifier,
+    with the outcome, latency and attempts of each of them. A user is
+    applied for a vacancy once, however often the job is submitted.
+    An application is marked submitting before it is sent, so one the
+    process did not see through is not sent again
+    """
+
+    SUCCESS = 'success'
+    # failed before the application reached the site, or rejected by it
+    ERROR = 'error'
+    # sent without a known outcome, the site may have received it
+    SUBMITTING = 'submitting'
+    UNCERTAIN = 'uncertain'
+
+    def __init__(self, filepath):
+        """
+        Open or create ledger
+        :param filepath: path of the sqlite file
+        """
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filepath, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS applications (
+                email TEXT, vacancy TEXT, vacancy_url TEXT, status TEXT,
+                error TEXT, latency REAL, attempts INTEGER, updated REAL,
+                PRIMARY KEY (email, vacancy));
+        """)
+
+    def get(self, key):
+        """
+        Application of user for vacancy
+        :param key: tuple (email, vacancy) from job_key
+        :return: dict or None when the user did not apply yet
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, error, latency, attempts FROM applications '
+                'WHERE email = ? AND vacancy = ?', key).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('status', 'error', 'latency', 'attempts'), row))
+
+    def mark_submitting(self, key, vacancy_url):
+        """
+        Save that the application is about to be sent
+        :param key: tuple (email, vacancy) from job_key
+        :param vacancy_url: url of vacancy page
+        """
+        with self._lock, self._db:
+            updated = self._db.execute(
+                'UPDATE applications SET vacancy_url = ?, status = ?, '
+                'updated = ? WHERE email = ? AND vacancy = ?',
+                (vacancy_url, self.SUBMITTING, time.time()) + key).rowcount
+            if not updated:
+                self._db.execute(
+                    'INSERT INTO applications VALUES '
+                    '(?, ?, ?, ?, NULL, NULL, 0, ?)',
+                    key + (vacancy_url, self.SUBMITTING, time.time()))
+
+    def record(self, key, vacancy_url, error, latency, status=None):
+        """
+        Save outcome of an attempt to apply
+        :param key: tuple (email, vacancy) from job_key
+        :param vacancy_url: url of vacancy page
+        :param error: str error message or None when the user applied
+        :param latency: seconds the attempt took
+        :param status: status of the application, by default success or
+        error depending on error
+        """
+        if status is None:
+            status = self.ERROR if error else self.SUCCESS
+        with self._lock, self._db:
+            updated = self._db.execute(
+                'UPDATE applications SET vacancy_url = ?, status = ?, '
+                'error = ?, latency = ?, attempts = attempts + 1, '
+                'updated = ? WHERE email = ? AND vacancy = ?',
+                (vacancy_url, status, error, latency, time.time()) +
+                key).rowcount
+            if not updated:
+                self._db.execute(
+                    'INSERT INTO applications VALUES (?, ?, ?, ?, ?, ?, 1, ?)',
+                    key + (vacancy_url, status, error, latency, time.time()))
+
+    def counts(self):
+        """
+        Amount of applications per status
+        :return: dict status -> int
+        """
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT status, COUNT(*) FROM applications GROUP BY status'))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class BatchApplier:
+    """
+    Apply many users for many vacancies over HTTP. Jobs already done
+    according to the ledger and repeated jobs are left out, the rest is
+    grouped by vacancy so the application form of a vacancy is opened
+    once and posted for every user of the group. Groups are processed by
+    `workers` threads with a session each, and the outcome of every job
+    is saved in the ledger as soon as it is known, so running the same
+    batch again does only the outstanding work. Failures before the
+    application was sent are retried, applications which were sent
+    without a known outcome are left for a manual check
+    """
+
+    def __init__(self, ledger, workers=4, max_attempts=3, cv_cache=None,
+                 metrics=None, **exchanger_options):
+        """
+        Init applier
+        :param ledger: ApplicationLedger
+        :param workers: amount of vacancies applied for at the same time
+        :param max_attempts: attempts per job over all runs, after them
+        a failing job is left out
+        :param cv_cache: CvCache to get cv files from
+        :param metrics: Metrics to record applications in
+        :param exchanger_options: HttpExchanger options like fallback
+        """
+        self.ledger = ledger
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.cv_cache = cv_cache
+        self.metrics = metrics or Metrics()
+        self.exchanger_options = exchanger_options
+
+    def plan(self, jobs):
+        """
+        Outstanding jobs grouped by vacancy
+        :param jobs: iterable of (vacancy_url, user_data)
+        :return: tuple (OrderedDict vacancy_url -> list of (key, user_data),
+        dict with amount of done, repeated, exhausted, invalid and
+        uncertain jobs)
+        """
+        groups = OrderedDict()
+        skipped = {'done': 0, 'duplicate': 0, 'exhausted': 0, 'invalid': 0,
+                   'uncertain': 0}
+        seen = set()
+        for vacancy_url, user_data in jobs:
+            try:
+                key = job_key(vacancy_url, user_data)
+            except ValueError as e:
+                logging.info('Can not apply for job: {}'.format(str(e)))
+                skipped['invalid'] += 1
+                continue
+            if key in seen:
+                skipped['duplicate'] += 1
+                continue
+            seen.add(key)
+
+            application = self.ledger.get(key)
+            if application is not None:
+                if application['status'] == ApplicationLedger.SUCCESS:
+                    skipped['done'] += 1
+                    continue
+                if application['status'] in (ApplicationLedger.SUBMITTING,
+                                             ApplicationLedger.UNCERTAIN):
+                    logging.info('Application of {} for {} may have been '
+                                 'sent, check it by hand'.format(*key))
+                    skipped['uncertain'] += 1
+                    continue
+                if application['attempts'] >= self.max_attempts:
+                    skipped['exhausted'] += 1
+                    continue
+            groups.setdefault(vacancy_url, []).append((key, user_data))
+        return groups, skipped
+
+    def _apply(self, key, vacancy_url, user_data, session, form):
+        """
+        Apply for one job, marking it submitting in the ledger before the
+        application is sent
+        :return: tuple (str error or None, float latency, form to reuse
+        for the next job or None, True when the site rejected the form
+        itself, ledger status)
+        """
+        started = time.perf_counter()
+        exchanger = HttpExchanger(
+            vacancy_url, user_data, session=session, cv_cache=self.cv_cache,
+            metrics=self.metrics, form=form,
+            on_submit=lambda: self.ledger.mark_submitting(key, vacancy_url),
+            **self.exchanger_options)
+        expired = False
+        status = None
+        try:
+            exchanger.run()
+            error = exchanger.error
+        except FormExpired as e:
+            logging.info('Form expired: {}'.format(str(e)))
+            error = str(e)
+            expired = True
+        except Exception as e:
+            logging.info('Can not apply for job: {}'.format(str(e)))
+            error = str(e) or e.__class__.__name__
+            if exchanger.submitted:
+                # the site may have received the application
+                status = ApplicationLedger.UNCERTAIN
+        latency = time.perf_counter() - started
+        form = None if exchanger.used_browser or expired else exchanger.form
+        return error, latency, form, expired, status
+
+    def _apply_group(self, vacancy_url, group):
+        """
+        Apply every user of a group for the vacancy, reusing its form,
+        and save the outcome of every job
+        :return: list of (error, latency)
+        """
+        results = []
+        with requests.Session() as session:
+            form = None
+            for key, user_data in group:
+                reused = form is not None
+                error, latency, form, expired, status = self._apply(
+                    key, vacancy_url, user_data, session, form)
+                if expired and reused:
+                    # nothing was submitted with the stale form, try a
+                    # fresh one
+                    error, latency, form, _, status = self._apply(
+                        key, vacancy_url, user_data, session, None)
+                self.ledger.record(key, vacancy_url, error, latency, status)
+                results.append((error, latency))
+        return results
+
+    def run(self, jobs):
+        """
+        Apply for outstanding jobs
+        :param jobs: iterable of (vacancy_url, user_data)
+        :return: dict with amounts of jobs, time and latency
+        """
+        started = time.perf_counter()
+        if self.cv_cache is None:
+            self.cv_cache = get_default_cv_cache()
+        groups, skipped = self.plan(jobs)
+        logging.info('Applying for {} vacancies'.format(len(groups)))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = [result for group_results in executor.map(
+                lambda item: self._apply_group(*item), groups.items())
+                for result in group_results]
+        seconds = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        summary = {
+            'vacancies': len(groups),
+            'applied': len(results),
+            'succeeded': sum(1 for error, _ in results if not error),
+            'failed': sum(1 for error, _ in results if error),
+            'seconds': seconds,
+            'latency': {
+                'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+            },
+        }
+        summary.update(skipped)
+        return summary
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename='logs.log', level=logging.INFO)
+
+    arg_parser = argparse.ArgumentParser(
+        description='Apply many users for Nordsee vacancies')
+    arg_parser.add_argument('jobs', metavar='JOBS',
+                            help='json lines file, every line is user data '
+                                 'with vacancy_url')
+    arg_parser.add_argument('--ledger', default='applications.sqlite',
+                            help='sqlite ledger of applications')
+    arg_parser.add_argument('--workers', type=int, default=4,
+                            help='amount of vacancies applied for at once')
+    arg_parser.add_argument('--max-attempts', type=int, default=3,
+                            help='attempts per job over all runs')
+    arg_parser.add_argument('--cv-dir', metavar='PATH',
+                            help='directory to cache cv files in')
+    args = arg_parser.parse_args()
+
+    ledger = ApplicationLedger(args.ledger)
+    try:
+        applier = BatchApplier(
+            ledger, workers=args.workers, max_attempts=args.max_attempts,
+            cv_cache=CvCache(args.cv_dir) if args.cv_dir else None)
+        print(json.dumps(applier.run(read_jobs(args.jobs)), indent=2))
+    finally:
+        ledger.close()
@@ -0,0 +1,62 @@
+"""
+Measure how crawl wall-clock time scales with NordseeParser.max_workers
+
+    $ python -m benchmarks.concurrency --vacancies 200 --latency 0.05
+"""
+import argparse
+import sys
+import time
+
+sys.path.append('.')
+
+from benchmarks.stub_site import StubSiteServer
+from vacancy_parser import NordseeParser
+
+
+def measure(list_url, max_workers, rate_limit=None):
+    """
+    Crawl the stub site once
+    :param list_url: url of the stub vacancy list
+    :param max_workers: parser concurrency
+    :param rate_limit: requests per second per host
+    :return: tuple (seconds, seconds to first vacancy, vacancies amount)
+    """
+    parser = NordseeParser(max_workers=max_workers, rate_limit=rate_limit)
+    parser.VACANCY_LIST_URL = list_url
+    started = time.perf_counter()
+    first = None
+    amount = 0
+    for _ in parser.iter_vacancies():
+        if first is None:
+            first = time.perf_counter() - started
+        amount += 1
+    return time.perf_counter() - started, first, amount
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, default=200)
+    arg_parser.add_argument('--latency', type=float, default=0.05,
+                            help='server delay per request in seconds')
+    arg_parser.add_argument('--workers', type=int, nargs='+',
+                            default=[1, 2, 4, 8, 16, 32])
+    arg_parser.add_argument('--rate-limit', type=float, default=None)
+    args = arg_parser.parse_args()
+
+    with StubSiteServer(args.vacancies, args.latency) as server:
+        print('{:>8} {:>10} {:>8} {:>12} {:>9}'.format(
+            'workers', 'seconds', 'first', 'pages/sec', 'speedup'))
+        baseline = None
+        for workers in args.workers:
+            seconds, first, amount = measure(server.list_url, workers,
+                                             args.rate_limit)
+            # list page for pages amount + list pages + detail pages
+            pages = 1 + -(-amount // 20) + amount
+            baseline = baseline or seconds
+            print('{:>8} {:>10.2f} {:>8.2f} {:>12.1f} {:>8.1f}x'.format(
+                workers, seconds, first, pages / seconds,
+                baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare applying with a new browser per application against a pool of
+warm browsers, on the application form of the local stub site.
+Needs Chrome and the driver from exchanger.get_driver_path()
+
+    $ python -m benchmarks.exchanger_pool --applications 20 --browsers 2 4
+"""
+import argparse
+import json
+import sys
+import time
+
+sys.path.append('.')
+
+from benchmarks.stub_site import CV_PATH, StubSiteServer, vacancy_path
+from exchanger import Exchanger
+from exchanger_pool import ExchangerPool
+
+TEST_DATA_FILENAME = 'nordsee_test.json'
+
+
+def build_jobs(server, amount):
+    """
+    Applications to the stub site
+    :param server: StubSiteServer
+    :param amount: amount of applications
+    :return: list of (vacancy_url, user_data)
+    """
+    with open(TEST_DATA_FILENAME) as f:
+        user_data = json.load(f)
+    user_data['cv_path'] = server.base_url + CV_PATH
+    return [(server.base_url + vacancy_path(number), user_data)
+            for number in range(amount)]
+
+
+def measure_cold(jobs):
+    """
+    Apply with a new browser per application, like Exchanger.run does
+    :return: float applications per minute
+    """
+    started = time.perf_counter()
+    for vacancy_url, user_data in jobs:
+        Exchanger(vacancy_url, user_data).run()
+    return len(jobs) * 60.0 / (time.perf_counter() - started)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--applications', type=int, default=20)
+    arg_parser.add_argument('--browsers', type=int, nargs='+', default=[1, 2, 4])
+    arg_parser.add_argument('--skip-cold', action='store_true')
+    args = arg_parser.parse_args()
+
+    with StubSiteServer(vacancies_amount=args.applications) as server:
+        jobs = build_jobs(server, args.applications)
+        if not args.skip_cold:
+            print('new browser per application: {:.1f} applications/min'.format(
+                measure_cold(jobs)))
+
+        for size in args.browsers:
+            pool = ExchangerPool(size=size)
+            pool.run(jobs)
+            stats = pool.stats()
+            print('pool of {} browsers: {:.1f} applications/min, '
+                  'latency p50 {:.2f}s p95 {:.2f}s, {} failed'.format(
+                      size, stats['applications_per_minute'],
+                      stats['latency']['p50'], stats['latency']['p95'],
+                      stats['failed']))
+        print('submitted: {}'.format(len(server.applications)))
+
+
+if __name__ == '__main__':
+    main()
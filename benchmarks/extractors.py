@@ -0,0 +1,93 @@
+"""
+Compare html extraction backends on saved fixture pages.
+Uses pages saved by tests/parser_test.py if present, otherwise pages
+rendered by the stub site, with a detail page of `--paragraphs` list
+items to measure large pages
+
+    $ python -m benchmarks.extractors --repeat 200
+    $ python -m benchmarks.extractors --repeat 20 --paragraphs 2000 --rendered
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append('.')
+
+from benchmarks.stub_site import render_detail_page, render_list_page
+from extractors import EXTRACTORS
+
+PAGES_DIR = os.path.join('tests', 'pages')
+
+
+def load_fixtures(pages_dir=PAGES_DIR, paragraphs=50):
+    """
+    Load list and detail fixture pages
+    :param pages_dir: directory with saved pages, None to render pages
+    :param paragraphs: list items of the rendered detail page
+    :return: dict page type -> bytes
+    """
+    list_path = os.path.join(pages_dir or '', 'vacancy_list.html')
+    detail_path = os.path.join(pages_dir or '', 'vacancy_info.html')
+    if (pages_dir and os.path.exists(list_path) and
+            os.path.exists(detail_path)):
+        with open(list_path, 'rb') as list_file, \
+                open(detail_path, 'rb') as detail_file:
+            return {'list': list_file.read(), 'detail': detail_file.read()}
+
+    return {
+        'list': render_list_page('https://karriere.nordsee.com',
+                                 1000).encode('utf-8'),
+        'detail': render_detail_page(1, paragraphs=paragraphs).encode(
+            'utf-8'),
+    }
+
+
+def measure(extract, content, repeat):
+    """
+    Extract page `repeat` times
+    :param extract: extractor method
+    :param content: page content
+    :param repeat: amount of runs
+    :return: tuple (pages per second, peak KB allocated per page)
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        extract(content)
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    extract(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return repeat / seconds, peak / 1024.0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--repeat', type=int, default=200)
+    arg_parser.add_argument('--pages-dir', default=PAGES_DIR)
+    arg_parser.add_argument('--rendered', action='store_true',
+                            help='use rendered pages even if saved ones '
+                                 'are present')
+    arg_parser.add_argument('--paragraphs', type=int, default=50,
+                            help='list items of the rendered detail page')
+    args = arg_parser.parse_args()
+
+    fixtures = load_fixtures(None if args.rendered else args.pages_dir,
+                             paragraphs=args.paragraphs)
+    print('{:>8} {:>8} {:>12} {:>14}'.format(
+        'page', 'backend', 'pages/sec', 'peak KB/page'))
+    for page_type, method in (('list', 'common_vacancy_info'),
+                              ('detail', 'vacancy_data')):
+        for name, extractor_class in sorted(EXTRACTORS.items()):
+            extract = getattr(extractor_class(), method)
+            pages_per_second, peak = measure(extract, fixtures[page_type],
+                                             args.repeat)
+            print('{:>8} {:>8} {:>12.1f} {:>14.1f}'.format(
+                page_type, name, pages_per_second, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Compare applying over plain HTTP with applying through headless Chrome
+on the application form of the local stub site: applications per minute
+and memory per worker. The browser path needs Chrome and the driver from
+exchanger.get_driver_path() and is skipped when it can not be launched
+
+    $ python -m benchmarks.http_exchanger --applications 50 --workers 1 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('.')
+
+from benchmarks.exchanger_pool import build_jobs
+from benchmarks.stub_site import StubSiteServer
+from cv_cache import CvCache
+from exchanger import Exchanger
+from exchanger_pool import ExchangerPool
+from http_exchanger import HttpExchanger
+
+
+def process_tree_rss(pid=None):
+    """
+    Resident memory of process and all its children, e.g. chromedriver
+    and Chrome processes
+    :param pid: process id, by default the current one
+    :return: int bytes
+    """
+    pid = pid or os.getpid()
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(name)) as f:
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(name))
+
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        pids.extend(children.get(current, ()))
+        try:
+            with open('/proc/{}/statm'.format(current)) as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+def measure_http(jobs, workers, cv_cache):
+    """
+    Apply with HttpExchanger in worker threads
+    :return: tuple (applications per minute, peak memory bytes)
+    """
+    baseline = process_tree_rss()
+    peak = [baseline]
+
+    def apply(job):
+        HttpExchanger(job[0], job[1], cv_cache=cv_cache,
+                      fallback=False).run()
+        peak[0] = max(peak[0], process_tree_rss())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(apply, jobs))
+    seconds = time.perf_counter() - started
+    return len(jobs) * 60.0 / seconds, peak[0] - baseline
+
+
+def measure_browser(jobs, workers):
+    """
+    Apply with a pool of warm browsers
+    :return: tuple (applications per minute, peak memory bytes)
+    """
+    baseline = process_tree_rss()
+    pool = ExchangerPool(size=workers)
+    with pool:
+        for vacancy_url, user_data in jobs:
+            pool.submit(vacancy_url, user_data)
+        peak = baseline
+        while pool.stats()['jobs'] < len(jobs):
+            peak = max(peak, process_tree_rss())
+            time.sleep(0.2)
+    return pool.stats()['applications_per_minute'], peak - baseline
+
+
+def browser_available():
+    try:
+        Exchanger._setup_browser().quit()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--applications', type=int, default=50)
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help='stub site latency per request in seconds')
+    args = arg_parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    cv_cache = CvCache(cache_dir)
+    with_browser = browser_available()
+    if not with_browser:
+        print('browser path skipped: can not launch Chrome')
+
+    try:
+        with StubSiteServer(vacancies_amount=args.applications,
+                            latency=args.latency) as server:
+            jobs = build_jobs(server, args.applications)
+            for workers in args.workers:
+                rate, memory = measure_http(jobs, workers, cv_cache)
+                print('http, {} workers: {:.1f} applications/min, '
+                      '{:.1f} MB per worker'.format(
+                          workers, rate, memory / workers / 2 ** 20))
+                if with_browser:
+                    rate, memory = measure_browser(jobs, workers)
+                    print('browser, {} workers: {:.1f} applications/min, '
+                          '{:.1f} MB per worker'.format(
+                              workers, rate, memory / workers / 2 ** 20))
+            print('submitted: {}'.format(len(server.applications)))
+    finally:
+        cv_cache.close()
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure detail page parsing throughput with 1 to N worker processes
+
+    $ python -m benchmarks.parse_workers --pages 2000 --backend lxml
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append('.')
+
+from benchmarks.stub_site import render_detail_page
+from extractors import EXTRACTORS, extract_vacancy_data, parse_pool
+
+PAGES_DIR = os.path.join('tests', 'pages')
+
+
+def load_corpus(amount, pages_dir=PAGES_DIR):
+    """
+    Saved detail pages, padded with stub site pages up to `amount`
+    :param amount: amount of pages
+    :param pages_dir: directory with saved detail pages
+    :return: list of bytes
+    """
+    saved = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, 'vacancy_info*.html'))):
+        with open(path, 'rb') as f:
+            saved.append(f.read())
+
+    corpus = []
+    for number in range(amount):
+        if saved:
+            corpus.append(saved[number % len(saved)])
+        else:
+            corpus.append(render_detail_page(number,
+                                             paragraphs=30).encode('utf-8'))
+    return corpus
+
+
+def measure(backend, corpus, workers):
+    """
+    Parse corpus
+    :param backend: extractor name
+    :param corpus: list of pages
+    :param workers: amount of processes, 0 to parse in this process
+    :return: float seconds
+    """
+    started = time.perf_counter()
+    if workers:
+        with parse_pool(workers) as pool:
+            list(pool.map(extract_vacancy_data, [backend] * len(corpus),
+                          corpus, chunksize=16))
+    else:
+        for content in corpus:
+            extract_vacancy_data(backend, content)
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--pages', type=int, default=2000)
+    arg_parser.add_argument('--backend', choices=sorted(EXTRACTORS),
+                            default='lxml')
+    arg_parser.add_argument('--max-workers', type=int,
+                            default=os.cpu_count() or 1)
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus(args.pages)
+    print('cpu count: {}'.format(os.cpu_count()))
+    print('{:>8} {:>10} {:>12} {:>9}'.format(
+        'workers', 'seconds', 'pages/sec', 'speedup'))
+    baseline = None
+    for workers in [0] + list(range(1, args.max_workers + 1)):
+        seconds = measure(args.backend, corpus, workers)
+        baseline = baseline or seconds
+        print('{:>8} {:>10.2f} {:>12.1f} {:>8.1f}x'.format(
+            workers or 'inline', seconds, len(corpus) / seconds,
+            baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare output size and write throughput of every registered output
+format on a synthetic feed of vacancies
+
+    $ python -m benchmarks.serializers --vacancies 20000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append('.')
+
+from benchmarks.xml_memory import synthetic_vacancies
+from sinks import SINKS, create_sink, sink_extension
+
+
+def measure(name, amount, output_dir):
+    """
+    Write vacancies in one format
+    :param name: registered format name
+    :param amount: amount of vacancies
+    :param output_dir: directory to write file to
+    :return: tuple (seconds, file size in bytes)
+    """
+    vacancies = list(synthetic_vacancies(amount))
+    filepath = os.path.join(output_dir,
+                            'nordsee.' + sink_extension(name))
+    started = time.perf_counter()
+    with create_sink(name, filepath) as sink:
+        for vacancy in vacancies:
+            sink.write(vacancy)
+    seconds = time.perf_counter() - started
+    return seconds, os.path.getsize(filepath)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    output_dir = tempfile.mkdtemp()
+    try:
+        print('{:>18} {:>10} {:>9} {:>13} {:>8}'.format(
+            'format', 'MB', 'seconds', 'vacancies/s', 'MB/s'))
+        for name in SINKS:
+            seconds, size = measure(name, args.vacancies, output_dir)
+            print('{:>18} {:>10.2f} {:>9.2f} {:>13.0f} {:>8.1f}'.format(
+                name, size / 1024.0 / 1024.0, seconds,
+                args.vacancies / seconds, size / 1024.0 / 1024.0 / seconds))
+    finally:
+        shutil.rmtree(output_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Measure how a sharded crawl scales with the amount of worker processes,
+every process fetching with its own parser and rate limit
+
+    $ python -m benchmarks.sharded_crawl --vacancies 500 --latency 0.05 --processes 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('.')
+
+from benchmarks.stub_site import StubSiteServer
+from sharded_crawl import ShardWorker, ShardedCrawl, SqliteShardQueue
+from vacancy_parser import NordseeParser
+
+
+def build_parser(list_url, max_workers, rate_limit):
+    parser = NordseeParser(max_workers=max_workers, rate_limit=rate_limit)
+    parser.VACANCY_LIST_URL = list_url
+    return parser
+
+
+def work(queue_path, list_url, max_workers, rate_limit):
+    """
+    Run worker process
+    :return: dict with worker stats
+    """
+    queue = SqliteShardQueue(queue_path)
+    try:
+        return ShardWorker(build_parser(list_url, max_workers, rate_limit),
+                           queue, poll_interval=0.05).run()
+    finally:
+        queue.close()
+
+
+def measure(list_url, processes, max_workers, rate_limit):
+    """
+    Plan, crawl and merge the stub site once
+    :return: tuple (seconds, vacancies amount, list of worker stats)
+    """
+    tmp_dir = tempfile.mkdtemp()
+    queue = SqliteShardQueue(os.path.join(tmp_dir, 'queue.sqlite'))
+    parser = build_parser(list_url, max_workers, rate_limit)
+    parser.OUTPUT_DIR = tmp_dir
+    crawl = ShardedCrawl(parser, queue)
+    started = time.perf_counter()
+    crawl.plan()
+    with multiprocessing.Pool(processes) as pool:
+        stats = pool.starmap(work, [(queue.filepath, list_url, max_workers,
+                                     rate_limit)] * processes)
+    amount = crawl.merge().count
+    seconds = time.perf_counter() - started
+    queue.close()
+    return seconds, amount, stats
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, default=500)
+    arg_parser.add_argument('--latency', type=float, default=0.05,
+                            help='server delay per request in seconds')
+    arg_parser.add_argument('--processes', type=int, nargs='+',
+                            default=[1, 2, 4])
+    arg_parser.add_argument('--workers', type=int, default=4,
+                            help='pages fetched at once by every process')
+    arg_parser.add_argument('--rate-limit', type=float, default=None,
+                            help='requests per second of every process')
+    args = arg_parser.parse_args()
+
+    with StubSiteServer(args.vacancies, args.latency) as server:
+        baseline = None
+        for processes in args.processes:
+            seconds, amount, stats = measure(server.list_url, processes,
+                                             args.workers, args.rate_limit)
+            baseline = baseline or seconds
+            print('{} processes: {:.2f}s, {} vacancies, {:.1f}x, '
+                  'pages/sec per worker: {}'.format(
+                      processes, seconds, amount, baseline / seconds,
+                      ', '.join('{:.1f}'.format(worker['pages_per_second'])
+                                for worker in stats)))
+
+
+if __name__ == '__main__':
+    main()
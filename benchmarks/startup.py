@@ -0,0 +1,90 @@
+"""
+Measure import time of the entry points with `python -X importtime`,
+every import in a fresh interpreter, and list the slowest imports
+
+    $ python -m benchmarks.startup --repeat 5 --top 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ('vacancy_parser', 'exchanger', 'http_exchanger')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """
+    Import module in a fresh interpreter
+    :param module: module name
+    :return: tuple (float wall seconds of the interpreter,
+    list of (cumulative seconds, depth, module name) of every import,
+    ending with the module itself)
+    """
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        check=True)
+    seconds = time.perf_counter() - started
+
+    imports = []
+    for line in process.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((int(cumulative) / 1e6, depth, name.strip()))
+
+    # imports of the module come right before it, the ones before them
+    # are made by the interpreter startup
+    end = next(index for index, item in enumerate(imports)
+               if item[1] == 0 and item[2] == module)
+    start = end
+    while start > 0 and imports[start - 1][1] > 0:
+        start -= 1
+    return seconds, imports[start:end + 1]
+
+
+def measure(module, repeat):
+    """
+    Median import time of module
+    :param module: module name
+    :param repeat: amount of fresh interpreters
+    :return: dict with import and interpreter seconds, and the imports of
+    the last run
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    return {
+        'import_seconds': statistics.median(
+            imports[-1][0] for _, imports in runs),
+        'process_seconds': statistics.median(
+            seconds for seconds, _ in runs),
+        'imports': runs[-1][1],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--modules', nargs='+', default=ENTRY_POINTS)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--top', type=int, default=10,
+                            help='amount of slowest imports to list')
+    args = arg_parser.parse_args()
+
+    for module in args.modules:
+        result = measure(module, args.repeat)
+        print('{}: import {:.1f} ms, interpreter {:.1f} ms'.format(
+            module, result['import_seconds'] * 1000,
+            result['process_seconds'] * 1000))
+        # modules imported directly by the entry point
+        slowest = sorted((item for item in result['imports']
+                          if item[1] == 1), reverse=True)[:args.top]
+        for seconds, _, name in slowest:
+            print('    {:>8.1f} ms  {}'.format(seconds * 1000, name))
+
+
+if __name__ == '__main__':
+    main()
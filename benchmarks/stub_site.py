@@ -0,0 +1,412 @@
+"""
+Local stand-in for https://karriere.nordsee.com used by benchmarks:
+vacancy list, vacancy detail pages and the application form
+"""
+import hashlib
+import random
+import threading
+import time
+
+from collections import Counter, deque
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+LIST_PATH = '/de/stellenangebote.html'
+PAGE_SIZE = 20
+
+LIST_PAGE_TEMPLATE = """<html><body>
+<div class="nav">{nav}</div>
+<table id="joboffers"><tbody>
+{rows}
+</tbody></table>
+</body></html>"""
+
+NAV_ITEM_TEMPLATE = '<span class="nav_item"><a href="?start={start}">{number}</a></span>'
+
+ROW_TEMPLATE = """<tr>
+<td class="real_table_col1"><a href="{url}">Mitarbeiter Restaurant {number}</a></td>
+<td class="real_table_col2">Berlin</td>
+<td class="real_table_col3">NORDSEE</td>
+<td class="real_table_col4">Vollzeit</td>
+</tr>"""
+
+DETAIL_PAGE_TEMPLATE = """<html><body>
+<div class="emp_nr_innerframe">
+<div class="einleitungstext">Einleitung {number}. {filler}</div>
+<div class="mitteltext">Kurzbeschreibung {number}. {filler}</div>
+<div class="trenner"></div>
+<div class="aufgaben"><ul>{items}</ul></div>
+<div class="profil"><p>Profil {number}. {filler}</p></div>
+<div class="abschluss">Abschluss {number}.</div>
+</div>
+<a id="btn_online_application" href="{form_path}">Jetzt bewerben</a>
+</body></html>"""
+
+FORM_TOKEN = 'stub-token'
+
+SELECTS = (
+    ('sex_w', 'anrede', ('Herr', 'Frau')),
+    ('country', 'land', ('Deutschland', 'Österreich')),
+    ('nation', 'nationalitaet', ('EU mit unbefristeter Arbeitserlaubnis',
+                                 'Nicht-EU')),
+    ('wie_gefunden', 'wie_gefunden', ('JobUFO', 'Zeitung')),
+    ('berufsausbildung_m_sb', 'deutsch', ('Fließend', 'Grundkenntnisse')),
+)
+
+REQUIRED_FIELDS = ('vorname', 'nachname', 'strasse', 'plz', 'ort', 'telefon',
+                   'mail', 'geburtsdatum', 'agreement')
+
+# jQuery UI selectmenu and upload behaviour of the real form, without jQuery
+FORM_SCRIPT = """
+document.querySelectorAll('.ui-selectmenu-button').forEach(function (button) {
+  button.addEventListener('click', function () {
+    document.getElementById(button.id.replace('-button', '-menu'))
+      .classList.add('ui-selectmenu-open');
+  });
+});
+document.querySelectorAll('.ui-selectmenu-menu li').forEach(function (item) {
+  item.addEventListener('click', function () {
+    var menu = item.parentNode;
+    var select = document.getElementById(menu.id.replace('-menu', ''));
+    select.value = item.textContent;
+    menu.classList.remove('ui-selectmenu-open');
+  });
+});
+document.getElementById('anlage2').addEventListener('change', function () {
+  var link = document.createElement('a');
+  link.className = 'modal_link';
+  link.textContent = this.files[0].name;
+  document.getElementById('uploads').appendChild(link);
+});
+"""
+
+FORM_PAGE_TEMPLATE = """<html><head><meta charset="utf-8">
+<style>.ui-selectmenu-menu {{ display: none; }}
+.ui-selectmenu-open {{ display: block; }}</style></head><body>
+<form id="bewerbung_form" method="post" action="{action}"
+ enctype="multipart/form-data">
+<input type="hidden" name="bewerbung_form[_token]" value="{token}">
+<input type="hidden" name="bewerbung_form[stelle]" value="{number}">
+<input type="text" name="bewerbung_form[vorname]">
+<input type="text" name="bewerbung_form[nachname]">
+<input type="text" name="bewerbung_form[strasse]">
+<input type="text" name="bewerbung_form[plz]">
+<input type="text" name="bewerbung_form[ort]">
+<input type="text" name="bewerbung_form[telefon]">
+<input type="radio" id="handy" name="bewerbung_form[telefon_typ]" value="handy">
+<input type="text" name="bewerbung_form[mail]">
+<input type="text" name="bewerbung_form[geburtsdatum]">
+{selects}
+<input type="file" id="anlage2" name="anlage2">
+<div id="uploads"></div>
+<div id="agreement"><input type="checkbox" class="agreement_new"
+ name="bewerbung_form[agreement]" value="1"></div>
+<button type="submit" id="btn_online_application_send">Absenden</button>
+</form>
+<script>{script}</script>
+</body></html>"""
+
+SELECT_TEMPLATE = """<select id="{id}" name="bewerbung_form[{name}]">{options}</select>
+<span id="{id}-button" class="ui-selectmenu-button">Bitte wählen</span>
+<ul id="{id}-menu" class="ui-selectmenu-menu">{items}</ul>"""
+
+CV_PATH = '/media/tmp/Lebenslauf.pdf'
+CV_SIZE = 64 * 1024
+
+RESULT_PAGE_TEMPLATE = """<html><body>{message}</body></html>"""
+
+FILLER = 'Wir freuen uns auf Ihre Bewerbung. '
+
+
+def vacancy_path(number):
+    """
+    Path of the vacancy detail page
+    :param number: vacancy number
+    :return: str
+    """
+    return '/de/Mitarbeiter-Restaurant-{0}-in-Berlin-de-j{0}.html'.format(
+        number)
+
+
+def render_list_page(base_url, vacancies_amount, start=0):
+    """
+    Render vacancy list page
+    :param base_url: site url used for detail links
+    :param vacancies_amount: total amount of vacancies
+    :param start: offset of the first vacancy on the page
+    :return: str html
+    """
+    pages_amount = max(1, -(-vacancies_amount // PAGE_SIZE))
+    # offsets past the end show the last page, like the site does
+    start = min(start, (pages_amount - 1) * PAGE_SIZE)
+    nav = ''.join(NAV_ITEM_TEMPLATE.format(start=page * PAGE_SIZE,
+                                           number=page + 1)
+                  for page in range(pages_amount))
+    rows = ''.join(ROW_TEMPLATE.format(url=base_url + vacancy_path(number),
+                                       number=number)
+                   for number in range(start, min(start + PAGE_SIZE,
+                                                  vacancies_amount)))
+    return LIST_PAGE_TEMPLATE.format(nav=nav, rows=rows)
+
+
+def form_path(number):
+    """
+    Path of the application form of vacancy
+    :param number: vacancy number
+    :return: str
+    """
+    return '/de/bewerbung-j{}.html'.format(number)
+
+
+def render_detail_page(number, paragraphs=5):
+    """
+    Render vacancy detail page
+    :param number: vacancy number
+    :param paragraphs: amount of list items in the details section
+    :return: str html
+    """
+    items = ''.join('<li>Aufgabe {}. {}</li>'.format(i, FILLER)
+                    for i in range(paragraphs))
+    return DETAIL_PAGE_TEMPLATE.format(number=number, filler=FILLER * 3,
+                                       items=items,
+                                       form_path=form_path(number))
+
+
+def render_form_page(number):
+    """
+    Render application form of vacancy
+    :param number: vacancy number
+    :return: str html
+    """
+    selects = ''.join(
+        SELECT_TEMPLATE.format(
+            id=select_id, name=name,
+            options=''.join('<option>{}</option>'.format(option)
+                            for option in options),
+            items=''.join('<li>{}</li>'.format(option)
+                          for option in options))
+        for select_id, name, options in SELECTS)
+    return FORM_PAGE_TEMPLATE.format(action=form_path(number), token=FORM_TOKEN,
+                                     number=number, selects=selects,
+                                     script=FORM_SCRIPT)
+
+
+def render_cv(path, size=CV_SIZE):
+    """
+    Render pdf-like cv file, different for every path
+    :param path: file path
+    :param size: approximate file size in bytes
+    :return: bytes
+    """
+    return (b'%PDF-1.4\n% stub cv ' + path.encode('utf-8') + b'\n' +
+            b'0' * size + b'\n%%EOF\n')
+
+
+def parse_form_data(content_type, body):
+    """
+    Parse multipart/form-data request body
+    :param content_type: Content-Type request header
+    :param body: bytes request body
+    :return: tuple (dict of fields, dict of file name -> bytes)
+    """
+    message = BytesParser().parsebytes(
+        'Content-Type: {}\r\n\r\n'.format(content_type).encode('utf-8') +
+        body)
+    fields = {}
+    files = {}
+    for part in message.get_payload() if message.is_multipart() else ():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode('utf-8')
+    return fields, files
+
+
+def check_application(fields, files):
+    """
+    Validate submitted application like the real form does
+    :param fields: dict of submitted fields
+    :param files: dict of uploaded files
+    :return: str error message or None
+    """
+    missing = [name for name in REQUIRED_FIELDS
+               if not fields.get('bewerbung_form[{}]'.format(name))]
+    if missing:
+        return 'Bitte füllen Sie alle Pflichtfelder aus: {}'.format(
+            ', '.join(missing))
+    for select_id, name, options in SELECTS:
+        if fields.get('bewerbung_form[{}]'.format(name)) not in options:
+            return 'Bitte wählen Sie {}'.format(name)
+    if not files.get('anlage2'):
+        return 'Bitte laden Sie Ihren Lebenslauf hoch'
+    return None
+
+
+class StubSiteServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server simulating the career site
+    """
+    daemon_threads = True
+
+    def __init__(self, vacancies_amount=100, latency=0.0, error_rate=0.0,
+                 seed=0, max_rate=None, retry_after=1):
+        """
+        Init server on a free local port
+        :param vacancies_amount: amount of vacancies to serve
+        :param latency: seconds to wait before answering each request
+        :param error_rate: share of page requests answered with 503
+        :param seed: seed of the error injection, so runs are reproducible
+        :param max_rate: page requests per second answered before the
+        site throttles with 429, None for no limit
+        :param retry_after: Retry-After seconds sent with 429
+        """
+        self.vacancies_amount = vacancies_amount
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_rate = max_rate
+        self.retry_after = retry_after
+        self._served = deque()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.status_counts = Counter()
+        self.applications = []
+        super().__init__(('127.0.0.1', 0), StubSiteHandler)
+
+    def inject_error(self):
+        """
+        Whether to fail the current request
+        :return: bool
+        """
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def inject_throttle(self):
+        """
+        Whether the current request is over max_rate within the last second
+        :return: bool
+        """
+        if not self.max_rate:
+            return False
+        with self._random_lock:
+            now = time.monotonic()
+            while self._served and self._served[0] <= now - 1.0:
+                self._served.popleft()
+            if len(self._served) >= self.max_rate:
+                return True
+            self._served.append(now)
+            return False
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    @property
+    def list_url(self):
+        return self.base_url + LIST_PATH
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    """
+    Serve list and detail pages of the stub site
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        content_type = 'text/html; charset=utf-8'
+        if self.server.inject_error():
+            self._send(503, b'Service Unavailable')
+            return
+        if self.server.inject_throttle():
+            self._send(429, b'Too Many Requests',
+                       headers={'Retry-After': str(self.server.retry_after)})
+            return
+        if url.path.startswith('/media/') and url.path.endswith('.pdf'):
+            html = None
+            content_type = 'application/pdf'
+        elif url.path == LIST_PATH:
+            start = int(parse_qs(url.query).get('start', ['0'])[0])
+            html = render_list_page(self.server.base_url,
+                                    self.server.vacancies_amount, start)
+        elif url.path.startswith('/de/bewerbung-j'):
+            html = render_form_page(self._vacancy_number(url.path))
+        elif url.path.endswith('.html') and '-j' in url.path:
+            html = render_detail_page(self._vacancy_number(url.path))
+        else:
+            self.send_error(404)
+            return
+
+        if html is None:
+            body = render_cv(url.path)
+        else:
+            body = html.encode('utf-8')
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, etag=etag, content_type=content_type)
+        else:
+            self._send(200, body, etag=etag, content_type=content_type)
+
+    def do_POST(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        path = urlsplit(self.path).path
+        if not path.startswith('/de/bewerbung-j'):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        fields, files = parse_form_data(self.headers.get('Content-Type', ''),
+                                        self.rfile.read(length))
+        if fields.get('bewerbung_form[_token]') != FORM_TOKEN:
+            # rejected before the application is looked at
+            self._send(419, RESULT_PAGE_TEMPLATE.format(
+                message='Das Formular ist abgelaufen').encode('utf-8'))
+            return
+        error = check_application(fields, files)
+        if error:
+            message = '<div class="error_msg">{}</div>'.format(error)
+        else:
+            self.server.applications.append((fields, files))
+            message = '<div class="success_msg">Vielen Dank</div>'
+        self._send(200, RESULT_PAGE_TEMPLATE.format(
+            message=message).encode('utf-8'))
+
+    @staticmethod
+    def _vacancy_number(path):
+        return int(path.rsplit('-j', 1)[1][:-len('.html')])
+
+    def _send(self, status, body=b'', etag=None,
+              content_type='text/html; charset=utf-8', headers=None):
+        self.server.status_counts[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if etag:
+            self.send_header('ETag', etag)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
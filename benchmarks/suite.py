@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark suite against the local stub of the career site:
+crawl time, pages per second and peak RSS of a full crawl,
+applications per minute of the HTTP and browser submitters, and
+import time of the entry points.
+Every scenario runs in a fresh process, so peak RSS is its own.
+Results are saved as json to compare them across commits
+
+    $ python -m benchmarks.suite --vacancies 500 --latency 0.02 --error-rate 0.01
+    $ python -m benchmarks.suite --compare benchmarks/results/1a2b3c4.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('.')
+
+from benchmarks.exchanger_pool import build_jobs
+from benchmarks.stub_site import StubSiteServer
+
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+
+# metrics compared between runs, True when higher is better
+COMPARED = {
+    'seconds': False,
+    'pages_per_second': True,
+    'applications_per_minute': True,
+    'peak_rss': False,
+    'import_seconds': False,
+}
+
+
+def peak_rss():
+    """
+    Peak resident memory of the current process and its finished children
+    :return: int bytes
+    """
+    # kilobytes on Linux
+    return 1024 * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def server_options(config):
+    return {'vacancies_amount': config['vacancies'],
+            'latency': config['latency'],
+            'error_rate': config['error_rate'],
+            'seed': config['seed']}
+
+
+def bench_crawl(config):
+    """
+    Crawl the whole stub site and stream vacancies to xml
+    :param config: dict of suite options
+    :return: dict with results
+    """
+    from sinks import XmlSink
+    from vacancy_parser import NordseeParser
+
+    with StubSiteServer(**server_options(config)) as server:
+        parser = NordseeParser(max_workers=config['workers'],
+                               extractor=config['extractor'])
+        parser.VACANCY_LIST_URL = server.list_url
+        parser.OUTPUT_DIR = tempfile.mkdtemp()
+        started = time.perf_counter()
+        vacancies = parser._write_to_sink(
+            parser.iter_vacancies(),
+            XmlSink(parser._get_output_filepath())).count
+        seconds = time.perf_counter() - started
+        pages = server.status_counts[200]
+        requests = sum(server.status_counts.values())
+
+    return {
+        'seconds': seconds,
+        'vacancies': vacancies,
+        'pages': pages,
+        'requests': requests,
+        'pages_per_second': pages / seconds if seconds else 0.0,
+    }
+
+
+def bench_apply_http(config):
+    """
+    Apply for every stub vacancy over plain HTTP
+    :param config: dict of suite options
+    :return: dict with results
+    """
+    from cv_cache import CvCache
+    from http_exchanger import HttpExchanger
+
+    cv_cache = CvCache(tempfile.mkdtemp())
+    with StubSiteServer(**server_options(config)) as server:
+        jobs = build_jobs(server, config['applications'])
+
+        def apply(job):
+            exchanger = HttpExchanger(job[0], job[1], cv_cache=cv_cache,
+                                      fallback=False)
+            try:
+                exchanger.run()
+            except Exception as e:
+                return str(e) or e.__class__.__name__
+            return exchanger.error
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config['workers']) as executor:
+            errors = list(executor.map(apply, jobs))
+        seconds = time.perf_counter() - started
+
+    return {
+        'seconds': seconds,
+        'applications': len(jobs),
+        'failed': sum(1 for error in errors if error),
+        'applications_per_minute': len(jobs) * 60.0 / seconds,
+    }
+
+
+def bench_apply_browser(config):
+    """
+    Apply for every stub vacancy with a pool of warm browsers
+    :param config: dict of suite options
+    :return: dict with results, or None when Chrome can not be launched
+    """
+    from exchanger import Exchanger
+    from exchanger_pool import ExchangerPool
+
+    try:
+        Exchanger._setup_browser().quit()
+    except Exception:
+        return None
+
+    with StubSiteServer(**server_options(config)) as server:
+        pool = ExchangerPool(size=config['workers'])
+        pool.run(build_jobs(server, config['applications']))
+        stats = pool.stats()
+
+    return {
+        'seconds': stats['seconds'],
+        'applications': stats['jobs'],
+        'failed': stats['failed'],
+        'applications_per_minute': stats['applications_per_minute'],
+    }
+
+
+def bench_startup(config):
+    """
+    Import the entry points, every one in a fresh interpreter
+    :param config: dict of suite options
+    :return: dict with results
+    """
+    from benchmarks.startup import ENTRY_POINTS, measure
+
+    result = {}
+    for module in ENTRY_POINTS:
+        result['{}_import_seconds'.format(module)] = measure(
+            module, repeat=5)['import_seconds']
+    result['import_seconds'] = sum(result.values())
+    return result
+
+
+SCENARIOS = {
+    'crawl': bench_crawl,
+    'apply_http': bench_apply_http,
+    'apply_browser': bench_apply_browser,
+    'startup': bench_startup,
+}
+
+
+def run_single(name, config):
+    """
+    Run scenario in this process and print result as json
+    :param name: key of SCENARIOS
+    :param config: dict of suite options
+    """
+    result = SCENARIOS[name](config)
+    if result is not None:
+        result['peak_rss'] = peak_rss()
+    print(json.dumps(result))
+
+
+def run_scenario(name, config):
+    """
+    Run scenario in a fresh process
+    :param name: key of SCENARIOS
+    :param config: dict of suite options
+    :return: dict with results or None when skipped
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'benchmarks.suite', '--single', name,
+         json.dumps(config)])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(previous, current):
+    """
+    Print change of compared metrics between two runs
+    :param previous: dict with saved results
+    :param current: dict with new results
+    """
+    print('compared with {} ({})'.format(previous['commit'],
+                                         previous['created']))
+    for name, result in sorted(current['results'].items()):
+        old = previous['results'].get(name)
+        if not result or not old:
+            continue
+        for metric, higher_is_better in sorted(COMPARED.items()):
+            if metric not in result or not old.get(metric):
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            better = change > 0 if higher_is_better else change < 0
+            print('{:>14} {:>24} {:>14.2f} -> {:>14.2f} {:>+8.1%} {}'.format(
+                name, metric, old[metric], result[metric], change,
+                'better' if better else 'worse' if change else ''))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, default=500)
+    arg_parser.add_argument('--applications', type=int, default=100)
+    arg_parser.add_argument('--workers', type=int, default=4)
+    arg_parser.add_argument('--extractor', default='lxml')
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help='stub site latency per request in seconds')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='share of page requests answered with 503')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS),
+                            default=sorted(SCENARIOS))
+    arg_parser.add_argument('--output', metavar='PATH',
+                            help='results file, by default '
+                                 'benchmarks/results/<commit>.json')
+    arg_parser.add_argument('--compare', metavar='PATH',
+                            help='saved results to compare with')
+    arg_parser.add_argument('--single', nargs=2, metavar=('NAME', 'CONFIG'),
+                            help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.single:
+        run_single(args.single[0], json.loads(args.single[1]))
+        return
+
+    config = {
+        'vacancies': args.vacancies,
+        'applications': args.applications,
+        'workers': args.workers,
+        'extractor': args.extractor,
+        'latency': args.latency,
+        'error_rate': args.error_rate,
+        'seed': args.seed,
+    }
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'config': config,
+        'results': {},
+    }
+    for name in args.scenarios:
+        result = report['results'][name] = run_scenario(name, config)
+        if result is None:
+            print('{}: skipped'.format(name))
+        else:
+            print('{}: {}'.format(name, ', '.join(
+                '{} {}'.format(key, round(value, 2))
+                for key, value in sorted(result.items()))))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, '{}.json'.format(report['commit']))
+    if os.path.dirname(output) and not os.path.exists(
+            os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('saved to {}'.format(output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare per-call requests.get with the pooled keep-alive Transport
+
+    $ python -m benchmarks.transport --requests 500 --workers 8
+"""
+import argparse
+import json
+import sys
+import time
+
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('.')
+
+from benchmarks.stub_site import StubSiteServer, vacancy_path
+from transport import Transport
+
+
+def measure(fetch, urls, workers):
+    """
+    Fetch all urls
+    :param fetch: callable taking url
+    :param urls: list of urls
+    :param workers: amount of threads
+    :return: float seconds
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, urls))
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--requests', type=int, default=500)
+    arg_parser.add_argument('--workers', type=int, default=8)
+    arg_parser.add_argument('--latency', type=float, default=0.0)
+    args = arg_parser.parse_args()
+
+    with StubSiteServer(latency=args.latency) as server:
+        urls = [server.base_url + vacancy_path(i)
+                for i in range(args.requests)]
+
+        per_call = measure(lambda url: requests.get(url).content, urls,
+                           args.workers)
+        transport = Transport(pool_maxsize=args.workers)
+        pooled = measure(lambda url: transport.get(url).content, urls,
+                         args.workers)
+        transport.close()
+
+    print('requests.get per call: {:.2f}s ({:.0f} req/s)'.format(
+        per_call, args.requests / per_call))
+    print('pooled transport:      {:.2f}s ({:.0f} req/s)'.format(
+        pooled, args.requests / pooled))
+    print(json.dumps(transport.stats.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
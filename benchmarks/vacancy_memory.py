@@ -0,0 +1,125 @@
+"""
+Compare memory of keeping parsed vacancies as merged dicts (common info
+dict updated into the vacancy data dict) with Vacancy records, plain and
+with compressed descriptions, on synthetic vacancies
+
+    $ python -m benchmarks.vacancy_memory --vacancies 100000
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+sys.path.append('.')
+
+from vacancy import Vacancy
+
+TITLES = ('Mitarbeiter Restaurant', 'Verkäufer', 'Koch', 'Filialleiter')
+LOCATIONS = ('Berlin', 'Hamburg', 'München', 'Köln', 'Bremen')
+POSITIONS = ('Vollzeit', 'Teilzeit', 'Minijob')
+SECTION = 'Wir freuen uns auf Ihre Bewerbung. '
+
+
+def fresh(text):
+    """
+    New string object, like one parsed from a page
+    :param text: str
+    :return: str equal to text, not identical to it
+    """
+    return (text + '.')[:-1]
+
+
+def parsed_fields(number):
+    """
+    Fields of one vacancy as the extractors produce them
+    :param number: vacancy number
+    :return: tuple (common info dict, description)
+    """
+    info = {
+        'url': 'https://karriere.nordsee.com/de/Job-{0}-de-j{0}.html'.format(
+            number),
+        'identifier': str(number),
+        'title': fresh(TITLES[number % len(TITLES)]),
+        'location': fresh(LOCATIONS[number % len(LOCATIONS)]),
+        'position': fresh(POSITIONS[number % len(POSITIONS)]),
+    }
+    sections = ('Einleitung {}. '.format(number), SECTION * 10,
+                SECTION * 20, 'Abschluss {}.'.format(number))
+    return info, sections
+
+
+def build_dicts(amount):
+    vacancies = []
+    for number in range(amount):
+        info, sections = parsed_fields(number)
+        introduction, short_description, details, conclusion = sections
+        vacancy_data = {
+            'description': introduction + short_description + details +
+                           conclusion
+        }
+        vacancy_data.update(info)
+        vacancies.append(vacancy_data)
+    return vacancies
+
+
+def build_records(amount, compress=False):
+    vacancies = []
+    for number in range(amount):
+        info, sections = parsed_fields(number)
+        vacancy = Vacancy(**info)
+        vacancy.set_description(''.join(sections), compress=compress)
+        vacancies.append(vacancy)
+    return vacancies
+
+
+MODES = {
+    'dict': build_dicts,
+    'vacancy': build_records,
+    'vacancy_compressed': lambda amount: build_records(amount, compress=True),
+}
+
+
+def measure(build, amount):
+    """
+    Build vacancies under tracemalloc
+    :return: tuple (seconds, bytes held by the built vacancies)
+    """
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    vacancies = build(amount)
+    seconds = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del vacancies
+    return seconds, held
+
+
+def description_size(amount):
+    """
+    Bytes of the description strings themselves, same in every mode
+    """
+    return sum(sys.getsizeof(''.join(parsed_fields(number)[1]))
+               for number in range(amount))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    amount = args.vacancies
+    text = description_size(amount)
+    print('{:>20} {:>9} {:>10} {:>14} {:>22}'.format(
+        'mode', 'seconds', 'total MB', 'bytes/vacancy',
+        'overhead bytes/vacancy'))
+    for mode, build in sorted(MODES.items()):
+        seconds, held = measure(build, amount)
+        print('{:>20} {:>9.2f} {:>10.1f} {:>14.0f} {:>22.0f}'.format(
+            mode, seconds, held / 2 ** 20, held / amount,
+            (held - text) / amount))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare memory of building the whole xml tree with streaming every
+position to file, on a synthetic feed of vacancies.
+tracemalloc only sees Python allocations, libxml2 tree memory shows up
+in peak RSS, so every measurement runs in a fresh process
+
+    $ python -m benchmarks.xml_memory --vacancies 10000 100000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append('.')
+
+from vacancy_parser import NordseeParser
+
+DESCRIPTION = 'Wir freuen uns auf Ihre Bewerbung. ' * 40
+
+
+def synthetic_vacancies(amount):
+    """
+    Generate vacancies like the ones parsed from the site
+    :param amount: amount of vacancies
+    :return: generator of dicts
+    """
+    for number in range(amount):
+        yield {
+            'url': 'https://karriere.nordsee.com/de/Job-{0}-de-j{0}.html'.format(
+                number),
+            'identifier': str(number),
+            'title': 'Mitarbeiter Restaurant {}'.format(number),
+            'location': 'Berlin',
+            'position': 'Vollzeit',
+            'description': DESCRIPTION + str(number),
+        }
+
+
+def measure(write, amount):
+    """
+    Run writer under tracemalloc
+    :param write: callable taking vacancies generator
+    :param amount: amount of vacancies
+    :return: tuple (seconds, peak bytes)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    write(synthetic_vacancies(amount))
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def run_single(mode, amount):
+    """
+    Measure one mode and print result as json
+    :param mode: 'tree' or 'stream'
+    :param amount: amount of vacancies
+    """
+    parser = NordseeParser()
+    parser.OUTPUT_DIR = tempfile.mkdtemp()
+    if mode == 'tree':
+        write = lambda vacancies: parser._save_to_xml(list(vacancies))
+    else:
+        write = parser._stream_to_xml
+
+    seconds, peak = measure(write, amount)
+    print(json.dumps({
+        'seconds': seconds,
+        'tracemalloc_peak': peak,
+        # kilobytes on Linux
+        'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--vacancies', type=int, nargs='+',
+                            default=[10000, 50000, 100000])
+    arg_parser.add_argument('--single', nargs=2, metavar=('MODE', 'AMOUNT'),
+                            help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.single:
+        run_single(args.single[0], int(args.single[1]))
+        return
+
+    print('{:>10} {:>8} {:>9} {:>17} {:>12}'.format(
+        'vacancies', 'mode', 'seconds', 'tracemalloc MB', 'peak RSS MB'))
+    for amount in args.vacancies:
+        for mode in ('tree', 'stream'):
+            output = subprocess.check_output(
+                [sys.executable, '-m', 'benchmarks.xml_memory',
+                 '--single', mode, str(amount)])
+            result = json.loads(output.decode().strip().splitlines()[-1])
+            print('{:>10} {:>8} {:>9.2f} {:>17.2f} {:>12.1f}'.format(
+                amount, mode, result['seconds'],
+                result['tracemalloc_peak'] / 1024.0 / 1024.0,
+                result['max_rss'] / 1024.0 / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import gzip
+
+from importlib.util import find_spec
+
+# compression name -> file name suffix
+SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def available(compression):
+    """
+    Whether compression can be used here
+    :param compression: None, 'gzip' or 'zstd'
+    :return: bool
+    """
+    return compression != 'zstd' or find_spec('zstandard') is not None
+
+
+def _import_zstandard(purpose):
+    """
+    Import zstandard when a zstd file is opened, it is an optional
+    dependency and slow to import at startup
+    :param purpose: 'output' or 'input' for the error message
+    :return: zstandard module
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd {} needs the zstandard package, install '
+                          'it with make requirements-zstd'.format(purpose))
+    return zstandard
+
+
+def open_output(filepath, compression=None, level=None):
+    """
+    Open binary file for writing, compressing everything written to it
+    in the same pass
+    :param filepath: file path
+    :param compression: None, 'gzip' or 'zstd'
+    :param level: compression level, by default a fast one
+    :return: writable binary file object
+    """
+    if compression is None:
+        return open(filepath, 'wb')
+    if compression == 'gzip':
+        return gzip.open(filepath, 'wb',
+                         compresslevel=6 if level is None else level)
+    if compression == 'zstd':
+        zstandard = _import_zstandard('output')
+        compressor = zstandard.ZstdCompressor(
+            level=3 if level is None else level)
+        return compressor.stream_writer(open(filepath, 'wb'))
+    raise ValueError('Unknown compression {}'.format(compression))
+
+
+def open_input(filepath, compression=None):
+    """
+    Open file written by open_output for reading
+    :param filepath: file path
+    :param compression: None, 'gzip' or 'zstd'
+    :return: readable binary file object
+    """
+    if compression is None:
+        return open(filepath, 'rb')
+    if compression == 'gzip':
+        return gzip.open(filepath, 'rb')
+    if compression == 'zstd':
+        zstandard = _import_zstandard('input')
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(filepath, 'rb'))
+    raise ValueError('Unknown compression {}'.format(compression))
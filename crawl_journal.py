@@ -0,0 +1,304 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from vacancy import Vacancy
+
+
+class CrawlJournal:
+    """
+    SQLite journal of a crawl in progress: the amount of list pages,
+    vacancies of every finished list page, every finished vacancy and
+    pages which could not be fetched yet. A crawl that stopped half way
+    resumes from it instead of starting from page 0
+    """
+
+    def __init__(self, filepath):
+        """
+        Open or create journal
+        :param filepath: path of the sqlite file
+        """
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filepath, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS pages (
+                page INTEGER PRIMARY KEY, vacancies TEXT);
+            CREATE TABLE IF NOT EXISTS vacancies (
+                url TEXT PRIMARY KEY, data TEXT);
+            CREATE TABLE IF NOT EXISTS failures (
+                url TEXT PRIMARY KEY, kind TEXT, attempts INTEGER,
+                error TEXT);
+        """)
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                                   (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                             (key, json.dumps(value)))
+
+    def get_page(self, page):
+        """
+        Vacancies of finished list page
+        :param page: int page number
+        :return: list of Vacancy or None when the page is not finished
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT vacancies FROM pages WHERE page = ?',
+                (page,)).fetchone()
+        if row is None:
+            return None
+        return [Vacancy.from_dict(data) for data in json.loads(row[0])]
+
+    def save_page(self, page, url, vacancies):
+        """
+        Mark list page finished
+        :param page: int page number
+        :param url: page url
+        :param vacancies: list of Vacancy from the page
+        """
+        data = json.dumps([dict(vacancy) for vacancy in vacancies],
+                          ensure_ascii=False)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?)',
+                             (page, data))
+            self._db.execute('DELETE FROM failures WHERE url = ?', (url,))
+
+    def get_vacancy(self, url):
+        """
+        Finished vacancy
+        :param url: vacancy url
+        :return: Vacancy or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM vacancies WHERE url = ?', (url,)).fetchone()
+        return Vacancy.from_dict(json.loads(row[0])) if row else None
+
+    def save_vacancy(self, vacancy):
+        """
+        Mark vacancy finished
+        :param vacancy: Vacancy
+        """
+        data = json.dumps(dict(vacancy), ensure_ascii=False)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO vacancies VALUES (?, ?)',
+                             (vacancy['url'], data))
+            self._db.execute('DELETE FROM failures WHERE url = ?',
+                             (vacancy['url'],))
+
+    def record_failure(self, url, kind, error=None):
+        """
+        Remember page which could not be fetched
+        :param url: page url
+        :param kind: 'list_page' or 'vacancy'
+        :param error: error description
+        """
+        with self._lock, self._db:
+            updated = self._db.execute(
+                'UPDATE failures SET attempts = attempts + 1, error = ? '
+                'WHERE url = ?', (error, url)).rowcount
+            if not updated:
+                self._db.execute('INSERT INTO failures VALUES (?, ?, 1, ?)',
+                                 (url, kind, error))
+
+    def failures(self):
+        """
+        Pages which could not be fetched
+        :return: list of dicts with url, kind, attempts and error
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT url, kind, attempts, error FROM failures '
+                'ORDER BY url').fetchall()
+        return [dict(zip(('url', 'kind', 'attempts', 'error'), row))
+                for row in rows]
+
+    def clear(self):
+        """
+        Forget the crawl, e.g. when it finished
+        """
+        with self._lock, self._db:
+            for table in ('meta', 'pages', 'vacancies', 'failures'):
+                self._db.execute('DELETE FROM {}'.format(table))
+
+    def close(self):
+        self._db.close()
+
+
+class CheckpointedCrawl:
+    """
+    Fail-soft crawl recording its progress in a CrawlJournal.
+    Pages which can not be fetched are recorded as failures instead of
+    stopping the crawl or producing empty vacancies, and are retried in
+    further passes with exponential backoff. Vacancies are yielded in
+    list order once all passes are done; the journal is cleared when the
+    crawl finished without failures
+    """
+
+    # amount of pages fetched between journal writes
+    BATCH_SIZE = 100
+
+    def __init__(self, parser, journal, retries=2, backoff=1.0,
+                 enrichers=()):
+        """
+        Init crawl
+        :param parser: NordseeParser to fetch and parse pages with
+        :param journal: CrawlJournal
+        :param retries: amount of passes retrying failed pages
+        :param backoff: seconds before the first retry pass, doubled
+        for every next pass
+        :param enrichers: callables taking and returning vacancy info
+        """
+        self.parser = parser
+        self.journal = journal
+        self.retries = retries
+        self.backoff = backoff
+        self.enrichers = enrichers
+
+    def _pages_amount(self):
+        """
+        Pages amount and page size from the journal, or from the first
+        list page which is journaled right away
+        :return: int
+        """
+        pages_amount = self.journal.get_meta('pages_amount')
+        if pages_amount is not None:
+            logging.info('Resume crawl of {} pages'.format(pages_amount))
+            self.parser.page_size = self.journal.get_meta('page_size')
+            return pages_amount
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._sleep(attempt)
+            try:
+                pages_amount, vacancies = self.parser._get_first_list_page()
+            except Exception as e:
+                logging.info('Can not get pages amount: {}'.format(str(e)))
+                if attempt == self.retries:
+                    raise
+                continue
+            self.journal.save_page(0, self.parser.VACANCY_LIST_URL,
+                                   vacancies)
+            self.journal.set_meta('page_size', self.parser.page_size)
+            self.journal.set_meta('pages_amount', pages_amount)
+            return pages_amount
+
+    def _sleep(self, attempt):
+        delay = self.backoff * 2 ** (attempt - 1)
+        logging.info('Retry pass {} in {}s'.format(attempt, delay))
+        time.sleep(delay)
+
+    def _fetch(self, executor, urls, params=None):
+        """
+        Fetch pages concurrently in batches
+        :param urls: list of urls
+        :param params: list of query params of every url
+        :return: generator of (index, content)
+        """
+        params = params or [None] * len(urls)
+        for start in range(0, len(urls), self.BATCH_SIZE):
+            batch = range(start, min(start + self.BATCH_SIZE, len(urls)))
+            contents = executor.map(
+                lambda index: self.parser._get_page_content(
+                    urls[index], params=params[index]), batch)
+            for index, content in zip(batch, contents):
+                yield index, content
+
+    def _crawl_pages(self, executor, pages_amount):
+        """
+        Fetch list pages which are not finished
+        :return: amount of failed pages
+        """
+        list_url = self.parser.VACANCY_LIST_URL
+        pages = [page for page in range(pages_amount)
+                 if self.journal.get_page(page) is None]
+        params = [self.parser._page_params(page) for page in pages]
+        urls = [list_url] * len(pages)
+        failed = 0
+        for index, content in self._fetch(executor, urls, params):
+            url = self.parser.transport.build_url(list_url, params[index])
+            if content is None:
+                self.parser._skip_list_page(pages[index])
+                self.journal.record_failure(url, 'list_page')
+                failed += 1
+                continue
+            vacancies = self.parser._get_common_vacancy_info(
+                pages[index], content=content)
+            if not vacancies:
+                # like a maintenance page, fetched again in the next pass
+                self.parser._skip_list_page(pages[index])
+                self.journal.record_failure(url, 'list_page')
+                failed += 1
+                continue
+            self.journal.save_page(pages[index], url, vacancies)
+        return failed
+
+    def _crawl_vacancies(self, executor, pages_amount):
+        """
+        Fetch and parse vacancies of finished list pages which are not
+        finished
+        :return: amount of failed vacancies
+        """
+        info_items = [info_item
+                      for page in range(pages_amount)
+                      for info_item in self.journal.get_page(page) or ()
+                      if self.journal.get_vacancy(info_item['url']) is None]
+        urls = [info_item['url'] for info_item in info_items]
+        failed = 0
+        for index, content in self._fetch(executor, urls):
+            if content is None:
+                self.parser._skip_vacancy(info_items[index])
+                vacancy = None
+            else:
+                vacancy = self.parser._get_vacancy(info_items[index],
+                                                   content=content)
+            if vacancy is None:
+                self.journal.record_failure(urls[index], 'vacancy')
+                failed += 1
+                continue
+            self.journal.save_vacancy(vacancy)
+        return failed
+
+    def _iter_finished(self, pages_amount):
+        for page in range(pages_amount):
+            for info_item in self.journal.get_page(page) or ():
+                vacancy = self.journal.get_vacancy(info_item['url'])
+                if vacancy is None:
+                    continue
+                for enrich in self.enrichers:
+                    vacancy = enrich(vacancy)
+                yield vacancy
+
+    def __iter__(self):
+        pages_amount = self._pages_amount()
+        with ThreadPoolExecutor(
+                max_workers=self.parser.max_workers) as executor:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self._sleep(attempt)
+                failed = self._crawl_pages(executor, pages_amount)
+                failed += self._crawl_vacancies(executor, pages_amount)
+                if not failed:
+                    break
+
+        for vacancy in self._iter_finished(pages_amount):
+            yield vacancy
+
+        failures = self.journal.failures()
+        if failures:
+            logging.info('{} pages failed, run again to resume: {}'.format(
+                len(failures), [failure['url'] for failure in failures]))
+        else:
+            self.journal.clear()
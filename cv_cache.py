@@ -0,0 +1,223 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class CvCache:
+    """
+    Content-addressed cache of downloaded CV files shared across
+    applications. Files are stored as <sha256 of content>/<file name>, so
+    CVs of different users with the same name never collide and equal
+    files are kept once. Within `max_age` seconds a cached url is used
+    without any request, after that it is revalidated with ETag /
+    Last-Modified. Least recently used files are removed once the cache
+    exceeds `max_size` bytes, except files in use
+    """
+
+    INDEX_FILENAME = 'index.sqlite'
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, cache_dir, max_size=500 * 1024 * 1024, max_age=3600,
+                 session=None, timeout=60):
+        """
+        Open or create cache
+        :param cache_dir: directory to keep files in
+        :param max_size: max total size of cached files in bytes
+        :param max_age: seconds to trust cached file without revalidation
+        :param session: requests.Session to download with
+        :param timeout: download timeout in seconds
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        if session is None:
+            # requests is imported with the first cache, not with exchanger
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.timeout = timeout
+
+        # create directory to save downloaded cv files if it does not exists
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self._lock = threading.Lock()
+        # url -> [lock, amount of threads holding or waiting for it]
+        self._url_locks = {}
+        # file path -> amount of users
+        self._in_use = Counter()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, self.INDEX_FILENAME),
+            check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                url TEXT PRIMARY KEY, hash TEXT, filename TEXT, etag TEXT,
+                last_modified TEXT, size INTEGER, checked REAL,
+                accessed REAL);
+        """)
+
+    def _path(self, content_hash, filename):
+        return os.path.join(self.cache_dir, content_hash, filename)
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT hash, filename, etag, last_modified, checked '
+                'FROM files WHERE url = ?', (url,)).fetchone()
+        if row is None or not os.path.isfile(self._path(row[0], row[1])):
+            return None
+        return dict(zip(('hash', 'filename', 'etag', 'last_modified',
+                         'checked'), row))
+
+    @contextmanager
+    def _url_lock(self, url):
+        """
+        Hold lock of url, removed once no thread needs it
+        :param url: file url
+        """
+        with self._lock:
+            url_lock = self._url_locks.get(url)
+            if url_lock is None:
+                url_lock = self._url_locks[url] = [threading.Lock(), 0]
+            url_lock[1] += 1
+        try:
+            with url_lock[0]:
+                yield
+        finally:
+            with self._lock:
+                url_lock[1] -= 1
+                if not url_lock[1]:
+                    del self._url_locks[url]
+
+    def _get(self, url, pin=False):
+        with self._url_lock(url):
+            entry = self._lookup(url)
+            now = time.time()
+            if entry and now - entry['checked'] < self.max_age:
+                self._touch(url, checked=entry['checked'])
+                file_path = self._path(entry['hash'], entry['filename'])
+            else:
+                file_path = self._download(url, entry)
+            if pin:
+                with self._lock:
+                    self._in_use[file_path] += 1
+        return file_path
+
+    def get(self, url):
+        """
+        Get local path of file, downloading it when needed
+        :param url: file url
+        :return: str file path
+        """
+        return self._get(url)
+
+    @contextmanager
+    def use(self, url):
+        """
+        Get local path of file like get, the file is not evicted until
+        the block is left, e.g. while it is uploaded
+        :param url: file url
+        :return: str file path
+        """
+        file_path = self._get(url, pin=True)
+        try:
+            yield file_path
+        finally:
+            with self._lock:
+                self._in_use[file_path] -= 1
+                if not self._in_use[file_path]:
+                    del self._in_use[file_path]
+
+    def _touch(self, url, checked):
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE files SET checked = ?, accessed = ? WHERE url = ?',
+                (checked, time.time(), url))
+
+    def _download(self, url, entry):
+        """
+        Stream file to disk in chunks, revalidating cached entry
+        :param url: file url
+        :param entry: cached entry or None
+        :return: str file path
+        """
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        with self.session.get(url, headers=headers, stream=True,
+                              allow_redirects=True,
+                              timeout=self.timeout) as r:
+            if r.status_code == 304 and entry:
+                self._touch(url, checked=time.time())
+                return self._path(entry['hash'], entry['filename'])
+            r.raise_for_status()
+
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in r.iter_content(self.CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                        size += len(chunk)
+                content_hash = digest.hexdigest()
+                filename = (os.path.basename(urlsplit(url).path) or
+                            content_hash)
+                file_path = self._path(content_hash, filename)
+                if not os.path.exists(os.path.dirname(file_path)):
+                    os.makedirs(os.path.dirname(file_path))
+                os.replace(tmp_path, file_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            etag = r.headers.get('ETag')
+            last_modified = r.headers.get('Last-Modified')
+
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, content_hash, filename, etag, last_modified, size, now,
+                 now))
+            self._evict(keep=content_hash)
+        return file_path
+
+    def _evict(self, keep):
+        """
+        Remove least recently used files until cache fits max_size,
+        skipping files in use
+        :param keep: hash of the file which has just been stored
+        """
+        rows = self._db.execute(
+            'SELECT hash, filename, MAX(size), MAX(accessed) FROM files '
+            'GROUP BY hash, filename ORDER BY MAX(accessed)').fetchall()
+        total = sum(row[2] for row in rows)
+        for content_hash, filename, size, _ in rows:
+            if total <= self.max_size:
+                break
+            if (content_hash == keep or
+                    self._path(content_hash, filename) in self._in_use):
+                continue
+            self._db.execute('DELETE FROM files WHERE hash = ? '
+                             'AND filename = ?', (content_hash, filename))
+            total -= size
+            try:
+                os.remove(self._path(content_hash, filename))
+                os.rmdir(os.path.join(self.cache_dir, content_hash))
+            except OSError:
+                pass
+
+    def close(self):
+        self._db.close()
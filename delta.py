@@ -0,0 +1,179 @@
+import hashlib
+import os
+
+from lxml import etree
+
+from xml_writer import build_position
+
+# fields which make a vacancy changed for downstream importers
+HASHED_FIELDS = ('title', 'location', 'position', 'description')
+
+
+def vacancy_key(vacancy):
+    """
+    Key of vacancy in the index
+    :param vacancy: Vacancy or dict with vacancy info
+    :return: str identifier, or url for vacancies without one
+    """
+    return vacancy['identifier'] or vacancy['url']
+
+
+def removed_position(key):
+    """
+    Position of a vacancy removed since the previous run
+    :param key: vacancy key from vacancy_key
+    :return: position element with the identifier, or the link for
+    vacancies keyed by url
+    """
+    position = etree.Element('position')
+    # identifiers are the digits of the vacancy url
+    tag = 'identifier' if key.isdigit() else 'link'
+    etree.SubElement(position, tag).text = key
+    return position
+
+
+def vacancy_hash(vacancy):
+    """
+    Hash of vacancy content
+    :param vacancy: Vacancy or dict with vacancy info
+    :return: str hex digest
+    """
+    content = '\x1f'.join(vacancy[field] or '' for field in HASHED_FIELDS)
+    return hashlib.blake2b(content.encode('utf-8'),
+                           digest_size=10).hexdigest()
+
+
+class VacancyIndex:
+    """
+    Vacancy key -> content hash of the previous run, kept as a text file
+    with one `key<TAB>hash` line per vacancy, so 100k vacancies load with
+    a single read and split
+    """
+
+    TMP_SUFFIX = '.part'
+
+    def __init__(self, filepath):
+        """
+        :param filepath: path of the index file
+        """
+        self.filepath = filepath
+
+    def load(self):
+        """
+        Read index
+        :return: dict key -> hash, empty when there was no previous run
+        """
+        try:
+            with open(self.filepath, encoding='utf-8') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        return dict(line.split('\t', 1) for line in data.splitlines())
+
+    def save(self, hashes):
+        """
+        Replace index atomically
+        :param hashes: dict key -> hash
+        """
+        tmp_filepath = self.filepath + self.TMP_SUFFIX
+        with open(tmp_filepath, 'w', encoding='utf-8') as f:
+            f.write(''.join('{}\t{}\n'.format(key, value)
+                            for key, value in hashes.items()))
+        os.replace(tmp_filepath, self.filepath)
+
+
+class DeltaXmlWriter:
+    """
+    Write vacancies added, changed and removed since the previous run as
+    <delta><added/><changed/><removed/></delta>. Only added and changed
+    positions are kept in memory until the end, so memory scales with
+    churn. The index is updated only when writing finished without errors
+    """
+
+    TMP_SUFFIX = '.part'
+
+    def __init__(self, filepath, index, pretty_print=True):
+        """
+        Init writer
+        :param filepath: delta xml file path
+        :param index: VacancyIndex of the previous run
+        :param pretty_print: indent elements
+        """
+        self.filepath = filepath
+        self.tmp_filepath = filepath + self.TMP_SUFFIX
+        self.index = index
+        self.pretty_print = pretty_print
+        self.count = 0
+        self.added = []
+        self.changed = []
+        self.removed = []
+
+    def __enter__(self):
+        self._previous = self.index.load()
+        self._current = {}
+        self._keep_all = False
+        self.added = []
+        self.changed = []
+        self.removed = []
+        return self
+
+    def write(self, data):
+        """
+        Compare vacancy with the previous run
+        :param data: Vacancy or dict with vacancy info
+        """
+        key = vacancy_key(data)
+        content_hash = vacancy_hash(data)
+        self._current[key] = content_hash
+        self.count += 1
+
+        previous_hash = self._previous.get(key)
+        if previous_hash == content_hash:
+            return
+        section = self.added if previous_hash is None else self.changed
+        section.append(build_position(data))
+
+    def keep(self, key):
+        """
+        Keep vacancy which could not be crawled this time as it was,
+        instead of reporting it removed
+        :param key: vacancy key
+        """
+        if key in self._previous and key not in self._current:
+            self._current[key] = self._previous[key]
+
+    def keep_all(self):
+        """
+        Report no removed vacancies, e.g. when a list page could not be
+        crawled and its vacancies are unknown
+        """
+        self._keep_all = True
+
+    def _write_section(self, xf, name, positions):
+        with xf.element(name):
+            for position in positions:
+                xf.write(position, pretty_print=self.pretty_print)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            return False
+
+        removed = [key for key in self._previous if key not in self._current]
+        if self._keep_all:
+            for key in removed:
+                self._current[key] = self._previous[key]
+            removed = []
+        self.removed = sorted(removed)
+        with open(self.tmp_filepath, 'wb') as f, \
+                etree.xmlfile(f, encoding='utf-8') as xf:
+            xf.write_declaration()
+            with xf.element('delta'):
+                self._write_section(xf, 'added', self.added)
+                self._write_section(xf, 'changed', self.changed)
+                with xf.element('removed'):
+                    for key in self.removed:
+                        xf.write(removed_position(key),
+                                 pretty_print=self.pretty_print)
+        os.replace(self.tmp_filepath, self.filepath)
+        self.index.save(self._current)
+        return False
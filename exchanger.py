@@ -1,13 +1,14 @@
 import os
 import sys
 import json
-import time
 import logging
-import requests
+import argparse
+import threading
 
-from splinter import Browser
-
-logging.basicConfig(filename='logs.log', level=logging.INFO)
+from cv_cache import CvCache
+from metrics import Metrics
+from profiling import Profiler
+from waits import StepTimings, WaitTimeout, wait_for
 
 """Settings for local testing on Linux/Mac with Chrome driver"""
 
@@ -20,11 +21,62 @@ WEB_DRIVERS = {
 }
 
 CURRENT_PATH = os.path.abspath(os.path.dirname(__file__))
-try:
-    DRIVER_PATH = os.path.join(CURRENT_PATH, 'drivers',
-                               WEB_DRIVERS[sys.platform])
-except:
-    raise Exception
+
+
+class UnsupportedPlatform(Exception):
+    """
+    There is no bundled Chrome driver for the platform
+    """
+
+    def __init__(self, platform):
+        self.platform = platform
+        super().__init__(
+            'No Chrome driver for platform {}, supported platforms: '
+            '{}'.format(platform, ', '.join(sorted(WEB_DRIVERS))))
+
+
+def get_driver_path(platform=None):
+    """
+    Path of the bundled Chrome driver, resolved when the first browser
+    is launched, so importing the module works on every platform.
+    Raises UnsupportedPlatform when there is no driver for the platform
+    :param platform: platform name, by default the current one
+    :return: str
+    """
+    platform = platform or sys.platform
+    try:
+        return os.path.join(CURRENT_PATH, 'drivers', WEB_DRIVERS[platform])
+    except KeyError:
+        raise UnsupportedPlatform(platform)
+
+
+_default_cv_cache = None
+_default_cv_cache_lock = threading.Lock()
+
+
+def get_default_cv_cache():
+    """
+    CV cache in the downloads directory shared by all exchangers
+    :return: CvCache
+    """
+    global _default_cv_cache
+    with _default_cv_cache_lock:
+        if _default_cv_cache is None:
+            _default_cv_cache = CvCache(
+                os.path.join(CURRENT_PATH, Exchanger.DOWNLOADS_DIR))
+        return _default_cv_cache
+
+
+def reset_browser(browser):
+    """
+    Forget state of previous application without relaunching browser
+    :param browser: splinter Browser
+    """
+    browser.execute_script(
+        'try { window.localStorage.clear(); window.sessionStorage.clear(); }'
+        ' catch (e) {}')
+    browser.cookies.delete()
+    browser.visit('about:blank')
 
 
 class Exchanger:
@@ -33,30 +85,86 @@ class Exchanger:
     """
 
     DOWNLOADS_DIR = 'downloads'
+    WAIT_TIMEOUT = 30
+    ERROR_WAIT_TIMEOUT = 3
+    POLL_INTERVAL = 0.1
     DEFAULT_VALUES = {
         'german_level': 'Fließend',
         'nationality': 'EU mit unbefristeter Arbeitserlaubnis',
         'source': 'JobUFO',
         'country': 'Deutschland'
     }
+    # form input name -> user data key
+    INPUT_FIELDS = (
+        ('bewerbung_form[vorname]', 'first_name'),
+        ('bewerbung_form[nachname]', 'last_name'),
+        ('bewerbung_form[strasse]', 'street'),
+        ('bewerbung_form[plz]', 'postal_code'),
+        ('bewerbung_form[ort]', 'city'),
+        ('bewerbung_form[telefon]', 'phone'),
+        ('bewerbung_form[mail]', 'email'),
+        ('bewerbung_form[geburtsdatum]', 'birthday'),
+    )
+    # select -> id of the select element
+    SELECT_IDS = {
+        'sex': 'sex_w',
+        'country': 'country',
+        'nationality': 'nation',
+        'source': 'wie_gefunden',
+        'german_level': 'berufsausbildung_m_sb',
+    }
 
-    def __init__(self, vacancy_url, user_data):
+    def __init__(self, vacancy_url, user_data, browser=None,
+                 wait_timeout=None, poll_interval=None, cv_cache=None,
+                 metrics=None, on_submit=None):
         """
         Init class
         :param vacancy_url: url of vacancy page
         :param user_data: dict with user data
-        """
-        self.browser = self._setup_browser()
+        :param browser: already running Browser to reuse, it is not closed
+        after applying
+        :param wait_timeout: max seconds to wait for the page in every step
+        :param poll_interval: seconds between checks of the page
+        :param cv_cache: CvCache to get cv files from, by default the one
+        shared by all exchangers
+        :param metrics: Metrics to record a span of every step in
+        :param on_submit: callable run right before the form is submitted
+        """
+        self._owns_browser = browser is None
+        self.browser = browser or self._setup_browser()
         self.vacancy_url = vacancy_url
         self.user_data = user_data
+        self.wait_timeout = (self.WAIT_TIMEOUT if wait_timeout is None
+                             else wait_timeout)
+        self.poll_interval = (self.POLL_INTERVAL if poll_interval is None
+                              else poll_interval)
+        self.timings = StepTimings()
+        self.metrics = metrics or Metrics()
+        self._cv_cache = cv_cache
+        self.on_submit = on_submit
+        self.error = None
+        # the application may have reached the site
+        self.submitted = False
+        self._submit_button = None
+
+    @property
+    def cv_cache(self):
+        """
+        CvCache given to the exchanger, or the shared one, which is opened
+        only when a cv file is needed
+        """
+        return self._cv_cache or get_default_cv_cache()
 
     @staticmethod
     def _setup_browser():
         """
-        Prepare splinter browser
+        Prepare splinter browser, splinter is imported only when the first
+        browser is launched
         :return: Browser
         """
-        options = {'executable_path': DRIVER_PATH, 'headless': True}
+        from splinter import Browser
+
+        options = {'executable_path': get_driver_path(), 'headless': True}
         return Browser('chrome', **options)
 
     def _open_page(self):
@@ -73,80 +181,70 @@ class Exchanger:
         Fill required fields (standard inputs)
         """
         logging.info('Fill unputs')
-        # fill first name
-        self.browser.fill('bewerbung_form[vorname]',
-                          self.user_data['first_name'])
-        # fill last name
-        self.browser.fill('bewerbung_form[nachname]',
-                          self.user_data['last_name'])
-        # fill street
-        self.browser.fill('bewerbung_form[strasse]',
-                          self.user_data['street'])
-        # fill postal code
-        self.browser.fill('bewerbung_form[plz]',
-                          self.user_data['postal_code'])
-        # fill city
-        self.browser.fill('bewerbung_form[ort]', self.user_data['city'])
-        # fill phone
-        self.browser.fill('bewerbung_form[telefon]',
-                          self.user_data['phone'])
-        # fill email
-        self.browser.fill('bewerbung_form[mail]', self.user_data['email'])
-        # fill birthday
-        self.browser.fill('bewerbung_form[geburtsdatum]',
-                          self.user_data['birthday'])
+        for name, key in self.INPUT_FIELDS:
+            self.browser.fill(name, self.user_data[key])
         self.browser.find_by_id('handy').last.click()
         return True
 
+    @classmethod
+    def select_values(cls, user_data):
+        """
+        Values to choose in select inputs
+        :param user_data: dict with user data
+        :return: dict select -> visible option text
+        """
+        values = dict(cls.DEFAULT_VALUES)
+        values['sex'] = 'Herr' if user_data['gender'] == 'M' else 'Frau'
+        return values
+
+    def _choose(self, select):
+        """
+        Choose value in jQuery UI select menu
+        :param select: key of SELECT_IDS
+        """
+        self.browser.find_by_id(
+            '{}-button'.format(self.SELECT_IDS[select])).click()
+        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
+            self.select_values(self.user_data)[select]).last.click()
+
     def _select_sex(self):
         """
         Fill select input 'sex'
         """
         logging.info('Fill sex')
         self.browser.execute_script("window.scrollTo(398, 16)")
-        self.browser.find_by_id('sex_w-button').click()
-        value = 'Herr' if self.user_data['gender'] == 'M' else 'Frau'
-        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
-            value).last.click()
+        self._choose('sex')
 
     def _select_country(self):
         """
         Fill select input 'country'
         """
         logging.info('Fill country')
-        self.browser.find_by_id('country-button').click()
-        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
-            self.DEFAULT_VALUES['country']).last.click()
+        self._choose('country')
 
     def _select_nationality(self):
         """
         Fill select input 'nation'
         """
         logging.info('Fill nationality')
-        self.browser.find_by_id('nation-button').click()
         # fill input with default value
-        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
-            self.DEFAULT_VALUES['nationality']).last.click()
+        self._choose('nationality')
 
     def _select_source(self):
         """
         Fill select input 'source'
         """
         logging.info('Fill source')
-        self.browser.find_by_id('wie_gefunden-button').click()
         # fill input with default value
-        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
-            self.DEFAULT_VALUES['source']).last.click()
+        self._choose('source')
 
     def _select_german_level(self):
         """
         Fill select input 'german level'
         """
         logging.info('Fill german level')
-        self.browser.find_by_id('berufsausbildung_m_sb-button').click()
         # fill input with default value
-        self.browser.find_by_css('.ui-selectmenu-open').find_by_text(
-            self.DEFAULT_VALUES['german_level']).last.click()
+        self._choose('german_level')
 
     def _fill_selects(self):
         """
@@ -165,45 +263,38 @@ class Exchanger:
         :return: str file path
         """
         logging.info('Download file')
-        file_url = self.user_data['cv_path']
-        r = requests.get(file_url, allow_redirects=True)
-        filename = file_url.rsplit('/', 1)[1]
-
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        downloads_dir = os.path.join(current_dir, self.DOWNLOADS_DIR)
-
-        # create directory to save downloaded cv file if it does not exists
-        if not os.path.exists(downloads_dir):
-            os.makedirs(downloads_dir)
-        file_path = os.path.join(downloads_dir, filename)
-        try:
-            open(file_path, 'wb').write(r.content)
-        except Exception as e:
-            logging.info('Can not download file: {}'.format(str(e)))
-        return file_path
+        return self.cv_cache.get(self.user_data['cv_path'])
 
     def _upload_file(self):
         """
         Upload file
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
         logging.info('Upload file')
-        file_path = self._download_file()
-        try:
-            self.browser.attach_file('anlage2', file_path)
-        except Exception as e:
-            logging.info('Can not upload file: {}'.format(str(e)))
-        # wait until the file is uploaded
-        while self.browser.is_element_not_present_by_css('.modal_link'):
-            time.sleep(1)
+        # the file is kept in the cache until it is uploaded
+        with self.cv_cache.use(self.user_data['cv_path']) as file_path:
+            try:
+                self.browser.attach_file('anlage2', file_path)
+            except Exception as e:
+                logging.info('Can not upload file: {}'.format(str(e)))
+            # wait until the file is uploaded
+            self._wait('upload_file', 'uploaded file link',
+                       EC.presence_of_element_located((By.CSS_SELECTOR,
+                                                       '.modal_link')))
         return True
 
     def _click_agree(self):
         """
         Click agree
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
         logging.info('Click agree')
-        while self.browser.is_element_not_present_by_id('agreement'):
-            time.sleep(1)
+        self._wait('click_agree', 'agreement block',
+                   EC.presence_of_element_located((By.ID, 'agreement')))
         self.browser.find_by_id('agreement').find_by_css(
             '.agreement_new').last.click()
         return True
@@ -212,42 +303,122 @@ class Exchanger:
         """
         Submit vacancy form
         """
+        from selenium.webdriver.common.by import By
+
         logging.info('Click submit')
-        self.browser.find_by_id('btn_online_application_send').click()
+        # WebDriver element, to see when the form page is left
+        self._submit_button = self.browser.driver.find_element(
+            By.ID, 'btn_online_application_send')
+        if self.on_submit is not None:
+            self.on_submit()
+        self.submitted = True
+        self._submit_button.click()
 
     def _has_error(self):
         """
         Check submit page for error
         """
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
         logging.info('Check error')
+        has_error = EC.presence_of_element_located((By.CSS_SELECTOR,
+                                                    '.error_msg'))
+
+        def submitted(driver):
+            # error message is shown or the form page was left
+            if has_error(driver):
+                return True
+            return (self._submit_button is not None and
+                    EC.staleness_of(self._submit_button)(driver))
+
         try:
-            self.browser.is_element_not_present_by_css('.error_msg', 3)
-            error_msg = self.browser.find_by_css('.error_msg').first.text
-            return error_msg
-        except Exception:
+            self._wait('check_error', 'result page', submitted,
+                       timeout=self.ERROR_WAIT_TIMEOUT)
+            return self.browser.driver.find_element(
+                By.CSS_SELECTOR, '.error_msg').text
+        except (WaitTimeout, NoSuchElementException):
             return False
 
-    def run(self):
+    def _span(self, step):
+        """
+        Metrics span of an application step
+        :param step: name of the step
         """
-        Run process of applying job
+        return self.metrics.span('exchanger_{}'.format(step),
+                                 vacancy_url=self.vacancy_url)
+
+    def _wait(self, step, description, condition, timeout=None):
+        """
+        Wait for condition on the page
+        :param step: name of the step
+        :param description: description of the condition for timeout error
+        :param condition: callable taking WebDriver
+        :param timeout: max seconds to wait, `wait_timeout` by default
+        :return: value returned by condition
+        """
+        return wait_for(self.browser.driver, condition, step, description,
+                        timeout=(self.wait_timeout if timeout is None
+                                 else timeout),
+                        poll_interval=self.poll_interval,
+                        timings=self.timings)
+
+    def run(self):
         """
-        self._open_page()
-        self._upload_file()
-        self._fill_inputs()
-        self._fill_selects()
-        self._click_agree()
-        self._submit()
-        error = self._has_error()
+        Run process of applying job.
+        Raises WaitTimeout when a step waited too long for the page
+        """
+        steps = (
+            ('open_page', self._open_page),
+            ('upload_file', self._upload_file),
+            ('fill_inputs', self._fill_inputs),
+            ('fill_selects', self._fill_selects),
+            ('click_agree', self._click_agree),
+            ('submit', self._submit),
+        )
+        try:
+            for name, step in steps:
+                with self.timings.step(name), self._span(name):
+                    step()
+            with self.timings.step('check_error'), self._span('check_error'):
+                error = self._has_error()
+        except WaitTimeout as e:
+            logging.info('Step timed out: {}'.format(e.to_dict()))
+            raise
+        finally:
+            logging.info('Step timings: {}'.format(
+                json.dumps(self.timings.as_dict())))
+            if self._owns_browser:
+                self.browser.quit()
+
         if error:
+            self.error = error
+            self.metrics.inc('applications', result='error')
             logging.info('Can not submit form :{}'.format(error))
         else:
+            self.metrics.inc('applications', result='success')
             logging.info('Submitted successfully')
-        self.browser.quit()
         return True
 
 
 if __name__ == "__main__":
+    logging.basicConfig(filename='logs.log', level=logging.INFO)
+
+    arg_parser = argparse.ArgumentParser(description='Apply for Nordsee job')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='write a profile report and collapsed '
+                                 'stacks of the application to '
+                                 '--profile-dir')
+    arg_parser.add_argument('--profile-dir', default='profiles',
+                            help='directory for profile files')
+    args = arg_parser.parse_args()
+
     test_url = 'https://karriere.nordsee.com/de/Verkaeufer-Mitarbeiter-Restaurant-mw-in-Berlin-de-j2496.html'
     test_data = json.load(open('nordsee_test.json'))
-    exchanger = Exchanger(user_data=test_data, vacancy_url=test_url)
-    exchanger.run()
+    metrics = Metrics()
+    with Profiler(args.profile_dir, 'exchanger', metrics=metrics,
+                  enabled=args.profile):
+        exchanger = Exchanger(user_data=test_data, vacancy_url=test_url,
+                              metrics=metrics)
+        exchanger.run()
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+
+from exchanger import Exchanger, reset_browser
+from transport import percentile
+from waits import WaitTimeout
+
+# tells a worker to stop
+_STOP = object()
+
+
+class ExchangerPool:
+    """
+    Apply for jobs with a fixed amount of warm browsers.
+    Every worker thread owns one browser, takes (vacancy_url, user_data)
+    jobs from a queue and resets browser state between jobs instead of
+    relaunching it
+    """
+
+    def __init__(self, size=2, browser_factory=None, **exchanger_options):
+        """
+        Init pool
+        :param size: amount of browsers working at the same time
+        :param browser_factory: callable returning new Browser,
+        by default headless Chrome as Exchanger sets it up
+        :param exchanger_options: Exchanger options like wait_timeout
+        """
+        self.size = size
+        self.browser_factory = browser_factory or Exchanger._setup_browser
+        self.exchanger_options = exchanger_options
+        self.results = []
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = None
+        self._finished = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def start(self):
+        """
+        Launch browsers and worker threads
+        """
+        self._started = time.perf_counter()
+        self._finished = None
+        for number in range(self.size):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name='exchanger-{}'.format(number))
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, vacancy_url, user_data):
+        """
+        Queue application
+        :param vacancy_url: url of vacancy page
+        :param user_data: dict with user data
+        """
+        self._jobs.put((vacancy_url, user_data))
+
+    def join(self):
+        """
+        Wait until all queued applications are processed
+        """
+        self._jobs.join()
+
+    def close(self):
+        """
+        Finish queued applications and quit browsers
+        """
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._finished = time.perf_counter()
+
+    def _apply(self, browser, vacancy_url, user_data):
+        """
+        Apply for one job
+        :return: dict with job result
+        """
+        started = time.perf_counter()
+        result = {'vacancy_url': vacancy_url,
+                  'email': user_data.get('email'),
+                  'error': None}
+        exchanger = None
+        try:
+            exchanger = Exchanger(vacancy_url, user_data, browser=browser,
+                                  **self.exchanger_options)
+            exchanger.run()
+            result['error'] = exchanger.error
+        except WaitTimeout as e:
+            result['error'] = str(e)
+            result['timeout'] = e.to_dict()
+        except Exception as e:
+            logging.info('Can not apply for job: {}'.format(str(e)))
+            result['error'] = str(e) or e.__class__.__name__
+        result['success'] = not result['error']
+        result['latency'] = time.perf_counter() - started
+        if exchanger is not None:
+            result['timings'] = exchanger.timings.as_dict()
+        return result
+
+    def _work(self):
+        browser = None
+        while True:
+            job = self._jobs.get()
+            try:
+                if job is _STOP:
+                    break
+                if browser is None:
+                    browser = self._launch()
+
+                if browser is None:
+                    result = {'vacancy_url': job[0],
+                              'email': job[1].get('email'),
+                              'error': 'Can not launch browser',
+                              'success': False, 'latency': 0.0}
+                else:
+                    result = self._apply(browser, *job)
+                with self._lock:
+                    self.results.append(result)
+                if browser is None:
+                    continue
+
+                try:
+                    reset_browser(browser)
+                except Exception as e:
+                    # browser is broken, launch a new one for the next job
+                    logging.info('Can not reset browser: {}'.format(str(e)))
+                    self._quit(browser)
+                    browser = None
+            finally:
+                self._jobs.task_done()
+
+        if browser is not None:
+            self._quit(browser)
+
+    def _launch(self):
+        try:
+            return self.browser_factory()
+        except Exception as e:
+            logging.info('Can not launch browser: {}'.format(str(e)))
+
+    @staticmethod
+    def _quit(browser):
+        try:
+            browser.quit()
+        except Exception as e:
+            logging.info('Can not quit browser: {}'.format(str(e)))
+
+    def stats(self):
+        """
+        Latency and throughput of processed applications
+        :return: dict
+        """
+        with self._lock:
+            results = list(self.results)
+
+        seconds = 0.0
+        if self._started:
+            seconds = (self._finished or time.perf_counter()) - self._started
+        latencies = sorted(result['latency'] for result in results)
+        return {
+            'jobs': len(results),
+            'succeeded': sum(1 for result in results if result['success']),
+            'failed': sum(1 for result in results if not result['success']),
+            'seconds': seconds,
+            'applications_per_minute':
+                len(results) * 60.0 / seconds if seconds else 0.0,
+            'latency': {
+                'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+            },
+        }
+
+    def run(self, jobs):
+        """
+        Apply for all jobs and wait for them
+        :param jobs: iterable of (vacancy_url, user_data)
+        :return: list of job results in order of completion
+        """
+        with self:
+            for vacancy_url, user_data in jobs:
+                self.submit(vacancy_url, user_data)
+            self.join()
+        return self.results
@@ -0,0 +1,310 @@
+import logging
+import multiprocessing
+import re
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+
+from cssselect import GenericTranslator
+from lxml import etree
+
+from vacancy import Vacancy
+
+# vacancy identifier from url like .../Verkaeufer-in-Berlin-de-j2496.html
+IDENTIFIER_RE = re.compile(r'-j(?P<id>\d+)\.html')
+
+# version of the vacancy data extracted from a page, bumped whenever the
+# extraction changes so vacancy data cached by an older version is not used
+VACANCY_DATA_VERSION = 2
+
+
+def pq(content):
+    """
+    Parse content with PyQuery, which is imported on first use as it
+    takes most of the parser import time
+    :param content: page content or parsed document
+    :return: PyQuery
+    """
+    from pyquery import PyQuery
+    return PyQuery(content)
+
+
+def get_identifier(url):
+    """
+    Get vacancy identifier from its url
+    :param url: vacancy url
+    :return: str identifier or None
+    """
+    match = IDENTIFIER_RE.search(url or '')
+    if match is None:
+        logging.info('Can not get identifier from url {}'.format(url))
+        return None
+    return match.group('id')
+
+
+class PyQueryExtractor:
+    """
+    Extract vacancy data from pages with PyQuery
+    """
+
+    def pages_amount(self, content):
+        """
+        Get vacancy pages amount from vacancy list page
+        :param content: page content
+        :return: int
+        """
+        d = pq(content)
+        return int(d('.nav_item:last a').text())
+
+    def list_page(self, content):
+        """
+        Get pages amount and common vacancy info parsing the page once
+        :param content: page content
+        :return: tuple (int pages amount, list of Vacancy)
+        """
+        d = pq(content)
+        return self.pages_amount(d), self.common_vacancy_info(d)
+
+    def common_vacancy_info(self, content):
+        """
+        Get common vacancy info from vacancy list page
+        :param content: page content
+        :return: list of Vacancy without description
+        """
+        vacancy_info_list = []
+        d = pq(content)
+
+        rows = d('#joboffers tbody tr').items()
+        for row in rows:
+            link = row.find('.real_table_col1 a')
+            url = link.attr('href')
+            vacancy_info_list.append(Vacancy(
+                url=url,
+                identifier=get_identifier(url),
+                title=link.text(),
+                location=row.find('.real_table_col2').text(),
+                position=row.find('.real_table_col4').text()))
+        return vacancy_info_list
+
+    def vacancy_data(self, content):
+        """
+        Get data from vacancy page
+        :param content: page content
+        :return: dict with vacancy data
+        """
+        return vacancy_sections(pq(content)('.emp_nr_innerframe'))
+
+
+def _css(selector, prefix='descendant-or-self::'):
+    """
+    Compile css selector to XPath
+    :param selector: css selector
+    :param prefix: XPath axis to search from
+    :return: etree.XPath
+    """
+    return etree.XPath(GenericTranslator().css_to_xpath(selector,
+                                                        prefix=prefix))
+
+
+def _text(elements):
+    """
+    Text of elements with squashed whitespace, like PyQuery.text()
+    :param elements: list of elements
+    :return: str
+    """
+    return ' '.join(' '.join(''.join(element.itertext()).split())
+                    for element in elements)
+
+
+# class of vacancy page element -> section of vacancy data
+SECTION_CLASSES = {
+    'einleitungstext': 'introduction',
+    'mitteltext': 'short_description',
+    'abschluss': 'conclusion',
+}
+SECTIONS = ('introduction', 'short_description', 'details', 'conclusion')
+# elements whose text is separated from the text around them
+BLOCK_TAGS = frozenset(('address', 'article', 'br', 'dd', 'div', 'dl', 'dt',
+                        'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+                        'li', 'ol', 'p', 'section', 'table', 'td', 'th',
+                        'tr', 'ul'))
+SECTION_SEPARATOR = '\n\n'
+
+
+def _collect_text(element, parts):
+    """
+    Append text of element and its descendants to parts, with a space
+    around block elements so words of adjacent blocks do not run together
+    :param element: element
+    :param parts: list of str
+    """
+    block = element.tag in BLOCK_TAGS
+    if block:
+        parts.append(' ')
+    if element.text:
+        parts.append(element.text)
+    for child in element:
+        # comments and processing instructions have no str tag
+        if isinstance(child.tag, str):
+            _collect_text(child, parts)
+        if child.tail:
+            parts.append(child.tail)
+    if block:
+        parts.append(' ')
+
+
+def _walk_sections(parent, parts):
+    """
+    Sort text of children of parent into sections: elements with a class
+    of SECTION_CLASSES, and the elements following `.trenner` as details.
+    Other elements before `.trenner` are searched for sections
+    :param parent: element
+    :param parts: dict section -> list of str
+    """
+    details = False
+    for child in parent.iterchildren('*'):
+        classes = (child.get('class') or '').split()
+        section = next((SECTION_CLASSES[name] for name in classes
+                        if name in SECTION_CLASSES), None)
+        if section is not None:
+            _collect_text(child, parts[section])
+        elif 'trenner' in classes:
+            details = True
+        elif details:
+            _collect_text(child, parts['details'])
+        else:
+            _walk_sections(child, parts)
+
+
+def vacancy_sections(frames):
+    """
+    Get vacancy data walking the content of the vacancy page once
+    :param frames: `.emp_nr_innerframe` elements
+    :return: dict with text of every section and the description made of
+    them, sections separated by an empty line
+    """
+    parts = {section: [] for section in SECTIONS}
+    for frame in frames:
+        _walk_sections(frame, parts)
+    data = {section: ' '.join(''.join(parts[section]).split())
+            for section in SECTIONS}
+    data['description'] = SECTION_SEPARATOR.join(
+        data[section] for section in SECTIONS if data[section])
+    return data
+
+
+class LxmlExtractor:
+    """
+    Extract vacancy data with precompiled lxml XPath expressions,
+    parsing every page once
+    """
+
+    ROWS = _css('#joboffers tbody tr')
+    ROW_LINK = _css('.real_table_col1 a')
+    ROW_LOCATION = _css('.real_table_col2')
+    ROW_POSITION = _css('.real_table_col4')
+    LAST_NAV_LINK = etree.XPath('({})[last()]/descendant::a'.format(
+        GenericTranslator().css_to_xpath('.nav_item')))
+    INNER_FRAME = _css('.emp_nr_innerframe')
+
+    @staticmethod
+    def _parse(content):
+        """
+        Parse page content once
+        :param content: bytes or str page content, or parsed PyQuery
+        document or element
+        :return: root element
+        """
+        if isinstance(content, etree._Element):
+            return content
+        # PyQuery document is a list of elements
+        if isinstance(content, list):
+            return content[0] if len(content) else etree.Element('html')
+        if not content:
+            return etree.Element('html')
+        return etree.HTML(content)
+
+    def pages_amount(self, content):
+        """
+        Get vacancy pages amount from vacancy list page
+        :param content: page content
+        :return: int
+        """
+        return int(_text(self.LAST_NAV_LINK(self._parse(content))))
+
+    def list_page(self, content):
+        """
+        Get pages amount and common vacancy info parsing the page once
+        :param content: page content
+        :return: tuple (int pages amount, list of Vacancy)
+        """
+        root = self._parse(content)
+        return self.pages_amount(root), self.common_vacancy_info(root)
+
+    def common_vacancy_info(self, content):
+        """
+        Get common vacancy info from vacancy list page
+        :param content: page content
+        :return: list of Vacancy without description
+        """
+        vacancy_info_list = []
+        for row in self.ROWS(self._parse(content)):
+            links = self.ROW_LINK(row)
+            url = links[0].get('href') if links else None
+            vacancy_info_list.append(Vacancy(
+                url=url,
+                identifier=get_identifier(url),
+                title=_text(links),
+                location=_text(self.ROW_LOCATION(row)),
+                position=_text(self.ROW_POSITION(row))))
+        return vacancy_info_list
+
+    def vacancy_data(self, content):
+        """
+        Get data from vacancy page
+        :param content: page content
+        :return: dict with vacancy data
+        """
+        return vacancy_sections(self.INNER_FRAME(self._parse(content)))
+
+
+EXTRACTORS = {
+    'pyquery': PyQueryExtractor,
+    'lxml': LxmlExtractor,
+}
+
+# extractors created in the current (worker) process
+_process_extractors = {}
+
+
+def extract_vacancy_data(extractor_name, content):
+    """
+    Get data from vacancy page in a worker process.
+    Takes raw page bytes and returns a small dict, so no DOM is pickled
+    :param extractor_name: key of EXTRACTORS
+    :param content: page content
+    :return: dict with vacancy data
+    """
+    extractor = _process_extractors.get(extractor_name)
+    if extractor is None:
+        extractor = _process_extractors[extractor_name] = \
+            EXTRACTORS[extractor_name]()
+    return extractor.vacancy_data(content)
+
+
+def parse_pool(max_workers):
+    """
+    Process pool to run extract_vacancy_data in. Workers are started by
+    a fork server, or spawned where there is none, instead of being forked
+    from the crawl, whose fetch threads may hold locks at that moment.
+    Python 3.6 can not choose the start method of a pool and forks
+    :param max_workers: amount of processes
+    :return: ProcessPoolExecutor
+    """
+    if sys.version_info < (3, 7):
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
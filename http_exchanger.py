@@ -0,0 +1,250 @@
+import logging
+import os
+
+from urllib.parse import urljoin
+
+import requests
+
+from lxml import etree
+from urllib3.exceptions import NewConnectionError
+
+from exchanger import Exchanger, get_default_cv_cache
+from metrics import Metrics
+
+
+class FormChanged(Exception):
+    """
+    Application form does not look as expected
+    """
+
+
+class FormExpired(Exception):
+    """
+    Site rejected the form before handling the application, e.g. because
+    its token expired, so it can be posted again with a fresh form
+    """
+
+    def __init__(self, status):
+        self.status = status
+        super().__init__('Form rejected with status {}'.format(status))
+
+
+def request_not_sent(exception):
+    """
+    Check if request failed before anything was sent to the site
+    :param exception: exception raised by requests
+    :return: bool
+    """
+    if isinstance(exception, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(exception, requests.exceptions.ConnectionError):
+        reason = getattr(exception.args[0] if exception.args else None,
+                         'reason', None)
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+class HttpExchanger:
+    """
+    Apply for job by posting the application form directly, without
+    a browser. Uses the same user data, form fields and default values
+    as Exchanger and falls back to it when the form changed
+    """
+
+    FORM_ID = 'bewerbung_form'
+    FILE_FIELD = 'anlage2'
+    TIMEOUT = 60
+    # statuses of a form rejected for its token, before it is handled
+    EXPIRED_STATUSES = (400, 403, 419)
+
+    def __init__(self, vacancy_url, user_data, session=None, cv_cache=None,
+                 fallback=True, metrics=None, form=None, on_submit=None):
+        """
+        Init class
+        :param vacancy_url: url of vacancy page
+        :param user_data: dict with user data
+        :param session: requests.Session to send requests with
+        :param cv_cache: CvCache to get cv files from
+        :param fallback: apply with Exchanger when the form changed
+        :param metrics: Metrics to record a span of every step in
+        :param form: tuple (form url, form element) already opened with
+        the same session, to apply without fetching the vacancy page again
+        :param on_submit: callable run right before the application is sent
+        """
+        self.vacancy_url = vacancy_url
+        self.user_data = user_data
+        self.session = session or requests.Session()
+        self._cv_cache = cv_cache
+        self.fallback = fallback
+        self.metrics = metrics or Metrics()
+        self.form = form
+        self.on_submit = on_submit
+        self.error = None
+        # the application may have reached the site
+        self.submitted = False
+        self.used_browser = False
+
+    @property
+    def cv_cache(self):
+        """
+        CvCache given to the exchanger, or the shared one, which is opened
+        only when a cv file is needed
+        """
+        return self._cv_cache or get_default_cv_cache()
+
+    def _get_document(self, url):
+        """
+        Get and parse page
+        :param url: page url
+        :return: tuple (final url, root element)
+        """
+        r = self.session.get(url, timeout=self.TIMEOUT)
+        r.raise_for_status()
+        return r.url, etree.HTML(r.content)
+
+    def open_form(self):
+        """
+        Find application form from vacancy page
+        :return: tuple (form url, form element)
+        """
+        logging.info('Open form')
+        url, root = self._get_document(self.vacancy_url)
+        forms = root.xpath('//form[@id=$id]', id=self.FORM_ID)
+        if not forms:
+            links = root.xpath('//*[@id="btn_online_application"]/@href')
+            if not links or links[0].startswith(('#', 'javascript')):
+                raise FormChanged('Application link not found')
+            url, root = self._get_document(urljoin(url, links[0]))
+            forms = root.xpath('//form[@id=$id]', id=self.FORM_ID)
+        if not forms:
+            raise FormChanged('Application form not found')
+        return url, forms[0]
+
+    @staticmethod
+    def _require(elements, description):
+        if not elements:
+            raise FormChanged('{} not found'.format(description))
+        return elements[0]
+
+    def _build_fields(self, form):
+        """
+        Form fields with hidden inputs and user data
+        :param form: form element
+        :return: dict name -> value
+        """
+        fields = {}
+        for hidden in form.xpath('.//input[@type="hidden"][@name]'):
+            fields[hidden.get('name')] = hidden.get('value', '')
+
+        for name, key in Exchanger.INPUT_FIELDS:
+            self._require(form.xpath('.//input[@name=$name]', name=name),
+                          'Input {}'.format(name))
+            fields[name] = self.user_data[key]
+
+        for handy in form.xpath('.//input[@id="handy"][@name]')[-1:]:
+            fields[handy.get('name')] = handy.get('value', 'on')
+
+        values = Exchanger.select_values(self.user_data)
+        for select, select_id in Exchanger.SELECT_IDS.items():
+            element = self._require(
+                form.xpath('.//select[@id=$id]', id=select_id),
+                'Select {}'.format(select_id))
+            option = self._require(
+                [o for o in element.iter('option')
+                 if (o.text or '').strip() == values[select]],
+                'Option {} of {}'.format(values[select], select_id))
+            fields[element.get('name')] = option.get('value',
+                                                     option.text.strip())
+
+        agreement = self._require(
+            form.xpath('.//*[@id="agreement"]//input[contains('
+                       'concat(" ", @class, " "), " agreement_new ")]'),
+            'Agreement checkbox')
+        fields[agreement.get('name')] = agreement.get('value', 'on')
+
+        self._require(form.xpath('.//input[@type="file"][@name=$name]',
+                                 name=self.FILE_FIELD),
+                      'File input {}'.format(self.FILE_FIELD))
+        return fields
+
+    def _submit(self, form_url, form, fields):
+        """
+        Post form with cv file.
+        Raises FormExpired when the site rejected the form itself
+        :return: str error message or None
+        """
+        logging.info('Submit form')
+        action = urljoin(form_url, form.get('action') or form_url)
+        with self.cv_cache.use(self.user_data['cv_path']) as file_path, \
+                open(file_path, 'rb') as f:
+            files = {self.FILE_FIELD: (os.path.basename(file_path), f,
+                                       'application/pdf')}
+            if self.on_submit is not None:
+                self.on_submit()
+            self.submitted = True
+            try:
+                r = self.session.post(action, data=fields, files=files,
+                                      timeout=self.TIMEOUT)
+            except requests.exceptions.RequestException as e:
+                if request_not_sent(e):
+                    self.submitted = False
+                raise
+        if r.status_code in self.EXPIRED_STATUSES:
+            raise FormExpired(r.status_code)
+        r.raise_for_status()
+
+        errors = etree.HTML(r.content).xpath(
+            '//*[contains(concat(" ", @class, " "), " error_msg ")]')
+        if errors:
+            return ''.join(errors[0].itertext()).strip()
+        return None
+
+    def _span(self, step):
+        """
+        Metrics span of an application step
+        :param step: name of the step
+        """
+        return self.metrics.span('http_exchanger_{}'.format(step),
+                                 vacancy_url=self.vacancy_url)
+
+    def _apply_with_browser(self):
+        self.used_browser = True
+        exchanger = Exchanger(self.vacancy_url, self.user_data,
+                              cv_cache=self._cv_cache, metrics=self.metrics,
+                              on_submit=self.on_submit)
+        try:
+            exchanger.run()
+        finally:
+            self.submitted = exchanger.submitted
+        return exchanger.error
+
+    def run(self):
+        """
+        Run process of applying job.
+        Raises FormExpired when the site rejected the form before handling
+        the application
+        """
+        try:
+            with self._span('open_form'):
+                if self.form is None:
+                    self.form = self.open_form()
+                form_url, form = self.form
+                fields = self._build_fields(form)
+            with self._span('submit'):
+                error = self._submit(form_url, form, fields)
+            self.metrics.inc('applications',
+                             result='error' if error else 'success')
+        except FormChanged as e:
+            self.metrics.inc('form_changed')
+            if not self.fallback:
+                raise
+            logging.info('Form changed, apply with browser: {}'.format(
+                str(e)))
+            error = self._apply_with_browser()
+
+        if error:
+            self.error = error
+            logging.info('Can not submit form :{}'.format(error))
+        else:
+            logging.info('Submitted successfully')
+        return True
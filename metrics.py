@@ -0,0 +1,289 @@
+import json
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class JsonLinesExporter:
+    """
+    Append metric events to a json lines file, one event per line
+    """
+
+    def __init__(self, filepath):
+        """
+        Open file
+        :param filepath: path of the json lines file
+        """
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._file = open(filepath, 'a', encoding='utf-8')
+
+    def write(self, event):
+        """
+        Write event
+        :param event: json serializable dict
+        """
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _labels(labels):
+    """
+    Labels as hashable key
+    :param labels: dict
+    :return: tuple of sorted (name, value) pairs
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    """
+    Labels in Prometheus text format
+    :param labels: tuple of (name, value) pairs
+    :return: str like {status="200"}
+    """
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace(
+            '"', '\\"').replace('\n', '\\n'))
+        for name, value in labels))
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and timing spans of a crawl or an
+    application.
+    Every finished span is sent to the exporter as it happens, totals are
+    available as a snapshot or in Prometheus text format
+    """
+
+    PREFIX = 'nordsee_'
+
+    def __init__(self, exporter=None):
+        """
+        Init metrics
+        :param exporter: JsonLinesExporter or alike to send span events to,
+        None to keep only totals
+        """
+        self.exporter = exporter
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._spans = {}
+        self._observers = []
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increase counter
+        :param name: counter name, like 'http_bytes'
+        :param value: amount to add
+        :param labels: counter labels, like status=200
+        """
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    def set(self, name, value, **labels):
+        """
+        Set gauge to current value
+        :param name: gauge name, like 'rate_limit_rate'
+        :param value: current value
+        :param labels: gauge labels, like host='karriere.nordsee.com'
+        """
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def add_observer(self, observer):
+        """
+        Tell observer when every span starts and finishes
+        :param observer: object with span_started(name) and
+        span_finished(name) methods, like Profiler
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Measure block of code
+        :param name: span name, like 'get_page_content'
+        :param attributes: details of the span sent to the exporter,
+        like url
+        """
+        for observer in self._observers:
+            observer.span_started(name)
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e.__class__.__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            for observer in self._observers:
+                observer.span_finished(name)
+            with self._lock:
+                span = self._spans.setdefault(
+                    name, {'count': 0, 'seconds': 0.0, 'max': 0.0,
+                           'errors': 0})
+                span['count'] += 1
+                span['seconds'] += seconds
+                span['max'] = max(span['max'], seconds)
+                if error:
+                    span['errors'] += 1
+            if self.exporter is not None:
+                event = {'type': 'span', 'name': name, 'start': started,
+                         'seconds': seconds, 'error': error}
+                event.update(attributes)
+                self.exporter.write(event)
+
+    def snapshot(self):
+        """
+        Current totals
+        :return: dict with counters, gauges and spans
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            spans = {name: dict(span) for name, span in self._spans.items()}
+
+        result = {'counters': {}, 'gauges': {}, 'spans': spans}
+        for (name, labels), value in counters:
+            key = name + _format_labels(labels)
+            result['counters'][key] = value
+        for (name, labels), value in gauges:
+            result['gauges'][name + _format_labels(labels)] = value
+        return result
+
+    def prometheus_text(self):
+        """
+        Totals in Prometheus text exposition format
+        :return: str
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            spans = sorted((name, dict(span))
+                           for name, span in self._spans.items())
+
+        lines = []
+        last_name = None
+        for (name, labels), value in counters:
+            metric = '{}{}_total'.format(self.PREFIX, name)
+            if name != last_name:
+                lines.append('# TYPE {} counter'.format(metric))
+                last_name = name
+            lines.append('{}{} {}'.format(metric, _format_labels(labels),
+                                          repr(float(value))))
+
+        last_name = None
+        for (name, labels), value in gauges:
+            metric = self.PREFIX + name
+            if name != last_name:
+                lines.append('# TYPE {} gauge'.format(metric))
+                last_name = name
+            lines.append('{}{} {}'.format(metric, _format_labels(labels),
+                                          repr(float(value))))
+
+        if spans:
+            metric = self.PREFIX + 'span_seconds'
+            lines.append('# TYPE {} summary'.format(metric))
+            for name, span in spans:
+                labels = _format_labels((('span', name),))
+                lines.append('{}_sum{} {}'.format(metric, labels,
+                                                  repr(span['seconds'])))
+                lines.append('{}_count{} {}'.format(metric, labels,
+                                                    span['count']))
+            metric = self.PREFIX + 'span_errors_total'
+            lines.append('# TYPE {} counter'.format(metric))
+            for name, span in spans:
+                lines.append('{}{} {}'.format(
+                    metric, _format_labels((('span', name),)),
+                    span['errors']))
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self):
+        """
+        Send totals to the exporter
+        :return: dict snapshot
+        """
+        snapshot = self.snapshot()
+        if self.exporter is not None:
+            event = {'type': 'snapshot', 'time': time.time()}
+            event.update(snapshot)
+            self.exporter.write(event)
+        return snapshot
+
+    def close(self):
+        """
+        Send totals and close the exporter
+        """
+        self.write_snapshot()
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """
+    Serve metrics for Prometheus at /metrics in a background thread
+    """
+    daemon_threads = True
+
+    def __init__(self, metrics, host='127.0.0.1', port=0):
+        """
+        Init server
+        :param metrics: Metrics to serve
+        :param host: interface to listen on
+        :param port: port to listen on, 0 for a free one
+        """
+        self.metrics = metrics
+        super().__init__((host, port), MetricsHandler)
+
+    @property
+    def url(self):
+        return 'http://{}:{}/metrics'.format(*self.server_address[:2])
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class PageCache:
+    """
+    On-disk HTTP cache keyed by url.
+    Stores page bodies with their ETag/Last-Modified validators and
+    the vacancy data parsed from them, evicting least recently used
+    pages together with their vacancy data once the bodies exceed
+    `max_size` bytes
+    """
+
+    INDEX_FILENAME = 'index.sqlite'
+    BODIES_DIR = 'bodies'
+
+    def __init__(self, cache_dir, max_size=200 * 1024 * 1024, refresh=False):
+        """
+        Open or create cache
+        :param cache_dir: directory to keep cache in
+        :param max_size: max total size of cached bodies in bytes
+        :param refresh: ignore cached entries, but keep updating them
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.refresh = refresh
+        self._bodies_dir = os.path.join(cache_dir, self.BODIES_DIR)
+
+        # create directory for cached bodies if it does not exists
+        if not os.path.exists(self._bodies_dir):
+            os.makedirs(self._bodies_dir)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, self.INDEX_FILENAME),
+            check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT,
+                hash TEXT, size INTEGER, accessed REAL);
+            CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+            CREATE TABLE IF NOT EXISTS vacancy_records (
+                identifier TEXT PRIMARY KEY, version TEXT, hash TEXT,
+                data TEXT);
+            CREATE INDEX IF NOT EXISTS vacancy_records_hash
+                ON vacancy_records (hash);
+        """)
+        self._size = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    @staticmethod
+    def content_hash(content):
+        """
+        Hash of page body
+        :param content: bytes
+        :return: str hex digest
+        """
+        return hashlib.sha1(content or b'').hexdigest()
+
+    def _body_path(self, url):
+        return os.path.join(self._bodies_dir,
+                            hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def lookup(self, url):
+        """
+        Get cached page
+        :param url: page url
+        :return: dict with etag, last_modified, hash and body or None
+        """
+        if self.refresh:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT etag, last_modified, hash FROM pages WHERE url = ?',
+                (url,)).fetchone()
+        if row is None:
+            return None
+
+        try:
+            with open(self._body_path(url), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'hash': row[2],
+                'body': body}
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Headers to revalidate cached page
+        :param entry: cache entry returned by lookup
+        :return: dict
+        """
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, url):
+        """
+        Mark cached page as recently used
+        :param url: page url
+        """
+        with self._lock, self._db:
+            self._db.execute('UPDATE pages SET accessed = ? WHERE url = ?',
+                             (time.time(), url))
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        Save page body and validators
+        :param url: page url
+        :param body: bytes
+        :param etag: ETag response header
+        :param last_modified: Last-Modified response header
+        :return: str body hash
+        """
+        digest = self.content_hash(body)
+        with open(self._body_path(url), 'wb') as f:
+            f.write(body)
+
+        with self._lock, self._db:
+            row = self._db.execute('SELECT size FROM pages WHERE url = ?',
+                                   (url,)).fetchone()
+            self._size += len(body) - (row[0] if row else 0)
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, digest, len(body), time.time()))
+            self._evict()
+        return digest
+
+    def _evict(self):
+        """
+        Remove least recently used pages and vacancy data parsed from
+        them until cache fits max_size
+        """
+        if self._size <= self.max_size:
+            return
+
+        rows = self._db.execute(
+            'SELECT url, size, hash FROM pages ORDER BY accessed').fetchall()
+        for url, size, page_hash in rows:
+            if self._size <= self.max_size:
+                break
+            self._db.execute('DELETE FROM pages WHERE url = ?', (url,))
+            self._db.execute('DELETE FROM vacancy_records WHERE hash = ?',
+                             (page_hash,))
+            self._size -= size
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+
+    def get_record(self, identifier, version):
+        """
+        Get vacancy data parsed on previous run
+        :param identifier: vacancy identifier
+        :param version: version of the vacancy data format
+        :return: tuple (page hash, dict with vacancy data) or None
+        """
+        if self.refresh or identifier is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT hash, data FROM vacancy_records '
+                'WHERE identifier = ? AND version = ?',
+                (identifier, version)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set_record(self, identifier, version, page_hash, data):
+        """
+        Save vacancy data parsed from page
+        :param identifier: vacancy identifier
+        :param version: version of the vacancy data format
+        :param page_hash: hash of the page data was parsed from
+        :param data: dict with vacancy data
+        """
+        if identifier is None:
+            return
+
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO vacancy_records VALUES (?, ?, ?, ?)',
+                (identifier, version, page_hash, json.dumps(data)))
+
+    def close(self):
+        self._db.close()
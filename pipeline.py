@@ -0,0 +1,252 @@
+import logging
+import queue
+import threading
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from extractors import extract_vacancy_data, parse_pool
+
+# marks the end of a stage output
+_DONE = object()
+
+
+class _StageError:
+    """
+    Exception raised in a stage thread, passed downstream to the consumer
+    """
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class _Stopped(Exception):
+    """
+    Consumer stopped reading vacancies
+    """
+
+
+class _CancellableExecutor:
+    """
+    ThreadPoolExecutor keeping its pending futures, so they can be
+    cancelled when the consumer stopped reading
+    """
+
+    def __init__(self, max_workers):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._futures = set()
+
+    def submit(self, fn, *args, **kwargs):
+        future = self._executor.submit(fn, *args, **kwargs)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def shutdown(self, cancel=False):
+        """
+        Wait for running futures
+        :param cancel: cancel futures not started yet
+        """
+        if cancel:
+            with self._lock:
+                futures = list(self._futures)
+            for future in futures:
+                future.cancel()
+        self._executor.shutdown(wait=True)
+
+
+class VacancyPipeline:
+    """
+    Crawl connected as stages running at the same time:
+    list pages -> detail pages fetch -> parse and enrich -> consumer.
+    Stages are joined by bounded queues, so fetching runs ahead of
+    parsing and writing by at most `queue_size` vacancies, and
+    vacancies come out in the order of the vacancy list pages
+    """
+
+    def __init__(self, parser, queue_size=50, enrichers=()):
+        """
+        Init pipeline
+        :param parser: NordseeParser to fetch and parse pages with
+        :param queue_size: max amount of vacancies waiting between stages
+        :param enrichers: callables taking and returning vacancy info,
+        applied after parsing
+        """
+        self.parser = parser
+        self.queue_size = queue_size
+        self.enrichers = enrichers
+        self._stop = None
+
+    def _put(self, target, item):
+        """
+        Put item to queue unless consumer has gone
+        """
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _run_stage(self, target, produce):
+        """
+        Run stage and always finish its output
+        :param target: output queue
+        :param produce: callable putting stage items to target
+        """
+        try:
+            produce()
+        except _Stopped:
+            return
+        except Exception as e:
+            logging.info('Pipeline stage failed: {}'.format(str(e)))
+            try:
+                self._put(target, _StageError(e))
+            except _Stopped:
+                return
+        try:
+            self._put(target, _DONE)
+        except _Stopped:
+            pass
+
+    def _get(self, source):
+        """
+        Get item from queue, re-raising errors of upstream stages
+        """
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                item = source.get(timeout=0.1)
+                break
+            except queue.Empty:
+                pass
+
+        if isinstance(item, _StageError):
+            raise item.exception
+        return item
+
+    def _list_stage(self, executor, list_queue):
+        """
+        Fetch list pages and put common vacancy info
+        """
+        for page in self.parser._iter_list_pages(executor):
+            for info_item in page:
+                self._put(list_queue, info_item)
+        logging.info('Urls parsed')
+
+    def _fetch_stage(self, executor, list_queue, fetch_queue):
+        """
+        Start fetching detail pages, keeping the list order
+        """
+        while True:
+            info_item = self._get(list_queue)
+            if info_item is _DONE:
+                return
+            future = executor.submit(self.parser._get_page_content,
+                                     url=info_item['url'])
+            self._put(fetch_queue, (info_item, future))
+
+    def _enrich(self, vacancy, vacancy_queue):
+        for enrich in self.enrichers:
+            vacancy = enrich(vacancy)
+        self._put(vacancy_queue, vacancy)
+
+    def _parse_stage(self, fetch_queue, vacancy_queue):
+        """
+        Parse fetched detail pages and enrich vacancies
+        """
+        while True:
+            item = self._get(fetch_queue)
+            if item is _DONE:
+                return
+            info_item, future = item
+            vacancy = self.parser._get_vacancy(info_item,
+                                               content=future.result())
+            if vacancy is not None:
+                self._enrich(vacancy, vacancy_queue)
+
+    def _process_parse_stage(self, fetch_queue, vacancy_queue):
+        """
+        Parse fetched detail pages in worker processes.
+        Up to `queue_size` pages are parsed at once, results are put
+        in the list order
+        """
+        parser = self.parser
+        pending = deque()
+
+        def finish():
+            info_item, content, vacancy_data = pending.popleft()
+            if isinstance(vacancy_data, Future):
+                url = info_item['url']
+                with parser.metrics.span('get_vacancy_data', url=url):
+                    vacancy_data = vacancy_data.result()
+                logging.info('Vacancy data got: {}'.format(url))
+                parser._cache_vacancy_data(info_item, content, vacancy_data)
+            self._enrich(parser._complete_vacancy(info_item, vacancy_data),
+                         vacancy_queue)
+
+        with parse_pool(parser.parse_workers) as pool:
+            while True:
+                item = self._get(fetch_queue)
+                if item is _DONE:
+                    break
+                info_item, future = item
+                content = future.result()
+                if content is None:
+                    parser._skip_vacancy(info_item)
+                    continue
+                vacancy_data = parser._get_cached_vacancy_data(info_item,
+                                                               content)
+                if vacancy_data is None:
+                    vacancy_data = pool.submit(extract_vacancy_data,
+                                               parser.extractor_name, content)
+                pending.append((info_item, content, vacancy_data))
+                if len(pending) >= self.queue_size:
+                    finish()
+
+            while pending:
+                finish()
+
+    def __iter__(self):
+        self._stop = threading.Event()
+        list_queue = queue.Queue(self.queue_size)
+        fetch_queue = queue.Queue(self.queue_size)
+        vacancy_queue = queue.Queue(self.queue_size)
+        executor = _CancellableExecutor(self.parser.max_workers)
+
+        parse_stage = self._parse_stage
+        if self.parser.parse_workers:
+            parse_stage = self._process_parse_stage
+
+        stages = (
+            (vacancy_queue, lambda: parse_stage(fetch_queue, vacancy_queue)),
+            (fetch_queue, lambda: self._fetch_stage(executor, list_queue,
+                                                    fetch_queue)),
+            (list_queue, lambda: self._list_stage(executor, list_queue)),
+        )
+        threads = [threading.Thread(target=self._run_stage, args=stage,
+                                    daemon=True)
+                   for stage in stages]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                vacancy = self._get(vacancy_queue)
+                if vacancy is _DONE:
+                    break
+                yield vacancy
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            executor.shutdown(cancel=True)
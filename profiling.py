@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import time
+import logging
+import threading
+import tracemalloc
+
+from collections import Counter, defaultdict
+
+# innermost frames of a thread waiting for the network
+NETWORK_FILES = ('socket.py', 'ssl.py', 'selectors.py',
+                 os.path.join('http', 'client.py'),
+                 os.path.join('urllib3', 'util', 'wait.py'),
+                 os.path.join('urllib3', 'connection.py'))
+# innermost frames of a thread waiting for other threads, the rate limit
+# or the browser
+WAIT_FILES = ('threading.py', 'queue.py',
+              os.path.join('concurrent', 'futures', 'thread.py'),
+              os.path.join('concurrent', 'futures', '_base.py'),
+              'throttling.py', 'waits.py')
+
+NETWORK = 'network'
+CPU = 'cpu'
+WAIT = 'wait'
+
+# pool threads like ThreadPoolExecutor-0_3 are one flamegraph root
+_THREAD_NUMBER_RE = re.compile(r'_\d+$')
+
+
+def classify(filename):
+    """
+    What a thread is doing judging by its innermost Python frame
+    :param filename: file of the innermost frame
+    :return: NETWORK, WAIT or CPU
+    """
+    if filename.endswith(NETWORK_FILES):
+        return NETWORK
+    if filename.endswith(WAIT_FILES):
+        return WAIT
+    return CPU
+
+
+def _frame_name(code):
+    return '{}:{}'.format(os.path.basename(code.co_filename), code.co_name)
+
+
+def _format_size(size):
+    return '{:.1f} MB'.format(size / 1024.0 / 1024.0)
+
+
+class Profiler:
+    """
+    Sampling profiler of all threads of a run with tracemalloc memory
+    tracking. A background thread takes the stack of every other thread
+    every `interval` seconds, so pool threads fetching and parsing pages
+    are profiled too, unlike with cProfile. Samples give the top
+    functions, the split of thread time between network, CPU and waiting,
+    and a collapsed-stack file for flamegraph.pl or speedscope. Spans of
+    the metrics are the stages whose peak memory is reported.
+    When disabled, entering and leaving the profiler does nothing
+    """
+
+    INTERVAL = 0.005
+    TOP = 25
+
+    def __init__(self, output_dir, name, metrics=None, enabled=True,
+                 interval=None, top=None):
+        """
+        Init profiler
+        :param output_dir: directory to write the report and stacks to
+        :param name: name of the run, prefix of the files
+        :param metrics: Metrics whose spans are the stages
+        :param enabled: False to profile nothing
+        :param interval: seconds between samples
+        :param top: amount of functions in the report
+        """
+        self.output_dir = output_dir
+        self.name = name
+        self.metrics = metrics
+        self.enabled = enabled
+        self.interval = interval or self.INTERVAL
+        self.top = top or self.TOP
+        self.report_path = None
+        self.stacks_path = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = Counter()
+        self._own = Counter()
+        self._total = Counter()
+        self._split = Counter()
+        self._active = Counter()
+        self._stage_peaks = defaultdict(int)
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        if self.metrics is not None:
+            self.metrics.add_observer(self)
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self._thread = threading.Thread(target=self._run, name='profiler',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.enabled:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        self.cpu_seconds = time.process_time() - self._cpu_started
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        if self.metrics is not None:
+            self.metrics.remove_observer(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.write()
+        logging.info('Profile written to {} and {}'.format(
+            self.report_path, self.stacks_path))
+        return False
+
+    def span_started(self, name):
+        memory = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            self._active[name] += 1
+            self._stage_peaks[name] = max(self._stage_peaks[name], memory)
+
+    def span_finished(self, name):
+        memory = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            self._stage_peaks[name] = max(self._stage_peaks[name], memory)
+            self._active[name] -= 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own_ident)
+
+    def _sample(self, own_ident):
+        """
+        Take stacks of all threads but the profiler and the memory in use
+        """
+        names = {thread.ident: _THREAD_NUMBER_RE.sub('', thread.name)
+                 for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if not stack:
+                continue
+            stack.reverse()
+            frames = [_frame_name(code) for code in stack]
+            self._stacks[';'.join(
+                [names.get(ident, 'thread')] + frames)] += 1
+            self._own[frames[-1]] += 1
+            self._total.update(set(frames))
+            self._split[classify(stack[-1].co_filename)] += 1
+
+        memory = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            for name, active in self._active.items():
+                if active:
+                    self._stage_peaks[name] = max(self._stage_peaks[name],
+                                                  memory)
+
+    def report(self):
+        """
+        Results of the run
+        :return: dict with seconds, cpu seconds, samples, share of thread
+        samples per activity, top functions, peak memory and peak memory
+        per stage
+        """
+        samples = sum(self._split.values())
+        busy = self._split[NETWORK] + self._split[CPU]
+        return {
+            'seconds': self.seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'samples': samples,
+            'split': {activity: (self._split[activity] / samples
+                                 if samples else 0.0)
+                      for activity in (NETWORK, CPU, WAIT)},
+            'busy_split': {activity: (self._split[activity] / busy
+                                      if busy else 0.0)
+                           for activity in (NETWORK, CPU)},
+            'top': [(name, count, self._total[name])
+                    for name, count in self._own.most_common(self.top)],
+            'peak_memory': self.peak_memory,
+            'stage_peak_memory': dict(self._stage_peaks),
+        }
+
+    def format_report(self, report):
+        """
+        Report as text
+        :param report: dict from report()
+        :return: str
+        """
+        samples = report['samples'] or 1
+        lines = [
+            'Profile of {}'.format(self.name),
+            'wall {:.2f}s, cpu {:.2f}s, {} thread samples every {:.0f} '
+            'ms'.format(report['seconds'], report['cpu_seconds'],
+                        report['samples'], self.interval * 1000),
+            'thread time: network {:.1%}, cpu {:.1%}, waiting {:.1%}'.format(
+                report['split'][NETWORK], report['split'][CPU],
+                report['split'][WAIT]),
+            'busy thread time: network {:.1%}, cpu {:.1%}'.format(
+                report['busy_split'][NETWORK], report['busy_split'][CPU]),
+            'peak memory: {}'.format(_format_size(report['peak_memory'])),
+            '',
+            'peak memory per stage:',
+        ]
+        for name, size in sorted(report['stage_peak_memory'].items(),
+                                 key=lambda item: (-item[1], item[0])):
+            lines.append('    {:<32} {:>10}'.format(name, _format_size(size)))
+        lines.extend(['', 'top functions by own samples:',
+                      '    {:>6} {:>7}  function'.format('own', 'total')])
+        for name, own, total in report['top']:
+            lines.append('    {:>6.1%} {:>7.1%}  {}'.format(
+                own / samples, total / samples, name))
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """
+        Write the report and the collapsed stacks
+        :return: tuple (report path, stacks path)
+        """
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        prefix = os.path.join(self.output_dir, '{}-{}'.format(
+            self.name, time.strftime('%Y%m%d-%H%M%S')))
+        self.report_path = prefix + '.txt'
+        self.stacks_path = prefix + '.collapsed'
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            f.write(self.format_report(self.report()))
+        with open(self.stacks_path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write('{} {}\n'.format(stack, count))
+        return self.report_path, self.stacks_path
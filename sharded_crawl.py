@@ -0,0 +1,696 @@
+import os
+import json
+import time
+import socket
+import logging
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from delta import vacancy_key
+from sinks import XmlSink
+from vacancy import Vacancy
+
+# kinds of shards and of their results
+LIST_SHARD = 'list_page'
+VACANCY_SHARD = 'vacancy'
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ShardQueue(ABC):
+    """
+    Work queue shared by the coordinator and the workers of a sharded
+    crawl. A worker leases a shard for a limited time and renews the lease
+    while working on it; shards of workers which stopped renewing are
+    leased again to other workers. Results of finished shards are kept in
+    the queue until they are merged. Backends implement the abstract
+    methods
+    """
+
+    lease_seconds = 120
+
+    @abstractmethod
+    def get_meta(self, key):
+        """
+        :return: meta value of key or None
+        """
+
+    @abstractmethod
+    def set_meta(self, key, value):
+        """
+        Save json serializable meta value of key
+        """
+
+    @abstractmethod
+    def put(self, shards, results=(), meta=None):
+        """
+        Add shards, results and meta at once
+        :param shards: list of (kind, payload)
+        :param results: list of (kind, key, position, data)
+        :param meta: dict of meta values
+        """
+
+    @abstractmethod
+    def lease(self, worker):
+        """
+        Lease the next pending shard or a shard of a dead worker
+        :param worker: str worker id
+        :return: dict with id, kind, payload and attempts, or None when no
+        shard can be leased now
+        """
+
+    @abstractmethod
+    def renew(self, shard_id, worker):
+        """
+        Extend lease of shard
+        :return: bool, False when the lease was lost to another worker
+        """
+
+    @abstractmethod
+    def complete(self, shard_id, worker, results=(), shards=(), retry=None):
+        """
+        Save results of leased shard and mark it done
+        :param results: list of (kind, key, position, data)
+        :param shards: list of (kind, payload) of new shards
+        :param retry: payload of items which failed, leased again as a
+        shard of the same kind while attempts are left
+        :return: bool, False when the lease was lost and nothing was saved
+        """
+
+    @abstractmethod
+    def release(self, shard_id, worker, error):
+        """
+        Give back leased shard which failed as a whole
+        :param error: error description
+        """
+
+    @abstractmethod
+    def results(self, kind):
+        """
+        Results of kind ordered by position and key
+        :return: generator of data
+        """
+
+    @abstractmethod
+    def get_result(self, kind, key):
+        """
+        :return: data or None
+        """
+
+    @abstractmethod
+    def counts(self):
+        """
+        Amount of shards per state
+        :return: dict state -> int
+        """
+
+    @abstractmethod
+    def failed(self):
+        """
+        Shards which were given up
+        :return: list of dicts with kind, payload and error
+        """
+
+    @abstractmethod
+    def record_worker(self, worker, items, seconds):
+        """
+        Add work done by worker to its stats
+        :param items: amount of pages fetched
+        :param seconds: seconds spent on them
+        """
+
+    @abstractmethod
+    def workers(self):
+        """
+        Stats of every worker
+        :return: list of dicts with worker, shards, items, seconds and
+        items_per_second
+        """
+
+    def unfinished(self):
+        """
+        Amount of shards which are pending or leased
+        :return: int
+        """
+        counts = self.counts()
+        return counts.get(PENDING, 0) + counts.get(LEASED, 0)
+
+    def close(self):
+        pass
+
+
+class SqliteShardQueue(ShardQueue):
+    """
+    Shard queue in a SQLite file, shared by the worker processes of one
+    host. The file is in WAL mode, which does not work on network file
+    systems, so it can not be shared by hosts. Leases are taken in
+    immediate transactions, so a shard is leased by one worker at a time
+    """
+
+    def __init__(self, filepath, lease_seconds=120, max_attempts=3):
+        """
+        Open or create queue
+        :param filepath: path of the sqlite file
+        :param lease_seconds: seconds a worker holds a shard without
+        renewing the lease before it is given to another worker
+        :param max_attempts: leases of a shard before it is given up
+        """
+        self.filepath = filepath
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # transactions are begun explicitly
+        self._db = sqlite3.connect(filepath, timeout=60,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT,
+                payload TEXT, state TEXT, worker TEXT, expires REAL,
+                attempts INTEGER, error TEXT);
+            CREATE INDEX IF NOT EXISTS shards_state ON shards (state);
+            CREATE TABLE IF NOT EXISTS results (
+                kind TEXT, key TEXT, position INTEGER, data TEXT,
+                PRIMARY KEY (kind, key));
+            CREATE TABLE IF NOT EXISTS workers (
+                worker TEXT PRIMARY KEY, shards INTEGER, items INTEGER,
+                seconds REAL, seen REAL);
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?',
+                                   (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                       (key, json.dumps(value)))
+
+    @staticmethod
+    def _insert_shards(db, shards, attempts=0, state=PENDING, error=None):
+        db.executemany(
+            'INSERT INTO shards (kind, payload, state, attempts, error) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(kind, json.dumps(payload, ensure_ascii=False), state,
+              attempts, error) for kind, payload in shards])
+
+    @staticmethod
+    def _insert_results(db, results):
+        db.executemany(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+            [(kind, key, position, json.dumps(data, ensure_ascii=False))
+             for kind, key, position, data in results])
+
+    def put(self, shards, results=(), meta=None):
+        with self._transaction() as db:
+            self._insert_shards(db, shards)
+            self._insert_results(db, results)
+            for key, value in (meta or {}).items():
+                db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                           (key, json.dumps(value)))
+
+    def lease(self, worker):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE shards SET state = ?, error = ? WHERE state = ? '
+                'AND expires < ? AND attempts >= ?',
+                (FAILED, 'lease expired', LEASED, now, self.max_attempts))
+            reassigned = db.execute(
+                'UPDATE shards SET state = ? WHERE state = ? AND expires < ?',
+                (PENDING, LEASED, now)).rowcount
+            row = db.execute(
+                'SELECT id, kind, payload, attempts FROM shards '
+                'WHERE state = ? ORDER BY id LIMIT 1', (PENDING,)).fetchone()
+            if row is not None:
+                db.execute(
+                    'UPDATE shards SET state = ?, worker = ?, expires = ?, '
+                    'attempts = attempts + 1 WHERE id = ?',
+                    (LEASED, worker, now + self.lease_seconds, row[0]))
+        if reassigned:
+            logging.info('{} shards of dead workers reassigned'.format(
+                reassigned))
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]),
+                'attempts': row[3] + 1}
+
+    def renew(self, shard_id, worker):
+        with self._transaction() as db:
+            return bool(db.execute(
+                'UPDATE shards SET expires = ? WHERE id = ? AND worker = ? '
+                'AND state = ?', (time.time() + self.lease_seconds,
+                                  shard_id, worker, LEASED)).rowcount)
+
+    def complete(self, shard_id, worker, results=(), shards=(), retry=None):
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT kind, attempts FROM shards WHERE id = ? AND '
+                'worker = ? AND state = ?',
+                (shard_id, worker, LEASED)).fetchone()
+            if row is None:
+                return False
+            kind, attempts = row
+            db.execute('UPDATE shards SET state = ? WHERE id = ?',
+                       (DONE, shard_id))
+            self._insert_results(db, results)
+            self._insert_shards(db, shards)
+            if retry:
+                if attempts < self.max_attempts:
+                    self._insert_shards(db, [(kind, retry)],
+                                        attempts=attempts)
+                else:
+                    self._insert_shards(db, [(kind, retry)],
+                                        attempts=attempts, state=FAILED,
+                                        error='too many attempts')
+        return True
+
+    def release(self, shard_id, worker, error):
+        with self._transaction() as db:
+            db.execute(
+                'UPDATE shards SET state = CASE WHEN attempts < ? THEN ? '
+                'ELSE ? END, error = ?, worker = NULL WHERE id = ? AND '
+                'worker = ? AND state = ?',
+                (self.max_attempts, PENDING, FAILED, error, shard_id,
+                 worker, LEASED))
+
+    def results(self, kind):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT data FROM results WHERE kind = ? '
+                'ORDER BY position, key', (kind,)).fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def get_result(self, kind, key):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM results WHERE kind = ? AND key = ?',
+                (kind, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT state, COUNT(*) FROM shards GROUP BY state'))
+
+    def failed(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT kind, payload, error FROM shards WHERE state = ? '
+                'ORDER BY id', (FAILED,)).fetchall()
+        return [{'kind': kind, 'payload': json.loads(payload),
+                 'error': error} for kind, payload, error in rows]
+
+    def record_worker(self, worker, items, seconds):
+        with self._transaction() as db:
+            updated = db.execute(
+                'UPDATE workers SET shards = shards + 1, '
+                'items = items + ?, seconds = seconds + ?, seen = ? '
+                'WHERE worker = ?',
+                (items, seconds, time.time(), worker)).rowcount
+            if not updated:
+                db.execute('INSERT INTO workers VALUES (?, 1, ?, ?, ?)',
+                           (worker, items, seconds, time.time()))
+
+    def workers(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT worker, shards, items, seconds FROM workers '
+                'ORDER BY worker').fetchall()
+        return [{'worker': worker, 'shards': shards, 'items': items,
+                 'seconds': seconds,
+                 'items_per_second': items / seconds if seconds else 0.0}
+                for worker, shards, items, seconds in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+QUEUE_BACKENDS = {
+    'sqlite': SqliteShardQueue,
+}
+
+
+def open_queue(location, backend='sqlite', **options):
+    """
+    Open shard queue
+    :param location: location of the queue, like the sqlite file path
+    :param backend: name in QUEUE_BACKENDS
+    :param options: backend options like lease_seconds
+    :return: ShardQueue
+    """
+    try:
+        factory = QUEUE_BACKENDS[backend]
+    except KeyError:
+        raise ValueError('Unknown queue backend {}, available: {}'.format(
+            backend, ', '.join(sorted(QUEUE_BACKENDS))))
+    return factory(location, **options)
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class ShardedCrawl:
+    """
+    Coordinator of a crawl split into shards. `plan` fetches the first
+    list page and puts the offsets of the other list pages on the queue,
+    workers crawling a list shard put its vacancy urls on the queue as
+    vacancy shards, and `merge` writes the results in the order of the
+    list pages, so the output does not depend on which worker crawled what
+    """
+
+    def __init__(self, parser, queue, pages_per_shard=5,
+                 vacancies_per_shard=20, enrichers=()):
+        """
+        Init crawl
+        :param parser: NordseeParser to fetch the first page and to write
+        the output with
+        :param queue: ShardQueue
+        :param pages_per_shard: list pages per shard
+        :param vacancies_per_shard: vacancy pages per shard
+        :param enrichers: callables taking and returning vacancy info,
+        applied when merging
+        """
+        self.parser = parser
+        self.queue = queue
+        self.pages_per_shard = pages_per_shard
+        self.vacancies_per_shard = vacancies_per_shard
+        self.enrichers = enrichers
+
+    def plan(self):
+        """
+        Put the crawl on the queue, unless it is there already
+        :return: int pages amount
+        """
+        pages_amount = self.queue.get_meta('pages_amount')
+        if pages_amount is not None:
+            logging.info('Crawl of {} pages already planned'.format(
+                pages_amount))
+            return pages_amount
+
+        pages_amount, vacancies = self.parser._get_first_list_page()
+        infos = [dict(vacancy) for vacancy in vacancies]
+        shards = [(LIST_SHARD, pages) for pages in _chunks(
+            list(range(1, pages_amount)), self.pages_per_shard)]
+        shards.extend((VACANCY_SHARD, chunk) for chunk in _chunks(
+            infos, self.vacancies_per_shard))
+        self.queue.put(shards, results=[(LIST_SHARD, '0', 0, infos)],
+                       meta={'page_size': self.parser.page_size,
+                             'vacancies_per_shard': self.vacancies_per_shard,
+                             'pages_amount': pages_amount})
+        logging.info('Planned {} shards for {} pages'.format(
+            len(shards), pages_amount))
+        return pages_amount
+
+    def __iter__(self):
+        """
+        Finished vacancies in list order, each one once
+        :return: generator of Vacancy
+        """
+        seen = set()
+        for vacancy_info_list in self.queue.results(LIST_SHARD):
+            for info_item in vacancy_info_list:
+                key = vacancy_key(info_item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                data = self.queue.get_result(VACANCY_SHARD, info_item['url'])
+                if data is None:
+                    continue
+                vacancy = Vacancy.from_dict(data)
+                for enrich in self.enrichers:
+                    vacancy = enrich(vacancy)
+                yield vacancy
+
+    def merge(self, sink=None):
+        """
+        Write finished vacancies
+        :param sink: sink to write to, by default the xml file
+        :return: sink
+        """
+        unfinished = self.queue.unfinished()
+        if unfinished:
+            logging.info('Merging while {} shards are unfinished'.format(
+                unfinished))
+        if sink is None:
+            sink = XmlSink(self.parser._get_output_filepath())
+        return self.parser._write_to_sink(iter(self), sink)
+
+
+class _LeaseLost(Exception):
+    """
+    Shard was given to another worker
+    """
+
+
+class ShardWorker:
+    """
+    Worker leasing shards from the queue until the crawl is finished.
+    Pages are fetched with `parser.max_workers` threads; list pages or
+    vacancies which can not be fetched are put back as a smaller shard
+    """
+
+    def __init__(self, parser, queue, worker_id=None, poll_interval=1.0):
+        """
+        Init worker
+        :param parser: NordseeParser to fetch and parse pages with
+        :param queue: ShardQueue
+        :param worker_id: unique worker id, by default host and pid
+        :param poll_interval: seconds to wait when every unfinished shard
+        is leased by other workers
+        """
+        self.parser = parser
+        self.queue = queue
+        self.worker_id = worker_id or '{}:{}'.format(socket.gethostname(),
+                                                     os.getpid())
+        self.poll_interval = poll_interval
+        self.shards = 0
+        self.items = 0
+        self.seconds = 0.0
+
+    def _fetch(self, executor, shard, urls, params=None):
+        """
+        Fetch pages of shard concurrently, renewing its lease
+        :param urls: list of urls
+        :param params: list of query params of every url
+        :return: generator of (index, content)
+        """
+        params = params or [None] * len(urls)
+        renew_at = time.time() + self.queue.lease_seconds / 2.0
+        contents = executor.map(
+            lambda index: self.parser._get_page_content(
+                urls[index], params=params[index]), range(len(urls)))
+        for index, content in enumerate(contents):
+            if time.time() > renew_at:
+                if not self.queue.renew(shard['id'], self.worker_id):
+                    raise _LeaseLost()
+                renew_at = time.time() + self.queue.lease_seconds / 2.0
+            yield index, content
+
+    def _crawl_pages(self, executor, shard):
+        """
+        Fetch list pages of shard
+        :return: tuple (results, new vacancy shards, failed pages)
+        """
+        self.parser.page_size = self.queue.get_meta('page_size')
+        vacancies_per_shard = self.queue.get_meta('vacancies_per_shard')
+        pages = shard['payload']
+        params = [self.parser._page_params(page) for page in pages]
+        urls = [self.parser.VACANCY_LIST_URL] * len(pages)
+        results, shards, failed = [], [], []
+        for index, content in self._fetch(executor, shard, urls, params):
+            page = pages[index]
+            if content is None:
+                self.parser._skip_list_page(page)
+                failed.append(page)
+                continue
+            infos = [dict(vacancy) for vacancy in
+                     self.parser._get_common_vacancy_info(page,
+                                                          content=content)]
+            results.append((LIST_SHARD, str(page), page, infos))
+            shards.extend((VACANCY_SHARD, chunk)
+                          for chunk in _chunks(infos, vacancies_per_shard))
+        return results, shards, failed
+
+    def _crawl_vacancies(self, executor, shard):
+        """
+        Fetch and parse vacancies of shard
+        :return: tuple (results, no new shards, failed vacancies)
+        """
+        infos = shard['payload']
+        urls = [info['url'] for info in infos]
+        results, failed = [], []
+        for index, content in self._fetch(executor, shard, urls):
+            info_item = Vacancy.from_dict(infos[index])
+            if content is None:
+                self.parser._skip_vacancy(info_item)
+                failed.append(infos[index])
+                continue
+            vacancy = self.parser._get_vacancy(info_item, content=content)
+            results.append((VACANCY_SHARD, urls[index], 0, dict(vacancy)))
+        return results, [], failed
+
+    def _process(self, executor, shard):
+        """
+        Crawl leased shard and save its results
+        :param shard: dict from ShardQueue.lease
+        """
+        crawl = {LIST_SHARD: self._crawl_pages,
+                 VACANCY_SHARD: self._crawl_vacancies}[shard['kind']]
+        started = time.perf_counter()
+        try:
+            with self.parser.metrics.span('shard', kind=shard['kind'],
+                                          worker=self.worker_id):
+                results, shards, failed = crawl(executor, shard)
+        except _LeaseLost:
+            logging.info('Lease of shard {} lost'.format(shard['id']))
+            return
+        except Exception as e:
+            logging.info('Shard {} failed: {}'.format(shard['id'], str(e)))
+            self.queue.release(shard['id'], self.worker_id, str(e))
+            return
+        if not self.queue.complete(shard['id'], self.worker_id,
+                                   results=results, shards=shards,
+                                   retry=failed):
+            logging.info('Lease of shard {} lost'.format(shard['id']))
+            return
+
+        seconds = time.perf_counter() - started
+        items = len(shard['payload'])
+        self.queue.record_worker(self.worker_id, items, seconds)
+        self.shards += 1
+        self.items += items
+        self.seconds += seconds
+        self.parser.metrics.inc('shards', kind=shard['kind'])
+        self.parser.metrics.set('worker_pages_per_second',
+                                self.items / self.seconds,
+                                worker=self.worker_id)
+        logging.info('Worker {} finished {} shard {}: {} pages in {:.2f}s, '
+                     '{} failed'.format(self.worker_id, shard['kind'],
+                                        shard['id'], items, seconds,
+                                        len(failed)))
+
+    def run(self):
+        """
+        Work on shards until none is pending or leased
+        :return: dict with amounts of shards, pages, seconds and pages
+        per second of this worker
+        """
+        with ThreadPoolExecutor(
+                max_workers=max(self.parser.max_workers, 1)) as executor:
+            while True:
+                shard = self.queue.lease(self.worker_id)
+                if shard is not None:
+                    self._process(executor, shard)
+                elif self.queue.unfinished():
+                    # leased by others, maybe by a dead worker
+                    time.sleep(self.poll_interval)
+                else:
+                    break
+        stats = {'worker': self.worker_id, 'shards': self.shards,
+                 'pages': self.items, 'seconds': self.seconds,
+                 'pages_per_second': (self.items / self.seconds
+                                      if self.seconds else 0.0)}
+        logging.info('Worker finished: {}'.format(stats))
+        return stats
+
+
+def run_worker(queue_path, queue_options, parser_options):
+    """
+    Run worker with its own parser and queue connection, e.g. in a
+    separate process
+    :param queue_path: path of the sqlite queue
+    :param queue_options: SqliteShardQueue options
+    :param parser_options: NordseeParser options
+    :return: dict with worker stats
+    """
+    from vacancy_parser import NordseeParser
+
+    logging.basicConfig(filename='logs.log', level=logging.INFO)
+    queue = open_queue(queue_path, **queue_options)
+    try:
+        return ShardWorker(NordseeParser(**parser_options), queue).run()
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    from vacancy_parser import NordseeParser
+
+    logging.basicConfig(filename='logs.log', level=logging.INFO)
+
+    arg_parser = argparse.ArgumentParser(
+        description='Crawl Nordsee vacancies with several workers')
+    arg_parser.add_argument('command',
+                            choices=('plan', 'work', 'merge', 'status'))
+    arg_parser.add_argument('--queue', default='crawl_queue.sqlite',
+                            help='queue file shared by the workers')
+    arg_parser.add_argument('--backend', choices=sorted(QUEUE_BACKENDS),
+                            default='sqlite', help='queue backend')
+    arg_parser.add_argument('--lease', type=float, default=120,
+                            help='seconds until a shard of a worker which '
+                                 'stopped is reassigned')
+    arg_parser.add_argument('--max-attempts', type=int, default=3,
+                            help='leases of a shard before it is given up')
+    arg_parser.add_argument('--pages-per-shard', type=int, default=5)
+    arg_parser.add_argument('--vacancies-per-shard', type=int, default=20)
+    arg_parser.add_argument('--processes', type=int, default=1,
+                            help='amount of worker processes to start')
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help='max amount of pages fetched at once '
+                                 'by every worker')
+    arg_parser.add_argument('--rate-limit', type=float, default=None,
+                            help='max requests per second of every worker')
+    args = arg_parser.parse_args()
+
+    queue_options = {'backend': args.backend, 'lease_seconds': args.lease,
+                     'max_attempts': args.max_attempts}
+    parser_options = {'max_workers': args.workers,
+                      'rate_limit': args.rate_limit}
+    if args.command == 'work':
+        with multiprocessing.Pool(args.processes) as pool:
+            stats = pool.starmap(run_worker, [
+                (args.queue, queue_options, parser_options)
+            ] * args.processes)
+        print(json.dumps(stats, indent=2))
+    else:
+        queue = open_queue(args.queue, **queue_options)
+        crawl = ShardedCrawl(NordseeParser(**parser_options), queue,
+                             pages_per_shard=args.pages_per_shard,
+                             vacancies_per_shard=args.vacancies_per_shard)
+        try:
+            if args.command == 'plan':
+                crawl.plan()
+            elif args.command == 'merge':
+                print('{} vacancies written'.format(crawl.merge().count))
+            print(json.dumps({'shards': queue.counts(),
+                              'workers': queue.workers()}, indent=2))
+        finally:
+            queue.close()
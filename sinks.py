@@ -0,0 +1,140 @@
+import json
+import os
+
+from compression import SUFFIXES, available, open_output
+from xml_writer import StreamingXmlWriter
+
+# xml sink writing positions one by one with atomic replace at the end
+XmlSink = StreamingXmlWriter
+
+
+class JsonLinesSink:
+    """
+    Write every vacancy as one json line.
+    Like the xml sink it writes to a temporary file which replaces
+    `filepath` when writing finished without errors
+    """
+
+    TMP_SUFFIX = '.part'
+
+    def __init__(self, filepath, compression=None):
+        """
+        Init sink
+        :param filepath: final file path
+        :param compression: None, 'gzip' or 'zstd' to compress the file
+        while it is written
+        """
+        self.filepath = filepath
+        self.tmp_filepath = filepath + self.TMP_SUFFIX
+        self.compression = compression
+        self.count = 0
+
+    def __enter__(self):
+        self._file = open_output(self.tmp_filepath, self.compression)
+        return self
+
+    def write(self, data):
+        """
+        Write vacancy and flush it to disk, compressed output is flushed
+        only at the end to keep its ratio
+        :param data: Vacancy or dict with vacancy info
+        """
+        line = json.dumps(dict(data), ensure_ascii=False) + '\n'
+        self._file.write(line.encode('utf-8'))
+        if self.compression is None:
+            self._file.flush()
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_filepath, self.filepath)
+        return False
+
+
+class CallbackSink:
+    """
+    Pass every vacancy to a callable, e.g. a downstream importer
+    """
+
+    def __init__(self, callback):
+        """
+        Init sink
+        :param callback: callable taking Vacancy
+        """
+        self.callback = callback
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def write(self, data):
+        self.callback(data)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# output format name -> (callable taking file path and returning sink,
+# file extension)
+SINKS = {}
+
+
+def register_sink(name, factory, extension):
+    """
+    Register output format
+    :param name: format name, e.g. for the --format option
+    :param factory: callable taking file path and returning sink
+    :param extension: file extension without leading dot
+    """
+    SINKS[name] = (factory, extension)
+
+
+def create_sink(name, filepath):
+    """
+    Create sink of registered output format
+    :param name: format name
+    :param filepath: final file path
+    :return: sink
+    """
+    try:
+        factory, _ = SINKS[name]
+    except KeyError:
+        raise ValueError('Unknown output format {}, choose one of {}'.format(
+            name, ', '.join(sorted(SINKS))))
+    return factory(filepath)
+
+
+def sink_extension(name):
+    """
+    File extension of registered output format
+    :param name: format name
+    :return: str
+    """
+    return SINKS[name][1]
+
+
+def _register_builtin_sinks():
+    formats = (
+        ('xml', 'xml', lambda filepath, codec: XmlSink(
+            filepath, compression=codec)),
+        ('xml-compact', 'xml', lambda filepath, codec: XmlSink(
+            filepath, pretty_print=False, compact=True, compression=codec)),
+        ('jsonl', 'jsonl', lambda filepath, codec: JsonLinesSink(
+            filepath, compression=codec)),
+    )
+    for name, extension, factory in formats:
+        register_sink(name, lambda filepath, factory=factory: factory(
+            filepath, None), extension)
+        for codec, suffix in SUFFIXES.items():
+            if not available(codec):
+                continue
+            register_sink(
+                name + suffix,
+                lambda filepath, factory=factory, codec=codec: factory(
+                    filepath, codec),
+                extension + suffix)
+
+
+_register_builtin_sinks()
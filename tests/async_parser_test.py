@@ -0,0 +1,194 @@
+import asyncio
+import shutil
+import sys
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from lxml import etree
+
+sys.path.append('..')
+
+import async_parser
+from async_parser import AsyncNordseeParser
+from benchmarks.stub_site import StubSiteServer
+from page_cache import PageCache
+from sinks import CallbackSink
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+VACANCIES_AMOUNT = 45
+IDENTIFIERS = [str(i) for i in range(VACANCIES_AMOUNT)]
+
+
+class AsyncParserTestCase(unittest.TestCase):
+    """
+    Async parser tests against the local stub site
+    """
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT)
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.loop.close()
+
+    def _parser(self, **kwargs):
+        parser = AsyncNordseeParser(**kwargs)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        return parser
+
+    def _collect(self, parser, **kwargs):
+        async def collect():
+            return [vacancy async for vacancy in
+                    parser.aiter_vacancies(**kwargs)]
+        return self.loop.run_until_complete(collect())
+
+    def test_aiter_vacancies(self):
+        """
+        Test vacancies come in list order with descriptions
+        """
+        result = self._collect(self._parser(max_workers=8), queue_size=10)
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+        self.assertTrue(all(vacancy['description'] for vacancy in result))
+
+    def test_crawls_share_loop(self):
+        """
+        Test several crawls run at once in one event loop
+        """
+        async def crawl():
+            async with self._parser(max_workers=4) as parser:
+                sink = await parser.run_async(
+                    sink=CallbackSink(lambda _: None))
+            return sink.count
+
+        async def crawls():
+            return await asyncio.gather(crawl(), crawl(), crawl())
+
+        counts = self.loop.run_until_complete(crawls())
+        self.assertEqual(counts, [VACANCIES_AMOUNT] * 3)
+
+    def test_parse_executor(self):
+        """
+        Test detail pages are parsed in the given executor
+        """
+        with ThreadPoolExecutor(2) as executor:
+            result = self._collect(self._parser(
+                max_workers=4, extractor='lxml', parse_executor=executor))
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+
+    def test_deadline(self):
+        """
+        Test crawl stops when its deadline is over
+        """
+        self.server.latency = 0.1
+        with self.assertRaises(asyncio.TimeoutError):
+            self._collect(self._parser(max_workers=2), timeout=0.3)
+
+    def test_close_stops_crawl(self):
+        """
+        Test closing the generator stops fetching pages
+        """
+        parser = self._parser(max_workers=2)
+
+        async def first():
+            vacancies = parser.aiter_vacancies(queue_size=4)
+            vacancy = await vacancies.__anext__()
+            await vacancies.aclose()
+            return vacancy
+
+        self.assertEqual(self.loop.run_until_complete(first())['identifier'],
+                         '0')
+        self.assertFalse(parser.is_open)
+        requests = sum(self.server.status_counts.values())
+        self.assertLess(requests, VACANCIES_AMOUNT)
+
+    def test_run_writes_xml(self):
+        """
+        Test run writes the xml file
+        """
+        parser = self._parser(max_workers=4)
+        parser.OUTPUT_DIR = tempfile.mkdtemp()
+        try:
+            sink = self.loop.run_until_complete(parser.run_async())
+            root = etree.parse(sink.filepath).getroot()
+            self.assertEqual(len(root.findall('position')), VACANCIES_AMOUNT)
+        finally:
+            shutil.rmtree(parser.OUTPUT_DIR)
+
+    def test_blocking_run(self):
+        """
+        Test blocking run inherited from NordseeParser still works
+        """
+        parser = self._parser(max_workers=4)
+        vacancies = []
+        parser.run(sink=CallbackSink(vacancies.append))
+        self.assertEqual([vacancy['identifier'] for vacancy in vacancies],
+                         IDENTIFIERS)
+
+    @unittest.skipUnless(aiohttp, 'aiohttp is not installed')
+    def test_fetch_with_aiohttp(self):
+        """
+        Test pages are fetched with the aiohttp session
+        """
+        parser = self._parser(max_workers=4)
+
+        async def crawl():
+            async with parser:
+                self.assertIsInstance(parser.session, aiohttp.ClientSession)
+                return [vacancy async for vacancy in
+                        parser.aiter_vacancies()]
+
+        result = self.loop.run_until_complete(crawl())
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+        counters = parser.metrics.snapshot()['counters']
+        self.assertEqual(counters['http_requests{status="200"}'],
+                         VACANCIES_AMOUNT + 3)
+
+    @unittest.skipUnless(aiohttp, 'aiohttp is not installed')
+    def test_fetch_revalidates_page_cache(self):
+        """
+        Test cached pages are revalidated with the aiohttp session and
+        their vacancy data is reused
+        """
+        cache_dir = tempfile.mkdtemp()
+        page_cache = PageCache(cache_dir)
+        try:
+            first = self._collect(self._parser(max_workers=4,
+                                               page_cache=page_cache))
+            parser = self._parser(max_workers=4, page_cache=page_cache)
+            second = self._collect(parser)
+        finally:
+            page_cache.close()
+            shutil.rmtree(cache_dir)
+
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.status_counts[304],
+                         VACANCIES_AMOUNT + 3)
+        counters = parser.metrics.snapshot()['counters']
+        self.assertEqual(counters['cache_hits{cache="page"}'],
+                         VACANCIES_AMOUNT + 3)
+        self.assertEqual(counters['cache_hits{cache="vacancy"}'],
+                         VACANCIES_AMOUNT)
+
+    def test_fetch_without_aiohttp(self):
+        """
+        Test pages are fetched in executor threads without aiohttp
+        """
+        with patch.object(async_parser, '_import_aiohttp', return_value=None):
+            result = self._collect(self._parser(max_workers=4))
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+
+
+if __name__ == '__main__':
+    unittest.main()
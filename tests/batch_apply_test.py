@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+import requests
+
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+sys.path.append('..')
+
+from batch_apply import ApplicationLedger, BatchApplier, read_jobs
+from benchmarks import stub_site
+from benchmarks.stub_site import CV_PATH, StubSiteServer, vacancy_path
+from cv_cache import CvCache
+from http_exchanger import HttpExchanger
+from http_exchanger_test import USER_DATA
+
+
+class BatchApplyTestCase(unittest.TestCase):
+    """
+    Batch applying tests against the local stub site
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cv_cache = CvCache(os.path.join(self.temp_dir, 'cv'))
+        self.server = StubSiteServer()
+        self.server.__enter__()
+        self.ledger = ApplicationLedger(
+            os.path.join(self.temp_dir, 'applications.sqlite'))
+        self.users = [
+            dict(USER_DATA, cv_path=self.server.base_url + CV_PATH),
+            dict(USER_DATA, first_name='Berta', email='berta@example.com',
+                 cv_path=self.server.base_url + CV_PATH),
+        ]
+
+    def tearDown(self):
+        self.ledger.close()
+        self.server.__exit__(None, None, None)
+        self.cv_cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _write_jobs(self, jobs):
+        """
+        Write jobs to json lines file
+        :param jobs: list of (vacancy number, user_data)
+        :return: str file path
+        """
+        filepath = os.path.join(self.temp_dir, 'jobs.jsonl')
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for number, user_data in jobs:
+                f.write(json.dumps(dict(
+                    user_data, vacancy_url=self.server.base_url +
+                    vacancy_path(number))) + '\n')
+        return filepath
+
+    def _run(self, filepath):
+        applier = BatchApplier(self.ledger, workers=2, cv_cache=self.cv_cache)
+        return applier.run(read_jobs(filepath))
+
+    def test_apply_once(self):
+        """
+        Test every user is applied once per vacancy, also on the next run
+        """
+        jobs = [(number, user) for number in range(3) for user in self.users]
+        # same user with the email written differently
+        jobs.append((1, dict(self.users[0], email='Anna@Example.com ')))
+        filepath = self._write_jobs(jobs)
+
+        with patch.object(HttpExchanger, 'open_form', autospec=True,
+                          side_effect=HttpExchanger.open_form) as open_form:
+            summary = self._run(filepath)
+
+        self.assertEqual(summary['vacancies'], 3)
+        self.assertEqual(summary['succeeded'], 6)
+        self.assertEqual(summary['duplicate'], 1)
+        self.assertEqual(len(self.server.applications), 6)
+        self.assertEqual(self.ledger.counts(), {ApplicationLedger.SUCCESS: 6})
+        # the form of a vacancy is opened once for both users
+        self.assertEqual(open_form.call_count, 3)
+
+        summary = self._run(filepath)
+        self.assertEqual(summary['applied'], 0)
+        self.assertEqual(summary['done'], 6)
+        self.assertEqual(len(self.server.applications), 6)
+
+    def test_retry_failed(self):
+        """
+        Test failed job is recorded and retried until max attempts
+        """
+        invalid = dict(self.users[1], first_name='')
+        filepath = self._write_jobs([(5, self.users[0]), (5, invalid)])
+
+        summary = self._run(filepath)
+        self.assertEqual((summary['succeeded'], summary['failed']), (1, 1))
+        application = self.ledger.get(('berta@example.com', '5'))
+        self.assertEqual(application['status'], ApplicationLedger.ERROR)
+        self.assertIn('vorname', application['error'])
+
+        for _ in range(2):
+            summary = self._run(filepath)
+            self.assertEqual((summary['done'], summary['applied']), (1, 1))
+        self.assertEqual(
+            self.ledger.get(('berta@example.com', '5'))['attempts'], 3)
+
+        summary = self._run(filepath)
+        self.assertEqual(summary['exhausted'], 1)
+        self.assertEqual(summary['applied'], 0)
+        self.assertEqual(len(self.server.applications), 1)
+
+    def test_error_on_reused_form_is_not_retried(self):
+        """
+        Test error message of the site for a reused form is recorded after
+        one attempt
+        """
+        invalid = dict(self.users[1], first_name='')
+        self._run(self._write_jobs([(5, self.users[0]), (5, invalid)]))
+        self.assertEqual(
+            self.ledger.get(('berta@example.com', '5'))['attempts'], 1)
+
+    def test_expired_form_is_retried(self):
+        """
+        Test job is applied with a fresh form when the site rejected the
+        reused one
+        """
+        filepath = self._write_jobs([(5, user) for user in self.users])
+        submit = HttpExchanger._submit
+
+        def submit_and_expire(exchanger, form_url, form, fields):
+            try:
+                return submit(exchanger, form_url, form, fields)
+            finally:
+                # token of the forms opened so far expires
+                stub_site.FORM_TOKEN += '-new'
+
+        with patch.object(stub_site, 'FORM_TOKEN', stub_site.FORM_TOKEN), \
+                patch.object(HttpExchanger, '_submit', submit_and_expire):
+            summary = self._run(filepath)
+        self.assertEqual(summary['succeeded'], 2)
+        self.assertEqual(len(self.server.applications), 2)
+        self.assertEqual(
+            self.ledger.get(('berta@example.com', '5'))['attempts'], 1)
+
+    def test_job_without_email(self):
+        """
+        Test job without email is reported and the others are applied
+        """
+        no_email = dict(self.users[1])
+        del no_email['email']
+        summary = self._run(self._write_jobs([(5, self.users[0]),
+                                              (6, no_email)]))
+        self.assertEqual(summary['invalid'], 1)
+        self.assertEqual(summary['succeeded'], 1)
+        self.assertEqual(len(self.server.applications), 1)
+
+    def test_sent_without_outcome_is_not_retried(self):
+        """
+        Test application whose response was lost is not sent again
+        """
+        filepath = self._write_jobs([(5, self.users[0])])
+        post = requests.Session.post
+
+        def post_and_time_out(session, *args, **kwargs):
+            post(session, *args, **kwargs)
+            raise requests.exceptions.ReadTimeout('read timed out')
+
+        with patch.object(requests.Session, 'post', post_and_time_out):
+            summary = self._run(filepath)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(self.ledger.get(('anna@example.com', '5'))['status'],
+                         ApplicationLedger.UNCERTAIN)
+
+        summary = self._run(filepath)
+        self.assertEqual((summary['uncertain'], summary['applied']), (1, 0))
+        self.assertEqual(len(self.server.applications), 1)
+
+    def test_submitting_is_not_retried(self):
+        """
+        Test application marked submitting by a crashed run is not sent
+        again
+        """
+        filepath = self._write_jobs([(5, self.users[0])])
+        self.ledger.mark_submitting(('anna@example.com', '5'),
+                                    self.server.base_url + vacancy_path(5))
+        summary = self._run(filepath)
+        self.assertEqual((summary['uncertain'], summary['applied']), (1, 0))
+        self.assertEqual(len(self.server.applications), 0)
+
+    def test_refused_connection_is_retried(self):
+        """
+        Test application which could not be sent is retried
+        """
+        filepath = self._write_jobs([(5, self.users[0])])
+        refused = requests.exceptions.ConnectionError(MaxRetryError(
+            None, '/', NewConnectionError(None, 'Connection refused')))
+
+        with patch.object(requests.Session, 'post', side_effect=refused):
+            summary = self._run(filepath)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(self.ledger.get(('anna@example.com', '5'))['status'],
+                         ApplicationLedger.ERROR)
+
+        summary = self._run(filepath)
+        self.assertEqual(summary['succeeded'], 1)
+        self.assertEqual(len(self.server.applications), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
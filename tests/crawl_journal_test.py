@@ -0,0 +1,138 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+sys.path.append('..')
+
+from benchmarks import stub_site
+from benchmarks.stub_site import StubSiteServer
+from crawl_journal import CheckpointedCrawl, CrawlJournal
+from transport import Transport
+from vacancy_parser import NordseeParser, PageUnavailable
+
+VACANCIES_AMOUNT = 45
+IDENTIFIERS = [str(i) for i in range(VACANCIES_AMOUNT)]
+
+
+class CrawlJournalTestCase(unittest.TestCase):
+    """
+    Checkpointed crawl tests against the local stub site
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.journal = CrawlJournal(os.path.join(self.tmp_dir,
+                                                 'journal.sqlite'))
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT,
+                                     error_rate=0.3, seed=0)
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.journal.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _crawl(self, retries):
+        # no transport retries, so server errors reach the crawl
+        parser = NordseeParser(max_workers=4,
+                               transport=Transport(retries=0))
+        parser.VACANCY_LIST_URL = self.server.list_url
+        return list(CheckpointedCrawl(parser, self.journal, retries=retries,
+                                      backoff=0.01))
+
+    def test_failed_pages_are_retried(self):
+        """
+        Test failed pages are fetched again in next passes
+        """
+        result = self._crawl(retries=10)
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+        self.assertGreater(self.server.status_counts[503], 0)
+        self.assertTrue(all(vacancy['description'] for vacancy in result))
+        # finished crawl is forgotten
+        self.assertIsNone(self.journal.get_meta('pages_amount'))
+
+    def test_list_page_without_rows_is_retried(self):
+        """
+        Test list page without rows is not journaled as finished
+        """
+        render = stub_site.render_list_page
+        empty = []
+
+        def empty_once(base_url, vacancies_amount, start=0):
+            if start == stub_site.PAGE_SIZE and not empty:
+                empty.append(start)
+                return render(base_url, 0)
+            return render(base_url, vacancies_amount, start)
+
+        with patch.object(stub_site, 'render_list_page', empty_once):
+            result = self._crawl(retries=10)
+        self.assertEqual(empty, [stub_site.PAGE_SIZE])
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         IDENTIFIERS)
+
+    def test_resume(self):
+        """
+        Test stopped crawl fetches only pages which are not finished
+        """
+        self.server.error_rate = 0.5
+        first = self._crawl(retries=0)
+        failures = self.journal.failures()
+        self.assertTrue(failures)
+        self.assertLess(len(first), VACANCIES_AMOUNT)
+
+        self.server.error_rate = 0.0
+        requests = sum(self.server.status_counts.values())
+        second = self._crawl(retries=0)
+        self.assertEqual([vacancy['identifier'] for vacancy in second],
+                         IDENTIFIERS)
+        self.assertLess(sum(self.server.status_counts.values()) - requests,
+                        VACANCIES_AMOUNT)
+        self.assertEqual(self.journal.failures(), [])
+
+
+class FailSoftTestCase(unittest.TestCase):
+    """
+    Tests of pages which can not be fetched in the pipeline crawl
+    """
+    def setUp(self):
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT)
+        self.server.__enter__()
+        self.parser = NordseeParser(max_workers=4)
+        self.parser.VACANCY_LIST_URL = self.server.list_url
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_missing_vacancy_is_skipped(self):
+        """
+        Test vacancy without page is left out instead of written empty
+        """
+        get_page_content = self.parser._get_page_content
+
+        def flaky(url, params=None):
+            if url.endswith('-j7.html'):
+                return None
+            return get_page_content(url, params=params)
+
+        with patch.object(self.parser, '_get_page_content', flaky):
+            result = self.parser._collect_vacancies()
+        identifiers = [vacancy['identifier'] for vacancy in result]
+        self.assertEqual(len(identifiers), VACANCIES_AMOUNT - 1)
+        self.assertNotIn('7', identifiers)
+
+    def test_missing_list(self):
+        """
+        Test unavailable vacancy list raises a clear error
+        """
+        with patch.object(self.parser, '_get_page_content',
+                          return_value=None):
+            with self.assertRaises(PageUnavailable):
+                self.parser._get_pages_amount()
+
+
+if __name__ == '__main__':
+    unittest.main()
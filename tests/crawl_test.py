@@ -0,0 +1,165 @@
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from unittest.mock import patch
+
+sys.path.append('..')
+
+from benchmarks import stub_site
+from benchmarks.stub_site import StubSiteServer
+from extractors import PyQueryExtractor
+from throttling import HostRateLimiter
+from vacancy_parser import NordseeParser, PageUnavailable
+
+VACANCIES_AMOUNT = 45
+
+
+class CrawlTestCase(unittest.TestCase):
+    """
+    Crawl tests against the local stub site
+    """
+    def setUp(self):
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT)
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def _collect(self, **kwargs):
+        parser = NordseeParser(**kwargs)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        return parser._collect_vacancies()
+
+    def test_collect_vacancies_sequential(self):
+        """
+        Test all vacancies are collected with one worker
+        """
+        result = self._collect(max_workers=1)
+        self.assertEqual(len(result), VACANCIES_AMOUNT)
+        self.assertIn('description', result[0])
+
+    def test_collect_vacancies_keeps_order(self):
+        """
+        Test concurrent crawl returns vacancies in list order
+        """
+        result = self._collect(max_workers=8)
+        identifiers = [vacancy['identifier'] for vacancy in result]
+        self.assertEqual(identifiers,
+                         [str(i) for i in range(VACANCIES_AMOUNT)])
+
+    def test_first_list_page_fetched_once(self):
+        """
+        Test first list page gives both pages amount and its vacancies
+        """
+        self._collect(max_workers=4)
+        # 3 list pages and all detail pages
+        self.assertEqual(self.server.status_counts[200],
+                         3 + VACANCIES_AMOUNT)
+
+    def test_page_size_detected(self):
+        """
+        Test offsets follow the page size of the site
+        """
+        with patch.object(stub_site, 'PAGE_SIZE', 15):
+            result = self._collect(max_workers=4)
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         [str(i) for i in range(VACANCIES_AMOUNT)])
+
+    def test_stops_without_new_vacancies(self):
+        """
+        Test list crawl stops at the first page without new vacancies
+        """
+        with patch.object(PyQueryExtractor, 'pages_amount',
+                          return_value=50):
+            result = self._collect(max_workers=2)
+        self.assertEqual(len(result), VACANCIES_AMOUNT)
+        # 3 list pages, the empty 4th one and at most 2 fetched ahead
+        self.assertLessEqual(self.server.status_counts[200],
+                             4 + 2 + VACANCIES_AMOUNT)
+
+    def test_list_page_without_rows(self):
+        """
+        Test list page without pager and rows, like a maintenance page,
+        keeps the previous output instead of replacing it with no vacancies
+        """
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        parser = NordseeParser()
+        parser.VACANCY_LIST_URL = self.server.list_url
+        parser.OUTPUT_DIR = tmp_dir
+        parser.run(stream=True)
+        filepath = parser._get_output_filepath()
+        with open(filepath, 'rb') as f:
+            previous = f.read()
+
+        maintenance = '<html><body>Wartungsarbeiten</body></html>'
+        with patch.object(stub_site, 'render_list_page',
+                          return_value=maintenance):
+            with self.assertRaises(PageUnavailable):
+                parser.run(stream=True)
+        with open(filepath, 'rb') as f:
+            self.assertEqual(f.read(), previous)
+
+    def test_later_list_page_without_rows(self):
+        """
+        Test later list page without rows is skipped, not taken for the
+        end of the list
+        """
+        render = stub_site.render_list_page
+
+        def empty_second_page(base_url, vacancies_amount, start=0):
+            if start == stub_site.PAGE_SIZE:
+                return render(base_url, 0)
+            return render(base_url, vacancies_amount, start)
+
+        parser = NordseeParser(max_workers=1)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        with patch.object(stub_site, 'render_list_page', empty_second_page):
+            result = parser._collect_vacancies()
+        self.assertEqual(
+            [vacancy['identifier'] for vacancy in result],
+            [str(i) for i in range(VACANCIES_AMOUNT)
+             if not stub_site.PAGE_SIZE <= i < 2 * stub_site.PAGE_SIZE])
+        self.assertEqual(parser.metrics.snapshot()['counters'][
+            'skipped{kind="list_page"}'], 1)
+
+    def test_collect_vacancies_retries_errors(self):
+        """
+        Test injected server errors are retried
+        """
+        with StubSiteServer(vacancies_amount=VACANCIES_AMOUNT,
+                            error_rate=0.05, seed=1) as server:
+            parser = NordseeParser(max_workers=4)
+            parser.VACANCY_LIST_URL = server.list_url
+            result = parser._collect_vacancies()
+        self.assertEqual(len(result), VACANCIES_AMOUNT)
+        self.assertGreater(server.status_counts[503], 0)
+
+
+class HostRateLimiterTestCase(unittest.TestCase):
+    """
+    Rate limiter tests
+    """
+    def test_disabled(self):
+        """
+        Test limiter without rate never waits
+        """
+        limiter = HostRateLimiter()
+        self.assertEqual(limiter.wait('http://example.com/a'), 0.0)
+
+    def test_spreads_requests_per_host(self):
+        """
+        Test requests to one host are spread by the rate interval
+        """
+        limiter = HostRateLimiter(rate=50)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.wait('http://example.com/a')
+        limiter.wait('http://other.com/a')
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 50.0)
+
+if __name__ == '__main__':
+    unittest.main()
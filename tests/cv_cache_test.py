@@ -0,0 +1,108 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('..')
+
+from benchmarks.stub_site import CV_PATH, StubSiteServer, render_cv
+from cv_cache import CvCache
+
+
+class CvCacheTestCase(unittest.TestCase):
+    """
+    CV cache tests against the local stub site
+    """
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = StubSiteServer()
+        self.server.__enter__()
+        self.url = self.server.base_url + CV_PATH
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.cache_dir)
+
+    def test_repeat_download_is_cached(self):
+        """
+        Test same cv is downloaded once
+        """
+        cache = CvCache(self.cache_dir)
+        file_path = cache.get(self.url)
+        self.assertEqual(cache.get(self.url), file_path)
+        self.assertEqual(self.server.status_counts[200], 1)
+        self.assertEqual(os.path.basename(file_path), 'Lebenslauf.pdf')
+        with open(file_path, 'rb') as f:
+            self.assertEqual(f.read(), render_cv(CV_PATH))
+
+    def test_revalidation(self):
+        """
+        Test expired entry is revalidated with ETag
+        """
+        cache = CvCache(self.cache_dir, max_age=0)
+        file_path = cache.get(self.url)
+        self.assertEqual(cache.get(self.url), file_path)
+        self.assertEqual(self.server.status_counts[304], 1)
+
+    def test_same_filename_does_not_collide(self):
+        """
+        Test cvs with the same file name of different users are kept apart
+        """
+        cache = CvCache(self.cache_dir)
+        first = cache.get(self.server.base_url + '/media/1/Lebenslauf.pdf')
+        second = cache.get(self.server.base_url + '/media/2/Lebenslauf.pdf')
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.isfile(first))
+        self.assertTrue(os.path.isfile(second))
+
+    def test_eviction(self):
+        """
+        Test least recently used files are removed when cache is full
+        """
+        cache = CvCache(self.cache_dir, max_size=len(render_cv(CV_PATH)) + 100)
+        first = cache.get(self.server.base_url + '/media/1/Lebenslauf.pdf')
+        second = cache.get(self.server.base_url + '/media/2/Lebenslauf.pdf')
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.isfile(second))
+
+    def test_removed_file_is_downloaded_again(self):
+        """
+        Test cache recovers when a cached file was deleted
+        """
+        cache = CvCache(self.cache_dir)
+        os.remove(cache.get(self.url))
+        self.assertTrue(os.path.isfile(cache.get(self.url)))
+        self.assertEqual(self.server.status_counts[200], 2)
+
+    def test_file_in_use_is_not_evicted(self):
+        """
+        Test file in use stays in the cache when it is full
+        """
+        cache = CvCache(self.cache_dir, max_size=len(render_cv(CV_PATH)) + 100)
+        with cache.use(self.server.base_url +
+                       '/media/1/Lebenslauf.pdf') as first:
+            second = cache.get(self.server.base_url +
+                               '/media/2/Lebenslauf.pdf')
+            self.assertTrue(os.path.isfile(first))
+        self.assertTrue(os.path.isfile(second))
+
+        cache.get(self.server.base_url + '/media/3/Lebenslauf.pdf')
+        self.assertFalse(os.path.exists(first))
+
+    def test_url_locks_are_removed(self):
+        """
+        Test lock of url is removed once the file is got
+        """
+        cache = CvCache(self.cache_dir)
+        with ThreadPoolExecutor(4) as executor:
+            paths = set(executor.map(cache.get, [self.url] * 8))
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(cache._url_locks, {})
+        self.assertEqual(self.server.status_counts[200], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from lxml import etree
+from unittest.mock import patch
+
+sys.path.append('..')
+
+import delta
+
+from benchmarks import stub_site
+from benchmarks.stub_site import StubSiteServer
+from delta import DeltaXmlWriter, VacancyIndex
+from vacancy_parser import NordseeParser
+
+
+class DeltaTestCase(unittest.TestCase):
+    """
+    Delta feed tests against the local stub site
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = StubSiteServer(vacancies_amount=25)
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self):
+        parser = NordseeParser(max_workers=4, delta=True)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        parser.OUTPUT_DIR = self.tmp_dir
+        parser.run(stream=True)
+
+        root = etree.parse(os.path.join(self.tmp_dir,
+                                        parser.DELTA_FILENAME)).getroot()
+        return {section.tag: section.xpath('position/identifier/text()')
+                for section in root}
+
+    def test_delta(self):
+        """
+        Test only added, changed and removed vacancies are written
+        """
+        delta = self._run()
+        self.assertEqual(len(delta['added']), 25)
+
+        self.assertEqual(self._run(),
+                         {'added': [], 'changed': [], 'removed': []})
+
+        self.server.vacancies_amount = 24
+        self.assertEqual(self._run(),
+                         {'added': [], 'changed': [], 'removed': ['24']})
+
+        with patch.object(stub_site, 'FILLER', 'Neu. '):
+            delta = self._run()
+        self.assertEqual(len(delta['changed']), 24)
+        self.assertEqual(delta['added'] + delta['removed'], [])
+        self.assertTrue(os.path.exists(os.path.join(
+            self.tmp_dir, NordseeParser.OUTPUT_FILENAME)))
+
+    def test_skipped_vacancy_is_not_removed(self):
+        """
+        Test vacancy which page failed is kept in the index
+        """
+        self._run()
+        parser_get = NordseeParser._get_page_content
+
+        def flaky(parser, url, params=None):
+            if url.endswith('-j3.html'):
+                return None
+            return parser_get(parser, url, params=params)
+
+        with patch.object(NordseeParser, '_get_page_content', flaky):
+            delta = self._run()
+        self.assertEqual(delta['removed'], [])
+        self.assertIn('3', VacancyIndex(os.path.join(
+            self.tmp_dir, NordseeParser.INDEX_FILENAME)).load())
+
+    def test_list_finished_early_is_not_removed(self):
+        """
+        Test vacancies of list pages not crawled after a page without new
+        vacancies are kept in the index
+        """
+        self._run()
+        render = stub_site.render_list_page
+
+        def repeated_first_page(base_url, vacancies_amount, start=0):
+            return render(base_url, vacancies_amount)
+
+        with patch.object(stub_site, 'render_list_page', repeated_first_page):
+            delta = self._run()
+        self.assertEqual(delta['removed'], [])
+        self.assertEqual(len(VacancyIndex(os.path.join(
+            self.tmp_dir, NordseeParser.INDEX_FILENAME)).load()), 25)
+
+    def test_removed_vacancy_without_identifier(self):
+        """
+        Test removed vacancy keyed by url is written with its link
+        """
+        url = self.server.base_url + '/de/Stelle.html'
+        index = VacancyIndex(os.path.join(self.tmp_dir, 'index'))
+        index.save({'3': 'a', url: 'b'})
+        filepath = os.path.join(self.tmp_dir, 'delta.xml')
+        with DeltaXmlWriter(filepath, index) as writer:
+            writer.write({'identifier': None, 'url': url + '?new',
+                          'title': 't', 'location': 'l', 'position': 'p',
+                          'description': 'd'})
+
+        removed = etree.parse(filepath).getroot().find('removed')
+        self.assertEqual(removed.xpath('position/identifier/text()'), ['3'])
+        self.assertEqual(removed.xpath('position/link/text()'), [url])
+
+    def test_index_load_without_xml(self):
+        """
+        Test index of 100k vacancies loads without parsing any xml
+        """
+        index = VacancyIndex(os.path.join(self.tmp_dir, 'index'))
+        hashes = {str(i): '{:020x}'.format(i) for i in range(100000)}
+        index.save(hashes)
+
+        with patch.object(delta, 'etree') as xml:
+            self.assertEqual(index.load(), hashes)
+        self.assertEqual(xml.mock_calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+sys.path.append('..')
+
+from cv_cache import CvCache
+from exchanger import Exchanger
+from exchanger_pool import ExchangerPool
+
+USER_DATA = {'email': 'test@example.com'}
+
+
+class ExchangerPoolTestCase(unittest.TestCase):
+    """
+    Exchanger pool tests with fake browsers
+    """
+    def setUp(self):
+        self.browsers = []
+        self.cache_dir = tempfile.mkdtemp()
+        self.cv_cache = CvCache(self.cache_dir)
+
+    def tearDown(self):
+        self.cv_cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def _browser_factory(self):
+        browser = MagicMock()
+        self.browsers.append(browser)
+        return browser
+
+    def test_reuses_warm_browsers(self):
+        """
+        Test pool launches `size` browsers and resets them between jobs
+        """
+        jobs = [('http://stub/{}'.format(i), USER_DATA) for i in range(10)]
+        pool = ExchangerPool(size=2, browser_factory=self._browser_factory,
+                             cv_cache=self.cv_cache)
+        with patch.object(Exchanger, 'run', return_value=True):
+            results = pool.run(jobs)
+
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertLessEqual(len(self.browsers), 2)
+        for browser in self.browsers:
+            browser.quit.assert_called_once_with()
+            browser.cookies.delete.assert_called_with()
+        stats = pool.stats()
+        self.assertEqual(stats['jobs'], 10)
+        self.assertGreater(stats['applications_per_minute'], 0)
+
+    def test_failed_job(self):
+        """
+        Test failed application is reported and the pool keeps working
+        """
+        pool = ExchangerPool(size=1, browser_factory=self._browser_factory,
+                             cv_cache=self.cv_cache)
+        with patch.object(Exchanger, 'run',
+                          side_effect=[RuntimeError('form changed'), True]):
+            results = pool.run([('http://stub/1', USER_DATA),
+                                ('http://stub/2', USER_DATA)])
+
+        self.assertEqual([result['success'] for result in results],
+                         [False, True])
+        self.assertEqual(results[0]['error'], 'form changed')
+
+    def test_broken_browser_is_relaunched(self):
+        """
+        Test browser which can not be reset is replaced
+        """
+        def factory():
+            browser = self._browser_factory()
+            browser.cookies.delete.side_effect = RuntimeError('crashed')
+            return browser
+
+        pool = ExchangerPool(size=1, browser_factory=factory,
+                             cv_cache=self.cv_cache)
+        with patch.object(Exchanger, 'run', return_value=True):
+            pool.run([('http://stub/1', USER_DATA),
+                      ('http://stub/2', USER_DATA)])
+        self.assertEqual(len(self.browsers), 2)
+
+    def test_default_cv_cache_is_lazy(self):
+        """
+        Test exchanger opens the shared cv cache only when it needs a file
+        """
+        with patch('exchanger.get_default_cv_cache') as default_cv_cache:
+            exchanger = Exchanger('http://stub/1', USER_DATA,
+                                  browser=self._browser_factory())
+            default_cv_cache.assert_not_called()
+            self.assertIs(exchanger.cv_cache, default_cv_cache.return_value)
+
+
+if __name__ == '__main__':
+    unittest.main()
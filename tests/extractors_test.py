@@ -0,0 +1,97 @@
+import sys
+import unittest
+
+sys.path.append('..')
+
+from benchmarks.stub_site import render_detail_page, render_list_page
+from extractors import SECTIONS, LxmlExtractor, PyQueryExtractor, \
+    extract_vacancy_data, get_identifier, parse_pool
+
+BASE_URL = 'https://karriere.nordsee.com'
+
+
+class ExtractorsTestCase(unittest.TestCase):
+    """
+    Extraction backends tests
+    """
+    def setUp(self):
+        self.list_page = render_list_page(BASE_URL, 45, start=20).encode()
+        self.detail_page = render_detail_page(7).encode()
+
+    def test_get_identifier(self):
+        """
+        Test identifier is parsed from vacancy url
+        """
+        url = BASE_URL + '/de/Verkaeufer-in-Berlin-de-j2496.html'
+        self.assertEqual(get_identifier(url), '2496')
+        self.assertIsNone(get_identifier(BASE_URL + '/de/index.html'))
+        self.assertIsNone(get_identifier(None))
+
+    def test_pages_amount(self):
+        """
+        Test both backends read the last pager link
+        """
+        self.assertEqual(PyQueryExtractor().pages_amount(self.list_page), 3)
+        self.assertEqual(LxmlExtractor().pages_amount(self.list_page), 3)
+
+    def test_common_vacancy_info(self):
+        """
+        Test both backends extract the same rows
+        """
+        expected = PyQueryExtractor().common_vacancy_info(self.list_page)
+        result = LxmlExtractor().common_vacancy_info(self.list_page)
+        self.assertEqual(len(result), 20)
+        self.assertEqual(result, expected)
+        self.assertEqual(result[0]['identifier'], '20')
+
+    def test_vacancy_data(self):
+        """
+        Test both backends extract the same sections and description
+        """
+        expected = PyQueryExtractor().vacancy_data(self.detail_page)
+        result = LxmlExtractor().vacancy_data(self.detail_page)
+        self.assertEqual(result, expected)
+        self.assertTrue(result['introduction'].startswith('Einleitung 7.'))
+        self.assertTrue(result['short_description'].startswith(
+            'Kurzbeschreibung 7.'))
+        self.assertTrue(result['details'].startswith('Aufgabe 0.'))
+        self.assertIn('Profil 7.', result['details'])
+        self.assertEqual(result['conclusion'], 'Abschluss 7.')
+        self.assertEqual(result['description'], '\n\n'.join(
+            result[section] for section in SECTIONS))
+
+    def test_vacancy_data_separates_blocks(self):
+        """
+        Test words of adjacent blocks do not run together, sections nested
+        before the separator are found and comments are left out
+        """
+        page = (b'<html><body><div class="emp_nr_innerframe">'
+                b'<div class="kopf"><p class="einleitungstext">Hallo'
+                b'<!-- Kommentar --> <b>Team</b></p></div>'
+                b'<div class="trenner"></div>'
+                b'<ul><li>Kasse</li><li>Theke</li></ul><p>Profil</p>'
+                b'<div class="abschluss">Ende</div>'
+                b'</div></body></html>')
+        for extractor in (PyQueryExtractor(), LxmlExtractor()):
+            with self.subTest(extractor=extractor.__class__.__name__):
+                result = extractor.vacancy_data(page)
+                self.assertEqual(result['introduction'], 'Hallo Team')
+                self.assertEqual(result['short_description'], '')
+                self.assertEqual(result['details'], 'Kasse Theke Profil')
+                self.assertEqual(result['description'],
+                                 'Hallo Team\n\nKasse Theke Profil\n\nEnde')
+    @unittest.skipIf(sys.version_info < (3, 7), 'start method is fixed')
+    def test_parse_pool(self):
+        """
+        Test parse pool workers are not forked from the crawl
+        """
+        with parse_pool(1) as pool:
+            vacancy_data = pool.submit(extract_vacancy_data, 'lxml',
+                                       self.detail_page).result()
+            self.assertNotEqual(pool._mp_context.get_start_method(), 'fork')
+        self.assertEqual(vacancy_data,
+                         LxmlExtractor().vacancy_data(self.detail_page))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import MagicMock, patch
+
+sys.path.append('..')
+
+from benchmarks import stub_site
+from benchmarks.stub_site import CV_PATH, StubSiteServer, render_cv, \
+    vacancy_path
+from cv_cache import CvCache
+from exchanger import Exchanger
+from http_exchanger import FormChanged, HttpExchanger
+
+USER_DATA = {
+    'gender': 'W',
+    'first_name': 'Anna',
+    'last_name': 'Muster',
+    'street': 'Hauptstr. 1',
+    'postal_code': '10115',
+    'city': 'Berlin',
+    'birthday': '01.01.1990',
+    'phone': '+49301234567',
+    'email': 'anna@example.com',
+}
+
+
+class HttpExchangerTestCase(unittest.TestCase):
+    """
+    HTTP-only applying tests against the local stub site
+    """
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cv_cache = CvCache(self.cache_dir)
+        self.server = StubSiteServer()
+        self.server.__enter__()
+        self.user_data = dict(USER_DATA,
+                              cv_path=self.server.base_url + CV_PATH)
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.cv_cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def _exchanger(self, number=7, **options):
+        return HttpExchanger(self.server.base_url + vacancy_path(number),
+                             self.user_data, cv_cache=self.cv_cache,
+                             **options)
+
+    def test_submit(self):
+        """
+        Test form is submitted with hidden fields, user data and cv
+        """
+        exchanger = self._exchanger()
+        exchanger.run()
+
+        self.assertIsNone(exchanger.error)
+        self.assertFalse(exchanger.used_browser)
+        self.assertEqual(len(self.server.applications), 1)
+        fields, files = self.server.applications[0]
+        self.assertEqual(fields['bewerbung_form[stelle]'], '7')
+        self.assertEqual(fields['bewerbung_form[vorname]'], 'Anna')
+        self.assertEqual(fields['bewerbung_form[anrede]'], 'Frau')
+        self.assertEqual(fields['bewerbung_form[wie_gefunden]'], 'JobUFO')
+        self.assertEqual(files['anlage2'], render_cv(CV_PATH))
+
+    def test_site_error(self):
+        """
+        Test error message of the site is kept
+        """
+        self.user_data['first_name'] = ''
+        exchanger = self._exchanger()
+        exchanger.run()
+
+        self.assertIn('vorname', exchanger.error)
+        self.assertEqual(self.server.applications, [])
+
+    def test_form_changed(self):
+        """
+        Test changed form raises FormChanged when fallback is disabled
+        """
+        sex = ('sex_w', 'anrede', ('Herr (m)', 'Frau (w)', 'Divers'))
+        selects = (sex,) + stub_site.SELECTS[1:]
+        with patch.object(stub_site, 'SELECTS', selects):
+            with self.assertRaises(FormChanged):
+                self._exchanger(fallback=False).run()
+        self.assertEqual(self.server.applications, [])
+
+    def test_fallback_to_browser(self):
+        """
+        Test page without application form is applied with browser
+        """
+        exchanger = HttpExchanger(self.server.list_url, self.user_data,
+                                  cv_cache=self.cv_cache)
+        with patch.object(Exchanger, '_setup_browser',
+                          return_value=MagicMock()), \
+                patch.object(Exchanger, 'run', return_value=True) as run:
+            exchanger.run()
+
+        run.assert_called_once_with()
+        self.assertTrue(exchanger.used_browser)
+
+
+if __name__ == '__main__':
+    unittest.main()
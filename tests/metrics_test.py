@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from urllib.request import urlopen
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from metrics import JsonLinesExporter, Metrics, MetricsServer
+from vacancy_parser import NordseeParser
+
+
+class MetricsTestCase(unittest.TestCase):
+    """
+    Metrics tests
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmp_dir, 'metrics.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _events(self):
+        with open(self.filepath) as f:
+            return [json.loads(line) for line in f]
+
+    def test_span_and_counters(self):
+        """
+        Test spans are counted and exported with their attributes
+        """
+        metrics = Metrics(JsonLinesExporter(self.filepath))
+        with metrics.span('fetch', url='http://stub/1'):
+            metrics.inc('http_bytes', 10)
+        with self.assertRaises(ValueError):
+            with metrics.span('fetch', url='http://stub/2'):
+                raise ValueError()
+        metrics.inc('http_requests', status=200)
+        metrics.close()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['spans']['fetch']['count'], 2)
+        self.assertEqual(snapshot['spans']['fetch']['errors'], 1)
+        self.assertEqual(snapshot['counters']['http_bytes'], 10)
+        self.assertEqual(snapshot['counters']['http_requests{status="200"}'],
+                         1)
+
+        events = self._events()
+        self.assertEqual([event['type'] for event in events],
+                         ['span', 'span', 'snapshot'])
+        self.assertEqual(events[0]['url'], 'http://stub/1')
+        self.assertIsNone(events[0]['error'])
+        self.assertEqual(events[1]['error'], 'ValueError')
+
+    def test_prometheus_endpoint(self):
+        """
+        Test totals are served in Prometheus text format
+        """
+        metrics = Metrics()
+        metrics.inc('http_requests', status=200)
+        with metrics.span('fetch'):
+            pass
+
+        with MetricsServer(metrics) as server:
+            text = urlopen(server.url).read().decode('utf-8')
+
+        self.assertIn('nordsee_http_requests_total{status="200"} 1.0', text)
+        self.assertIn('nordsee_span_seconds_count{span="fetch"} 1', text)
+        self.assertIn('nordsee_span_errors_total{span="fetch"} 0', text)
+
+    def test_crawl_metrics(self):
+        """
+        Test crawl records spans of every stage and fetched bytes
+        """
+        metrics = Metrics()
+        with StubSiteServer(vacancies_amount=25) as server:
+            parser = NordseeParser(metrics=metrics)
+            parser.VACANCY_LIST_URL = server.list_url
+            parser.OUTPUT_DIR = self.tmp_dir
+            parser._save_to_xml(parser._collect_vacancies())
+
+        snapshot = metrics.snapshot()
+        spans = snapshot['spans']
+        self.assertEqual(spans['get_common_vacancy_info']['count'], 2)
+        self.assertEqual(spans['get_vacancy_data']['count'], 25)
+        self.assertEqual(spans['get_page_content']['count'], 27)
+        self.assertEqual(spans['save_to_xml']['count'], 1)
+        self.assertEqual(snapshot['counters']['http_requests{status="200"}'],
+                         27)
+        self.assertGreater(snapshot['counters']['http_bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
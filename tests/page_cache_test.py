@@ -0,0 +1,104 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from page_cache import PageCache
+import vacancy_parser
+from vacancy_parser import NordseeParser
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """
+    Page cache tests
+    """
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_store_and_lookup(self):
+        """
+        Test stored page is returned with its validators
+        """
+        cache = PageCache(self.cache_dir)
+        cache.store('http://a/1', b'body', etag='"x"')
+        entry = cache.lookup('http://a/1')
+        self.assertEqual(entry['body'], b'body')
+        self.assertEqual(cache.conditional_headers(entry),
+                         {'If-None-Match': '"x"'})
+        self.assertIsNone(PageCache(self.cache_dir,
+                                    refresh=True).lookup('http://a/1'))
+
+    def test_evicts_least_recently_used(self):
+        """
+        Test cache drops least recently used pages when it is full
+        """
+        cache = PageCache(self.cache_dir, max_size=10)
+        cache.store('http://a/1', b'12345')
+        cache.store('http://a/2', b'12345')
+        cache.touch('http://a/1')
+        cache.store('http://a/3', b'12345')
+        self.assertIsNotNone(cache.lookup('http://a/1'))
+        self.assertIsNone(cache.lookup('http://a/2'))
+        self.assertIsNotNone(cache.lookup('http://a/3'))
+
+    def test_incremental_crawl(self):
+        """
+        Test second crawl revalidates pages and does not parse them again
+        """
+        with StubSiteServer(vacancies_amount=25) as server:
+            parser = NordseeParser(page_cache=PageCache(self.cache_dir))
+            parser.VACANCY_LIST_URL = server.list_url
+            first = parser._collect_vacancies()
+
+            parser = NordseeParser(page_cache=PageCache(self.cache_dir))
+            parser.VACANCY_LIST_URL = server.list_url
+            with patch.object(NordseeParser, '_get_vacancy_data') as parse:
+                second = parser._collect_vacancies()
+
+        parse.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(server.status_counts[304], 2 + 25)
+
+    def test_records_evicted_with_pages(self):
+        """
+        Test vacancy data is dropped with the page it was parsed from
+        """
+        cache = PageCache(self.cache_dir, max_size=10)
+        cache.set_record('1', '1', cache.store('http://a/1', b'12345'),
+                         {'title': 'a'})
+        cache.set_record('2', '1', cache.store('http://a/2', b'67890'),
+                         {'title': 'b'})
+        cache.store('http://a/3', b'abcde')
+        self.assertIsNone(cache.get_record('1', '1'))
+        self.assertEqual(cache.get_record('2', '1')[1], {'title': 'b'})
+
+    def test_records_of_other_version(self):
+        """
+        Test vacancy data of another parsing version is parsed again
+        """
+        with StubSiteServer(vacancies_amount=25) as server:
+            parser = NordseeParser(page_cache=PageCache(self.cache_dir))
+            parser.VACANCY_LIST_URL = server.list_url
+            parser._collect_vacancies()
+
+            parser = NordseeParser(page_cache=PageCache(self.cache_dir))
+            parser.VACANCY_LIST_URL = server.list_url
+            with patch.object(vacancy_parser, 'VACANCY_DATA_VERSION', 0), \
+                    patch.object(NordseeParser, '_get_vacancy_data',
+                                 autospec=True,
+                                 side_effect=NordseeParser._get_vacancy_data
+                                 ) as parse:
+                parser._collect_vacancies()
+        self.assertEqual(parse.call_count, 25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from unittest.mock import patch
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from sinks import CallbackSink, JsonLinesSink
+from vacancy_parser import NordseeParser
+
+VACANCIES_AMOUNT = 45
+
+
+class PipelineTestCase(unittest.TestCase):
+    """
+    Streaming pipeline tests against the local stub site
+    """
+    def setUp(self):
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT)
+        self.server.__enter__()
+        self.parser = NordseeParser(max_workers=4)
+        self.parser.VACANCY_LIST_URL = self.server.list_url
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_iter_vacancies_keeps_order(self):
+        """
+        Test vacancies are yielded in list order and enriched
+        """
+        def enrich(vacancy):
+            vacancy['source'] = 'nordsee'
+            return vacancy
+
+        result = list(self.parser.iter_vacancies(queue_size=5,
+                                                 enrichers=[enrich]))
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         [str(i) for i in range(VACANCIES_AMOUNT)])
+        self.assertTrue(all(vacancy['source'] == 'nordsee'
+                            for vacancy in result))
+
+    def test_parse_workers(self):
+        """
+        Test parsing in worker processes gives the same vacancies
+        """
+        expected = list(self.parser.iter_vacancies())
+        parser = NordseeParser(max_workers=4, extractor='lxml',
+                               parse_workers=2)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        result = list(parser.iter_vacancies(queue_size=5))
+        self.assertEqual([vacancy['identifier'] for vacancy in result],
+                         [vacancy['identifier'] for vacancy in expected])
+        self.assertEqual(result[3]['title'], expected[3]['title'])
+        self.assertEqual(
+            parser.metrics.snapshot()['spans']['get_vacancy_data']['count'],
+            VACANCIES_AMOUNT)
+
+    def test_early_stop(self):
+        """
+        Test consumer can stop reading before the crawl finished
+        """
+        vacancies = self.parser.iter_vacancies(queue_size=2)
+        first = next(vacancies)
+        vacancies.close()
+        self.assertEqual(first['identifier'], '0')
+
+    def test_early_stop_cancels_fetches(self):
+        """
+        Test detail pages queued when the consumer stopped are not fetched
+        """
+        parser_get = NordseeParser._get_page_content
+        urls = []
+
+        def slow_get(parser, url, params=None):
+            if params is None:
+                urls.append(url)
+                time.sleep(0.05)
+            return parser_get(parser, url, params=params)
+
+        with patch.object(NordseeParser, '_get_page_content', slow_get):
+            vacancies = self.parser.iter_vacancies(queue_size=20)
+            next(vacancies)
+            vacancies.close()
+        self.assertLess(len(urls), 20)
+
+    def test_stage_error_is_raised(self):
+        """
+        Test error in a stage reaches the consumer
+        """
+        with patch.object(NordseeParser, '_get_vacancy_data',
+                          side_effect=ValueError('broken page')):
+            with self.assertRaises(ValueError):
+                list(self.parser.iter_vacancies())
+
+    def test_sinks(self):
+        """
+        Test json lines and callback sinks get every vacancy
+        """
+        output_dir = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(output_dir, 'nordsee.jsonl')
+            self.parser.run(sink=JsonLinesSink(filepath))
+            with open(filepath, encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f]
+        finally:
+            shutil.rmtree(output_dir)
+        self.assertEqual(len(lines), VACANCIES_AMOUNT)
+
+        received = []
+        self.parser.run(sink=CallbackSink(received.append))
+        self.assertEqual(received, lines)
+
+if __name__ == '__main__':
+    unittest.main()
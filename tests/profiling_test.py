@@ -0,0 +1,103 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from metrics import Metrics
+from profiling import CPU, NETWORK, WAIT, Profiler, classify
+from vacancy_parser import NordseeParser
+
+
+def busy(seconds):
+    """
+    Keep CPU busy
+    """
+    end = threading.Event()
+    threading.Timer(seconds, end.set).start()
+    total = 0
+    while not end.is_set():
+        total += sum(range(1000))
+    return total
+
+
+class ProfilerTestCase(unittest.TestCase):
+    """
+    Profiling tests
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_classify(self):
+        """
+        Test innermost frame tells network, waiting and CPU apart
+        """
+        self.assertEqual(classify('/usr/lib/python3/socket.py'), NETWORK)
+        self.assertEqual(classify('/usr/lib/python3/threading.py'), WAIT)
+        self.assertEqual(classify('/app/extractors.py'), CPU)
+
+    def test_profile_crawl(self):
+        """
+        Test report and collapsed stacks of a crawl with pool threads
+        """
+        metrics = Metrics()
+        with StubSiteServer(vacancies_amount=45, latency=0.01) as server:
+            parser = NordseeParser(max_workers=4, metrics=metrics)
+            parser.VACANCY_LIST_URL = server.list_url
+            parser.OUTPUT_DIR = self.tmp_dir
+            with Profiler(self.tmp_dir, 'crawl', metrics=metrics,
+                          interval=0.002) as profiler:
+                parser.run(stream=True)
+                with metrics.span('busy'):
+                    busy(0.2)
+
+        report = profiler.report()
+        self.assertGreater(report['samples'], 0)
+        self.assertAlmostEqual(sum(report['split'].values()), 1.0)
+        self.assertGreater(report['split'][NETWORK], 0)
+        self.assertIn('profiling_test.py:busy',
+                      [name for name, _, _ in report['top']])
+        self.assertGreater(report['peak_memory'], 0)
+        for stage in ('run', 'get_page_content', 'get_vacancy_data',
+                      'busy'):
+            self.assertGreater(report['stage_peak_memory'][stage], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        with open(profiler.report_path) as f:
+            text = f.read()
+        self.assertIn('peak memory per stage', text)
+        self.assertIn('get_vacancy_data', text)
+        with open(profiler.stacks_path) as f:
+            stacks = [line.rsplit(' ', 1) for line in f.read().splitlines()]
+        roots = set(stack.split(';')[0] for stack, _ in stacks)
+        self.assertIn('MainThread', roots)
+        self.assertTrue(any(root.startswith('ThreadPoolExecutor')
+                            for root in roots))
+        self.assertTrue(all(int(count) > 0 for _, count in stacks))
+
+    def test_disabled(self):
+        """
+        Test disabled profiler samples, traces and writes nothing
+        """
+        metrics = Metrics()
+        threads = threading.active_count()
+        with Profiler(self.tmp_dir, 'off', metrics=metrics,
+                      enabled=False) as profiler:
+            self.assertEqual(threading.active_count(), threads)
+            self.assertFalse(tracemalloc.is_tracing())
+            with metrics.span('stage'):
+                pass
+        self.assertIsNone(profiler.report_path)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from sharded_crawl import DONE, LIST_SHARD, ShardQueue, ShardWorker, \
+    ShardedCrawl, SqliteShardQueue, open_queue
+from sinks import XmlSink
+from transport import Transport
+from vacancy_parser import NordseeParser
+
+VACANCIES_AMOUNT = 95
+IDENTIFIERS = [str(i) for i in range(VACANCIES_AMOUNT)]
+
+
+class ShardedCrawlTestCase(unittest.TestCase):
+    """
+    Sharded crawl tests against the local stub site
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.queue_path = os.path.join(self.tmp_dir, 'queue.sqlite')
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT)
+        self.server.__enter__()
+        self.queues = []
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        for queue in self.queues:
+            queue.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _queue(self, **options):
+        # every worker has its own connection like a separate process
+        queue = SqliteShardQueue(self.queue_path, **options)
+        self.queues.append(queue)
+        return queue
+
+    def _parser(self, **options):
+        parser = NordseeParser(max_workers=2, **options)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        parser.OUTPUT_DIR = self.tmp_dir
+        return parser
+
+    def _plan(self, **options):
+        crawl = ShardedCrawl(self._parser(), self._queue(**options),
+                             pages_per_shard=1, vacancies_per_shard=7)
+        crawl.plan()
+        return crawl
+
+    def _work(self, amount, **options):
+        workers = [ShardWorker(self._parser(), self._queue(**options),
+                               worker_id='worker-{}'.format(number),
+                               poll_interval=0.05)
+                   for number in range(amount)]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return workers
+
+    def _read(self, filepath):
+        with open(filepath, 'rb') as f:
+            return f.read()
+
+    def test_merge_matches_single_crawl(self):
+        """
+        Test shards crawled by several workers merge into the same xml as
+        a crawl in one process
+        """
+        crawl = self._plan()
+        workers = self._work(3)
+        sink = crawl.merge(XmlSink(os.path.join(self.tmp_dir, 'merged.xml')))
+
+        expected = os.path.join(self.tmp_dir, 'single.xml')
+        self._parser().run(sink=XmlSink(expected))
+        self.assertEqual(sink.count, VACANCIES_AMOUNT)
+        self.assertEqual(self._read(sink.filepath), self._read(expected))
+        self.assertEqual(crawl.queue.unfinished(), 0)
+
+        # 4 list pages after the first one and 95 vacancy pages
+        stats = crawl.queue.workers()
+        self.assertEqual(sum(worker['items'] for worker in stats), 99)
+        self.assertEqual(sum(worker.items for worker in workers), 99)
+        self.assertTrue(all(worker['items_per_second'] > 0
+                            for worker in stats))
+
+    def test_dead_worker_shard_reassigned(self):
+        """
+        Test shard of a worker which stopped renewing its lease is crawled
+        by another worker
+        """
+        crawl = self._plan(lease_seconds=0.2)
+        dead = crawl.queue.lease('dead')
+        self.assertEqual(dead['kind'], LIST_SHARD)
+
+        time.sleep(0.3)
+        self._work(2, lease_seconds=0.2)
+        self.assertFalse(crawl.queue.complete(dead['id'], 'dead'))
+        self.assertEqual([vacancy['identifier'] for vacancy in crawl],
+                         IDENTIFIERS)
+        self.assertEqual(list(crawl.queue.counts()), [DONE])
+
+    def test_failed_pages_retried(self):
+        """
+        Test pages which can not be fetched are leased again in a smaller
+        shard
+        """
+        self.server.error_rate = 0.2
+        crawl = self._plan(max_attempts=20)
+        worker = ShardWorker(self._parser(transport=Transport(retries=0)),
+                             self._queue(max_attempts=20), poll_interval=0.05)
+        worker.run()
+        self.assertGreater(self.server.status_counts[503], 0)
+        self.assertEqual([vacancy['identifier'] for vacancy in crawl],
+                         IDENTIFIERS)
+        self.assertEqual(crawl.queue.failed(), [])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            open_queue(self.queue_path, backend='redis')
+
+    def test_incomplete_backend(self):
+        class LeaseOnlyQueue(ShardQueue):
+            def lease(self, worker):
+                return None
+
+        with self.assertRaises(TypeError):
+            LeaseOnlyQueue()
+
+
+if __name__ == '__main__':
+    unittest.main()
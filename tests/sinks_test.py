@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from lxml import etree
+
+sys.path.append('..')
+
+import compression
+from compression import open_input
+from sinks import SINKS, create_sink, sink_extension
+
+VACANCIES = [
+    {
+        'url': 'https://karriere.nordsee.com/de/Job-de-j{}.html'.format(i),
+        'identifier': str(i),
+        'title': 'Jöb {}'.format(i),
+        'location': 'Berlin',
+        'position': 'Vollzeit',
+        'description': '<b>Description</b> {}'.format(i),
+    } for i in range(3)
+]
+
+
+class SinkRegistryTestCase(unittest.TestCase):
+    """
+    Output format registry tests
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name):
+        filepath = os.path.join(self.tmp_dir,
+                                'nordsee.' + sink_extension(name))
+        with create_sink(name, filepath) as sink:
+            for vacancy in VACANCIES:
+                sink.write(vacancy)
+        self.assertFalse(os.path.exists(filepath + sink.TMP_SUFFIX))
+        return filepath
+
+    def _read(self, name, filepath):
+        codec = next((codec for codec, suffix in compression.SUFFIXES.items()
+                      if name.endswith(suffix)), None)
+        with open_input(filepath, codec) as f:
+            return f.read()
+
+    def test_formats_round_trip(self):
+        """
+        Test every registered format keeps every vacancy
+        """
+        for name in SINKS:
+            with self.subTest(format=name):
+                content = self._read(name, self._write(name))
+                if name.startswith('jsonl'):
+                    lines = content.decode('utf-8').splitlines()
+                    self.assertEqual([json.loads(line) for line in lines],
+                                     VACANCIES)
+                else:
+                    root = etree.fromstring(content)
+                    self.assertEqual(root.xpath('position/title/text()'),
+                                     ['Jöb 0', 'Jöb 1', 'Jöb 2'])
+
+    def test_gzip_is_compressed(self):
+        """
+        Test gzip variant is written compressed
+        """
+        with open(self._write('jsonl.gz'), 'rb') as f:
+            self.assertEqual(f.read(2), b'\x1f\x8b')
+
+    @unittest.skipUnless(compression.available('zstd'),
+                         'zstandard is not installed')
+    def test_zstd_is_registered(self):
+        """
+        Test zstd variants are available with zstandard installed
+        """
+        self.assertIn('xml-compact.zst', SINKS)
+
+    def test_compact_xml(self):
+        """
+        Test compact xml leaves out empty elements and indentation
+        """
+        with open(self._write('xml-compact'), 'rb') as f:
+            content = f.read()
+        self.assertNotIn(b'<start_date/>', content)
+        self.assertNotIn(b'<zip/>', content)
+        self.assertNotIn(b'\n  ', content)
+        position = etree.fromstring(content).find('position')
+        self.assertEqual(position.findtext('company/address/city'), 'Berlin')
+        self.assertEqual(position.findtext('description'),
+                         '<b>Description</b> 0')
+
+    def test_unknown_format(self):
+        """
+        Test unknown format name lists the registered ones
+        """
+        with self.assertRaises(ValueError) as context:
+            create_sink('yaml', os.path.join(self.tmp_dir, 'nordsee.yaml'))
+        self.assertIn('jsonl.gz', str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
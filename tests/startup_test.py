@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.append('..')
+
+from exchanger import UnsupportedPlatform, get_driver_path
+from user_agents import USER_AGENTS, UserAgentPool
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('selenium', 'splinter', 'fake_useragent', 'pyquery',
+                 'zstandard')
+
+
+def import_state(code):
+    """
+    Run code in a fresh interpreter
+    :param code: python code
+    :return: dict with loaded heavy modules and root logging handlers
+    """
+    script = (code + '\nimport json, logging, sys\n'
+              'print(json.dumps({"modules": [m for m in %r if m in '
+              'sys.modules], "handlers": len(logging.getLogger().handlers)}))'
+              % (HEAVY_MODULES,))
+    output = subprocess.check_output([sys.executable, '-c', script],
+                                     cwd=ROOT_DIR)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+class StartupTestCase(unittest.TestCase):
+    """
+    Tests of what the entry points load on import
+    """
+    def test_entry_points_import_light(self):
+        """
+        Test heavy dependencies and logging setup wait for the first use
+        """
+        for module in ('vacancy_parser', 'exchanger', 'http_exchanger'):
+            with self.subTest(module=module):
+                self.assertEqual(import_state('import ' + module),
+                                 {'modules': [], 'handlers': 0})
+
+    def test_parser_uses_bundled_user_agents(self):
+        """
+        Test parser starts without the fake_useragent database
+        """
+        state = import_state(
+            'from vacancy_parser import NordseeParser\n'
+            'NordseeParser()')
+        self.assertNotIn('fake_useragent', state['modules'])
+        self.assertIn(UserAgentPool().random, USER_AGENTS)
+
+    def test_unsupported_platform(self):
+        """
+        Test missing driver is reported when launching browser, not on import
+        """
+        with self.assertRaises(UnsupportedPlatform) as context:
+            get_driver_path('win32')
+        self.assertIn('win32', str(context.exception))
+        self.assertIn('linux', str(context.exception))
+        self.assertTrue(get_driver_path('linux').endswith(
+            'chromedriver_linux_x64'))
+
+
+if __name__ == '__main__':
+    unittest.main()
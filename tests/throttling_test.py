@@ -0,0 +1,129 @@
+import sys
+import time
+import unittest
+
+from email.utils import formatdate
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer
+from metrics import Metrics
+from throttling import AdaptiveRateLimiter, parse_retry_after
+from vacancy_parser import NordseeParser
+
+URL = 'http://example.com/a'
+VACANCIES_AMOUNT = 100
+
+
+class AdaptiveRateLimiterTestCase(unittest.TestCase):
+    """
+    Adaptive rate limiter tests
+    """
+    def test_aimd(self):
+        """
+        Test rate grows while the site keeps up and drops on throttling
+        """
+        limiter = AdaptiveRateLimiter(rate=4.0, min_rate=1.0, max_rate=5.0,
+                                      increase=1.0, decrease=0.5)
+        for _ in range(4):
+            self.assertFalse(limiter.record(URL, 200, 0.01))
+        self.assertGreater(limiter.rate_of(URL), 4.5)
+        for _ in range(10):
+            limiter.record(URL, 200, 0.01)
+        self.assertEqual(limiter.rate_of(URL), 5.0)
+
+        self.assertTrue(limiter.record(URL, 429, 0.01))
+        self.assertEqual(limiter.rate_of(URL), 2.5)
+        # responses to requests sent before the decrease
+        self.assertTrue(limiter.record(URL, 503, 0.01))
+        self.assertEqual(limiter.rate_of(URL), 2.5)
+        self.assertEqual(limiter.rate_of('http://other.com/a'), 4.0)
+
+    def test_slow_responses(self):
+        """
+        Test responses slower than the target latency decrease the rate
+        """
+        limiter = AdaptiveRateLimiter(rate=4.0, decrease=0.5,
+                                      target_latency=0.5)
+        self.assertFalse(limiter.record(URL, 200, 1.0))
+        self.assertEqual(limiter.rate_of(URL), 2.0)
+
+    def test_retry_after(self):
+        """
+        Test Retry-After stops requests to the host
+        """
+        limiter = AdaptiveRateLimiter(rate=100.0)
+        limiter.record(URL, 429, 0.01, retry_after='0.2')
+        self.assertGreater(limiter.reserve(URL), 0.15)
+        self.assertEqual(limiter.reserve('http://other.com/a'), 0.0)
+
+    def test_parse_retry_after(self):
+        """
+        Test Retry-After in seconds and as HTTP date
+        """
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertAlmostEqual(
+            parse_retry_after(formatdate(time.time() + 60, usegmt=True)),
+            60, delta=2)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_metrics(self):
+        """
+        Test rate, queue depth and throttle events are recorded
+        """
+        metrics = Metrics()
+        limiter = AdaptiveRateLimiter(rate=20.0, decrease=0.5,
+                                      metrics=metrics)
+        limiter.record(URL, 429, 0.01, retry_after='0')
+        for _ in range(3):
+            limiter.wait(URL)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(
+            snapshot['gauges']['rate_limit_rate{host="example.com"}'], 10.0)
+        self.assertEqual(snapshot['gauges'][
+            'rate_limit_queue_depth{host="example.com"}'], 0)
+        self.assertEqual(snapshot['counters'][
+            'rate_limit_throttles{host="example.com",reason="429"}'], 1)
+        self.assertIn('# TYPE nordsee_rate_limit_rate gauge',
+                      metrics.prometheus_text())
+
+
+class AdaptiveCrawlTestCase(unittest.TestCase):
+    """
+    Crawl tests against a stub site throttling with 429
+    """
+    def setUp(self):
+        self.server = StubSiteServer(vacancies_amount=VACANCIES_AMOUNT,
+                                     max_rate=30)
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def _collect(self, **kwargs):
+        parser = NordseeParser(max_workers=4, **kwargs)
+        parser.VACANCY_LIST_URL = self.server.list_url
+        return parser, parser._collect_vacancies()
+
+    def test_adaptive_rate(self):
+        """
+        Test adaptive rate slows down to the site rate, retrying throttled
+        pages, and gets throttled less than a too fast fixed rate
+        """
+        _, result = self._collect(rate_limit=200)
+        self.assertEqual(len(result), VACANCIES_AMOUNT)
+        fixed_throttled = self.server.status_counts[429]
+
+        self.server.status_counts.clear()
+        parser, result = self._collect(rate_limit=200, adaptive_rate=True)
+        self.assertEqual(len(result), VACANCIES_AMOUNT)
+        self.assertGreater(self.server.status_counts[429], 0)
+        self.assertLess(self.server.status_counts[429], fixed_throttled)
+        self.assertLess(parser.rate_limiter.rate_of(self.server.list_url),
+                        200)
+
+
+if __name__ == '__main__':
+    unittest.main()
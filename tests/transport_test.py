@@ -0,0 +1,84 @@
+import sys
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.append('..')
+
+from benchmarks.stub_site import StubSiteServer, vacancy_path
+from transport import Transport, TransportStats
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Answer 503 to the first `failures` requests
+    """
+
+    def do_GET(self):
+        self.server.hits += 1
+        status = 503 if self.server.hits <= self.server.failures else 200
+        body = b'ok'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TransportTestCase(unittest.TestCase):
+    """
+    Transport tests
+    """
+    def test_reuses_connections(self):
+        """
+        Test keep-alive session opens one connection for sequential requests
+        """
+        transport = Transport(pool_maxsize=1)
+        with StubSiteServer() as server:
+            for number in range(5):
+                response = transport.get(server.base_url +
+                                         vacancy_path(number))
+                self.assertEqual(response.status_code, 200)
+        summary = transport.stats.summary()
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['new_connections'], 1)
+        self.assertGreater(summary['bytes'], 0)
+
+    def test_retries_server_errors(self):
+        """
+        Test 5xx responses are retried with backoff
+        """
+        server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+        server.hits = 0
+        server.failures = 2
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            transport = Transport(retries=3, backoff_factor=0.01)
+            response = transport.get(
+                'http://127.0.0.1:{}/'.format(server.server_address[1]))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(transport.stats.summary()['retries'], 2)
+
+    def test_keeps_latest_timings(self):
+        """
+        Test stats keep timings of the latest requests and count all of them
+        """
+        stats = TransportStats(max_requests=2)
+        for number in range(5):
+            stats.record({'url': str(number), 'status': 200, 'size': 10,
+                          'retries': 0, 'new_connections': 1, 'tcp': 0.0,
+                          'tls': 0.0, 'ttfb': 0.0, 'total': float(number)})
+        summary = stats.summary()
+        self.assertEqual([r['url'] for r in stats.requests], ['3', '4'])
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['bytes'], 50)
+        self.assertEqual(summary['total']['mean'], 3.5)
+
+if __name__ == '__main__':
+    unittest.main()
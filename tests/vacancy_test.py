@@ -0,0 +1,71 @@
+import json
+import pickle
+import sys
+import unittest
+
+sys.path.append('..')
+
+from vacancy import Vacancy
+
+DESCRIPTION = 'Wir freuen uns auf Ihre Bewerbung. ' * 40
+
+
+class VacancyTestCase(unittest.TestCase):
+    """
+    Vacancy record tests
+    """
+    def setUp(self):
+        self.vacancy = Vacancy(url='https://karriere.nordsee.com/de/x-j7.html',
+                               identifier='7', title='Verkäufer',
+                               location='Berlin', position='Vollzeit')
+
+    def test_item_access(self):
+        """
+        Test vacancy is used like the dicts before
+        """
+        self.vacancy['source'] = 'nordsee'
+        self.vacancy['description'] = 'Text'
+
+        self.assertEqual(self.vacancy['identifier'], '7')
+        self.assertEqual(self.vacancy.description, 'Text')
+        self.assertEqual(self.vacancy['source'], 'nordsee')
+        self.assertIn('source', self.vacancy)
+        self.assertNotIn('salary', self.vacancy)
+        self.assertIsNone(self.vacancy.get('salary'))
+        with self.assertRaises(KeyError):
+            self.vacancy['salary']
+        self.assertEqual(json.loads(json.dumps(dict(self.vacancy))),
+                         self.vacancy)
+
+    def test_no_instance_dict(self):
+        """
+        Test record has no per-instance dict
+        """
+        self.assertFalse(hasattr(self.vacancy, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.vacancy.salary = 1
+
+    def test_compressed_description(self):
+        """
+        Test long description is compressed and read back
+        """
+        self.vacancy.set_description(DESCRIPTION, compress=True)
+        self.assertIsInstance(self.vacancy._description, bytes)
+        self.assertLess(len(self.vacancy._description), len(DESCRIPTION))
+        self.assertEqual(self.vacancy['description'], DESCRIPTION)
+
+        self.vacancy.set_description('Kurz', compress=True)
+        self.assertEqual(self.vacancy._description, 'Kurz')
+
+    def test_pickle(self):
+        """
+        Test vacancy can be passed to worker processes
+        """
+        self.vacancy.set_description(DESCRIPTION, compress=True)
+        self.vacancy['source'] = 'nordsee'
+        self.assertEqual(pickle.loads(pickle.dumps(self.vacancy)),
+                         self.vacancy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import time
+import unittest
+
+from unittest.mock import MagicMock
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+sys.path.append('..')
+
+from exchanger import Exchanger
+from waits import StepTimings, WaitTimeout, wait_for
+
+
+class FakeDriver:
+    """
+    Driver whose element appears after `delay` seconds
+    """
+    def __init__(self, delay):
+        self.appears_at = time.monotonic() + delay
+
+    def find_element(self, by=None, value=None):
+        if time.monotonic() < self.appears_at:
+            raise NoSuchElementException(value)
+        return value
+
+
+class WaitsTestCase(unittest.TestCase):
+    """
+    Explicit waits tests
+    """
+    def test_wait_returns_when_condition_is_met(self):
+        """
+        Test wait finishes soon after the element appears
+        """
+        condition = EC.presence_of_element_located((By.ID, 'agreement'))
+        started = time.monotonic()
+        result = wait_for(FakeDriver(0.2), condition, 'click_agree',
+                          'agreement block', timeout=5, poll_interval=0.05)
+        self.assertEqual(result, 'agreement')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_wait_timeout(self):
+        """
+        Test wait gives up after the deadline with structured error
+        """
+        condition = EC.presence_of_element_located((By.ID, 'agreement'))
+        with self.assertRaises(WaitTimeout) as context:
+            wait_for(FakeDriver(10), condition, 'click_agree',
+                     'agreement block', timeout=0.2, poll_interval=0.05)
+        self.assertEqual(context.exception.to_dict(),
+                         {'step': 'click_agree',
+                          'condition': 'agreement block', 'timeout': 0.2})
+
+    def test_step_timings(self):
+        """
+        Test waiting time is counted separately from working time
+        """
+        timings = StepTimings()
+        condition = EC.presence_of_element_located((By.ID, 'agreement'))
+        with timings.step('click_agree'):
+            wait_for(FakeDriver(0.2), condition, 'click_agree',
+                     'agreement block', timeout=5, poll_interval=0.05,
+                     timings=timings)
+            time.sleep(0.1)
+        step = timings.as_dict()['click_agree']
+        self.assertGreaterEqual(step['wait'], 0.2)
+        self.assertGreaterEqual(step['work'], 0.1)
+        self.assertLess(step['work'], 0.2)
+
+    def test_zero_wait_timeout(self):
+        """
+        Test explicit zero timeout of exchanger is not replaced by default
+        """
+        browser = MagicMock()
+        browser.driver = FakeDriver(0.5)
+        exchanger = Exchanger('http://stub/1', {}, browser=browser,
+                              wait_timeout=0, poll_interval=0.05,
+                              cv_cache=MagicMock())
+        condition = EC.presence_of_element_located((By.ID, 'agreement'))
+        started = time.monotonic()
+        with self.assertRaises(WaitTimeout):
+            exchanger._wait('click_agree', 'agreement block', condition)
+        self.assertLess(time.monotonic() - started, 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
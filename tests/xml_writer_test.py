@@ -0,0 +1,71 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+from lxml import etree
+
+sys.path.append('..')
+
+from vacancy_parser import NordseeParser
+from xml_writer import StreamingXmlWriter
+
+VACANCIES = [
+    {
+        'url': 'https://karriere.nordsee.com/de/Job-de-j{}.html'.format(i),
+        'identifier': str(i),
+        'title': 'Job {}'.format(i),
+        'location': 'Berlin',
+        'position': 'Vollzeit',
+        'description': '<b>Description</b> {}'.format(i),
+    } for i in range(3)
+]
+
+
+class XmlWriterTestCase(unittest.TestCase):
+    """
+    Xml export tests
+    """
+    def setUp(self):
+        self.parser = NordseeParser()
+        self.parser.OUTPUT_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.parser.OUTPUT_DIR)
+
+    def test_stream_matches_tree(self):
+        """
+        Test streamed file has the same content as the built tree
+        """
+        xml_parser = etree.XMLParser(remove_blank_text=True)
+        tree_root = etree.parse(self.parser._save_to_xml(VACANCIES),
+                                xml_parser)
+        stream_root = etree.parse(
+            self.parser._stream_to_xml(iter(VACANCIES)), xml_parser)
+        self.assertEqual(etree.tostring(tree_root, method='c14n'),
+                         etree.tostring(stream_root, method='c14n'))
+        self.assertEqual(len(stream_root.findall('position')), 3)
+
+    def test_crash_keeps_previous_file(self):
+        """
+        Test failed crawl does not replace the file and keeps partial output
+        """
+        filepath = self.parser._save_to_xml(VACANCIES)
+        with open(filepath, 'rb') as f:
+            previous = f.read()
+
+        def failing_feed():
+            yield VACANCIES[0]
+            raise RuntimeError('crawl failed')
+
+        with self.assertRaises(RuntimeError):
+            self.parser._stream_to_xml(failing_feed())
+
+        with open(filepath, 'rb') as f:
+            self.assertEqual(f.read(), previous)
+        partial_path = filepath + StreamingXmlWriter.TMP_SUFFIX
+        with open(partial_path, 'rb') as f:
+            self.assertIn(b'<identifier>0</identifier>', f.read())
+
+if __name__ == '__main__':
+    unittest.main()
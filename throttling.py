@@ -0,0 +1,238 @@
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# responses asking to slow down
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from Retry-After header
+    :param value: header value, seconds or HTTP date
+    :return: float seconds or None when there is no valid value
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class HostRateLimiter:
+    """
+    Spread requests to the same host so that no more than `rate`
+    requests per second are started
+    """
+
+    # statuses handled by the limiter instead of the transport retries
+    HANDLED_STATUSES = ()
+
+    def __init__(self, rate=None):
+        """
+        Init limiter
+        :param rate: max requests per second per host, None to disable
+        """
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def reserve(self, url):
+        """
+        Take the next slot for a request to the url host without waiting,
+        e.g. to wait for it with asyncio.sleep
+        :param url: request url
+        :return: float seconds until the slot
+        """
+        if not self.rate:
+            return 0.0
+
+        host = urlsplit(url).netloc
+        interval = 1.0 / self.rate
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+        return slot - now
+
+    def wait(self, url):
+        """
+        Block until a request to the url host is allowed
+        :param url: request url
+        :return: float seconds spent waiting
+        """
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def record(self, url, status, latency, retry_after=None):
+        """
+        Observe response, the fixed rate does not change
+        :param url: request url
+        :param status: response status code
+        :param latency: seconds the request took
+        :param retry_after: Retry-After header value
+        :return: bool whether to send the request again
+        """
+        return False
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket per host whose rate follows the site (AIMD): every
+    response in time adds `increase / rate`, so the rate grows by
+    `increase` requests per second every second, while a 429 or 503
+    response or a response slower than `target_latency` multiplies it by
+    `decrease`, at most once per round trip. Retry-After stops requests
+    to the host for the given time
+    """
+
+    HANDLED_STATUSES = THROTTLE_STATUSES
+
+    def __init__(self, rate=2.0, min_rate=0.5, max_rate=50.0, burst=1.0,
+                 increase=2.0, decrease=0.7, target_latency=2.0,
+                 metrics=None):
+        """
+        Init limiter
+        :param rate: start requests per second per host
+        :param min_rate: lowest requests per second per host
+        :param max_rate: highest requests per second per host
+        :param burst: requests allowed at once after an idle time
+        :param increase: requests per second added every second while
+        the site keeps up
+        :param decrease: rate multiplier when the site is throttling
+        :param target_latency: seconds above which a response counts as
+        the site slowing down
+        :param metrics: Metrics to record rate, queue depth and throttle
+        events in
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, url):
+        """
+        State of the url host, must be called with the lock held
+        :param url: request url
+        :return: tuple (str host, dict state)
+        """
+        host = urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            now = time.monotonic()
+            state = self._hosts[host] = {
+                'rate': self.rate, 'tokens': self.burst, 'updated': now,
+                'blocked_until': now, 'last_decrease': 0.0, 'waiting': 0}
+        return host, state
+
+    def rate_of(self, url):
+        """
+        Current rate of the url host
+        :param url: request url
+        :return: float requests per second
+        """
+        with self._lock:
+            return self._host(url)[1]['rate']
+
+    def reserve(self, url):
+        """
+        Take a token for a request to the url host without waiting
+        :param url: request url
+        :return: float seconds until the token is available
+        """
+        with self._lock:
+            _, state = self._host(url)
+            now = time.monotonic()
+            state['tokens'] = min(
+                self.burst,
+                state['tokens'] + (now - state['updated']) * state['rate'])
+            state['updated'] = now
+            state['tokens'] -= 1.0
+            delay = max(0.0, -state['tokens'] / state['rate'])
+            return max(delay, state['blocked_until'] - now)
+
+    def wait(self, url):
+        """
+        Block until a request to the url host is allowed
+        :param url: request url
+        :return: float seconds spent waiting
+        """
+        delay = self.reserve(url)
+        if delay <= 0:
+            return 0.0
+
+        with self._lock:
+            host, state = self._host(url)
+            state['waiting'] += 1
+            self._gauge('rate_limit_queue_depth', state['waiting'], host)
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                state['waiting'] -= 1
+                self._gauge('rate_limit_queue_depth', state['waiting'], host)
+        return delay
+
+    def record(self, url, status, latency, retry_after=None):
+        """
+        Adapt the rate of the url host to the response
+        :param url: request url
+        :param status: response status code
+        :param latency: seconds the request took
+        :param retry_after: Retry-After header value
+        :return: bool whether the response asked to slow down and the
+        request should be sent again
+        """
+        throttled = status in THROTTLE_STATUSES
+        with self._lock:
+            host, state = self._host(url)
+            now = time.monotonic()
+            if throttled or latency > self.target_latency:
+                reason = status if throttled else 'latency'
+                self._inc('rate_limit_throttles', host, reason=reason)
+                # responses of requests sent before the last decrease
+                # should not decrease the rate again
+                if now - state['last_decrease'] > max(latency,
+                                                      1.0 / state['rate']):
+                    state['rate'] = max(self.min_rate,
+                                        state['rate'] * self.decrease)
+                    state['last_decrease'] = now
+            else:
+                state['rate'] = min(self.max_rate,
+                                    state['rate'] +
+                                    self.increase / state['rate'])
+
+            seconds = parse_retry_after(retry_after) if throttled else None
+            if seconds:
+                self._inc('rate_limit_retry_after_seconds', host,
+                          value=seconds)
+                state['blocked_until'] = max(state['blocked_until'],
+                                             now + seconds)
+            self._gauge('rate_limit_rate', state['rate'], host)
+        return throttled
+
+    def _inc(self, name, host, value=1, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, value, host=host, **labels)
+
+    def _gauge(self, name, value, host):
+        if self.metrics is not None:
+            self.metrics.set(name, value, host=host)
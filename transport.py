@@ -0,0 +1,225 @@
+import threading
+import time
+
+from collections import deque
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# timing of the request currently sent by the thread
+_current = threading.local()
+
+
+class _TimedConnectionMixin:
+    """
+    Record how long opening a new connection takes.
+    `tcp` includes the DNS lookup, `tls` is the rest of `connect`
+    """
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            timing = getattr(_current, 'timing', None)
+            if timing is not None:
+                timing['tcp'] += time.perf_counter() - started
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            timing = getattr(_current, 'timing', None)
+            if timing is not None:
+                timing['connect'] += time.perf_counter() - started
+                timing['new_connections'] += 1
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Adapter whose pools open timed connections
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+class TransportStats:
+    """
+    Thread safe collection of per request timings.
+    Counters cover every request, phase timings the last `max_requests`
+    """
+
+    FIELDS = ('tcp', 'tls', 'ttfb', 'total')
+    MAX_REQUESTS = 10000
+
+    def __init__(self, max_requests=MAX_REQUESTS):
+        """
+        Init stats
+        :param max_requests: amount of latest requests to keep timings of
+        """
+        self._lock = threading.Lock()
+        self.requests = deque(maxlen=max_requests)
+        self._counters = {'requests': 0, 'new_connections': 0, 'retries': 0,
+                          'bytes': 0}
+
+    def record(self, timing):
+        """
+        Add timing of one request
+        :param timing: dict with url, status, size, retries,
+        new_connections and the FIELDS timings in seconds
+        """
+        with self._lock:
+            self.requests.append(timing)
+            self._counters['requests'] += 1
+            self._counters['new_connections'] += timing['new_connections']
+            self._counters['retries'] += timing['retries']
+            self._counters['bytes'] += timing['size']
+
+    def summary(self):
+        """
+        Aggregate recorded timings
+        :return: dict with request counters and mean/p50/p95 per phase
+        """
+        with self._lock:
+            requests = list(self.requests)
+            summary = dict(self._counters)
+
+        for field in self.FIELDS:
+            values = sorted(r[field] for r in requests)
+            summary[field] = {
+                'mean': sum(values) / len(values) if values else 0.0,
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+            }
+        return summary
+
+
+def percentile(values, fraction):
+    """
+    Percentile of sorted values
+    :param values: sorted list of numbers
+    :param fraction: float from 0 to 1
+    :return: float
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Transport:
+    """
+    Pooled keep-alive HTTP session with retries and timing stats
+    """
+
+    def __init__(self, user_agent=None, pool_connections=10, pool_maxsize=10,
+                 retries=3, backoff_factor=0.5, timeout=60, verify=True,
+                 metrics=None, retry_statuses=RETRY_STATUSES,
+                 respect_retry_after=True):
+        """
+        Init transport
+        :param user_agent: User-Agent header sent with every request
+        :param pool_connections: amount of hosts to keep pools for
+        :param pool_maxsize: connections kept alive per host
+        :param retries: retries on connection errors, timeouts and 5xx
+        :param backoff_factor: retry n sleeps backoff_factor * 2 ** (n - 1)
+        :param timeout: request timeout in seconds
+        :param verify: verify TLS certificates
+        :param metrics: Metrics to count requests, bytes and retries in
+        :param retry_statuses: response statuses to retry
+        :param respect_retry_after: also retry 429 and 503 responses with
+        Retry-After header, after waiting as long as they ask
+        """
+        self.timeout = timeout
+        self.stats = TransportStats()
+        self.metrics = metrics
+        self.session = requests.Session()
+        self.session.verify = verify
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor,
+                      status_forcelist=retry_statuses, raise_on_status=False,
+                      respect_retry_after_header=respect_retry_after)
+        adapter = TimedHTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def build_url(url, params=None):
+        """
+        Url with encoded query params, as it is requested
+        :param url: request url
+        :param params: query params
+        :return: str
+        """
+        return requests.Request('GET', url, params=params).prepare().url
+
+    def get(self, url, params=None, **kwargs):
+        """
+        Make GET request and record its timing
+        :param url: request url
+        :param params: query params
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        timing = {'tcp': 0.0, 'connect': 0.0, 'new_connections': 0}
+        _current.timing = timing
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        finally:
+            _current.timing = None
+        total = time.perf_counter() - started
+
+        retries = response.raw.retries
+        retries = len(retries.history) if retries else 0
+        if self.metrics is not None:
+            self.metrics.inc('http_requests', status=response.status_code)
+            self.metrics.inc('http_bytes', len(response.content))
+            if retries:
+                self.metrics.inc('http_retries', retries)
+        self.stats.record({
+            'url': response.url,
+            'status': response.status_code,
+            'size': len(response.content),
+            'retries': retries,
+            'new_connections': timing['new_connections'],
+            'tcp': timing['tcp'],
+            'tls': timing['connect'] - timing['tcp'],
+            'ttfb': response.elapsed.total_seconds(),
+            'total': total,
+        })
+        return response
+
+    def close(self):
+        self.session.close()
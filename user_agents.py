@@ -0,0 +1,69 @@
+import logging
+import random
+
+# common desktop browsers, so the parser starts without loading or
+# fetching a user agent database
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) '
+    'Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:125.0) '
+    'Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:125.0) '
+    'Gecko/20100101 Firefox/125.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 '
+    '(KHTML, like Gecko) Version/17.4 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.0.0',
+)
+
+
+class UserAgentPool:
+    """
+    User agents to pick from. The bundled list is used by default,
+    the fake_useragent database is loaded only when asked for and only
+    when the first user agent is picked
+    """
+
+    def __init__(self, use_fake_useragent=False):
+        """
+        Init pool
+        :param use_fake_useragent: pick from the fake_useragent database,
+        falling back to the bundled list when it can not be loaded
+        """
+        self.use_fake_useragent = use_fake_useragent
+        self._fake_useragent = None
+
+    def _load_fake_useragent(self):
+        """
+        Load fake_useragent database once
+        :return: fake_useragent.UserAgent or None when it can not be loaded
+        """
+        if self._fake_useragent is None:
+            try:
+                from fake_useragent import UserAgent
+                self._fake_useragent = UserAgent()
+            except Exception as e:
+                logging.info('Can not load fake_useragent, using bundled '
+                             'user agents: {}'.format(str(e)))
+                self.use_fake_useragent = False
+        return self._fake_useragent
+
+    @property
+    def random(self):
+        """
+        Random user agent
+        :return: str
+        """
+        if self.use_fake_useragent:
+            fake_useragent = self._load_fake_useragent()
+            if fake_useragent is not None:
+                return fake_useragent.random
+        return random.choice(USER_AGENTS)
@@ -0,0 +1,124 @@
+import sys
+import zlib
+
+
+class Vacancy:
+    """
+    Compact vacancy record.
+    Uses __slots__ instead of a per-vacancy dict, interns short fields
+    repeated across vacancies (title, location, position) and can keep
+    long descriptions zlib compressed. Supports item access like the
+    dicts used before, so sinks, enrichers and build_position work with it
+    """
+
+    FIELDS = ('url', 'identifier', 'title', 'location', 'position',
+              'description')
+    # descriptions shorter than this are never compressed
+    COMPRESS_MIN_SIZE = 512
+
+    __slots__ = ('url', 'identifier', 'title', 'location', 'position',
+                 '_description', '_extra')
+
+    def __init__(self, url=None, identifier=None, title=None, location=None,
+                 position=None, description=None):
+        """
+        Init record
+        :param url: vacancy url
+        :param identifier: vacancy identifier from url
+        :param title: vacancy title
+        :param location: vacancy location
+        :param position: vacancy position, like Vollzeit
+        :param description: vacancy description
+        """
+        self.url = url
+        self.identifier = identifier
+        self.title = _intern(title)
+        self.location = _intern(location)
+        self.position = _intern(position)
+        self._description = description
+        # fields added by enrichers
+        self._extra = None
+
+    @property
+    def description(self):
+        if isinstance(self._description, bytes):
+            return zlib.decompress(self._description).decode('utf-8')
+        return self._description
+
+    @description.setter
+    def description(self, value):
+        self._description = value
+
+    def set_description(self, description, compress=False):
+        """
+        Set description
+        :param description: str description
+        :param compress: keep long description zlib compressed
+        """
+        if (compress and description and
+                len(description) >= self.COMPRESS_MIN_SIZE):
+            description = zlib.compress(description.encode('utf-8'))
+        self._description = description
+
+    def keys(self):
+        keys = list(self.FIELDS)
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELDS or bool(self._extra and key in self._extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Vacancy from dict made by to_dict
+        :param data: dict
+        :return: Vacancy
+        """
+        vacancy = cls()
+        for key, value in data.items():
+            vacancy[key] = value
+        return vacancy
+
+    def to_dict(self):
+        """
+        Vacancy as dict, e.g. to serialize it to json
+        :return: dict
+        """
+        return {key: self[key] for key in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, Vacancy):
+            other = other.to_dict()
+        if not isinstance(other, dict):
+            return NotImplemented
+        return self.to_dict() == other
+
+    def __repr__(self):
+        return '<Vacancy {} {!r}>'.format(self.identifier, self.title)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
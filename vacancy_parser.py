@@ -1,13 +1,38 @@
 import os
+import time
 import logging
-import re
-import requests as rq
+import argparse
+
+from collections import deque
 
 from lxml import etree
-from pyquery import PyQuery as pq
-from fake_useragent import UserAgent
 
-logging.basicConfig(filename='logs.log', level=logging.INFO)
+from crawl_journal import CheckpointedCrawl, CrawlJournal
+from delta import DeltaXmlWriter, VacancyIndex, vacancy_key
+from extractors import EXTRACTORS, VACANCY_DATA_VERSION
+from metrics import JsonLinesExporter, Metrics, MetricsServer
+from page_cache import PageCache
+from pipeline import VacancyPipeline
+from profiling import Profiler
+from sinks import SINKS, JsonLinesSink, XmlSink, create_sink, sink_extension
+from throttling import AdaptiveRateLimiter, HostRateLimiter
+from transport import RETRY_STATUSES, Transport
+from user_agents import UserAgentPool
+from xml_writer import build_position
+
+
+class PageUnavailable(Exception):
+    """
+    Page could not be fetched
+    """
+
+    def __init__(self, url, reason=None):
+        self.url = url
+        self.reason = reason
+        message = 'Can not get page {}'.format(url)
+        if reason:
+            message = '{}: {}'.format(message, reason)
+        super().__init__(message)
 
 
 class NordseeParser:
@@ -19,133 +44,415 @@ class NordseeParser:
     UA_SUFFIX = 'JobUFO GmbH'
     OUTPUT_DIR = 'parsed_xml'
     OUTPUT_FILENAME = 'nordsee.xml'
+    DELTA_FILENAME = 'nordsee_delta.xml'
+    INDEX_FILENAME = 'nordsee.index'
+    CACHE_DIR = 'cache'
+    REQUEST_TIMEOUT = 60
+    # vacancies per list page until it is detected from the first page
+    PAGE_SIZE = 20
+    # times a request is sent again when the site asks to slow down
+    THROTTLED_RETRIES = 5
 
-    def __init__(self):
+    def __init__(self, max_workers=1, rate_limit=None, transport=None,
+                 page_cache=None, extractor='pyquery', parse_workers=0,
+                 metrics=None, compress_descriptions=False, journal=None,
+                 retries=2, delta=False, adaptive_rate=False,
+                 fake_useragent=False):
         """
         Initialize parser
+        :param max_workers: max amount of pages fetched at the same time
+        :param rate_limit: max requests per second per host, None for no limit
+        :param transport: Transport to make requests with, by default
+        a pooled session with one keep-alive connection per worker
+        :param page_cache: PageCache to revalidate pages with and to reuse
+        data of unchanged vacancies from, None to always parse everything
+        :param extractor: html extraction backend, 'pyquery' or 'lxml'
+        :param parse_workers: amount of processes to parse detail pages in,
+        0 to parse them in the crawling process
+        :param metrics: Metrics to record spans and counters in
+        :param compress_descriptions: keep long descriptions of parsed
+        vacancies zlib compressed in memory
+        :param journal: CrawlJournal to record progress in, so a stopped
+        crawl resumes where it stopped and failed pages are retried,
+        None to crawl with the pipeline
+        :param retries: amount of passes retrying failed pages when
+        crawling with journal
+        :param delta: also write vacancies added, changed and removed since
+        the previous run to a delta xml file
+        :param adaptive_rate: adapt the rate per host to latency and 429/503
+        responses, starting from rate_limit
+        :param fake_useragent: pick the user agent from the fake_useragent
+        database instead of the bundled list
         """
-        self.user_agent = UserAgent()
+        self.metrics = metrics or Metrics()
+        self.user_agent = UserAgentPool(use_fake_useragent=fake_useragent)
+        self.max_workers = max_workers
+        if adaptive_rate:
+            self.rate_limiter = AdaptiveRateLimiter(
+                rate=rate_limit or AdaptiveRateLimiter().rate,
+                metrics=self.metrics)
+        else:
+            self.rate_limiter = HostRateLimiter(rate_limit)
+        self.transport = transport or self._build_transport()
+        self.page_cache = page_cache
+        self.extractor_name = extractor
+        self.extractor = EXTRACTORS[extractor]()
+        self.parse_workers = parse_workers
+        self.compress_descriptions = compress_descriptions
+        self.journal = journal
+        self.retries = retries
+        self.page_size = self.PAGE_SIZE
+        self.delta = delta
+        self._delta_writer = None
 
-    @property
-    def _request_settings(self):
+    def _build_transport(self):
         """
-        Settings to make requests with random user agent
-        :return: dict with settings
+        Build pooled session with random user agent
+        :return: Transport
         """
-        return {
-            'timeout': 60,
-            'headers': {'User-Agent': '{} {}'.format(self.user_agent.random,
-                                                     self.UA_SUFFIX)},
-            'verify': False,
-        }
+        return Transport(
+            user_agent='{} {}'.format(self.user_agent.random, self.UA_SUFFIX),
+            pool_maxsize=max(self.max_workers, 1),
+            timeout=self.REQUEST_TIMEOUT,
+            verify=False,
+            metrics=self.metrics,
+            # the rate limiter waits and retries when the site throttles
+            retry_statuses=tuple(
+                status for status in RETRY_STATUSES
+                if status not in self.rate_limiter.HANDLED_STATUSES),
+            respect_retry_after=not self.rate_limiter.HANDLED_STATUSES)
 
     def _get_page_content(self, url, params=None):
-        try:
-            return rq.get(url, params=params, **self._request_settings).content
-        except Exception as e:
-            logging.info('Can not get page: {}'.format(str(e)))
+        with self.metrics.span('get_page_content', url=url, params=params):
+            try:
+                if self.page_cache is None:
+                    response = self._request(url, params=params)
+                    # error pages are not vacancies
+                    response.raise_for_status()
+                    return response.content
+                return self._get_cached_page_content(url, params)
+            except Exception as e:
+                self.metrics.inc('errors', stage='get_page_content')
+                logging.info('Can not get page {}: {}'.format(url, str(e)))
+
+    def _get_cached_page_content(self, url, params=None):
+        """
+        Revalidate cached page with conditional request
+        :param url: page url
+        :param params: query params
+        :return: bytes page body
+        """
+        url = self.transport.build_url(url, params)
+        entry = self.page_cache.lookup(url)
+        response = self._request(
+            url, headers=self.page_cache.conditional_headers(entry))
+
+        if response.status_code == 304 and entry:
+            self.metrics.inc('cache_hits', cache='page')
+            self.page_cache.touch(url)
+            return entry['body']
+
+        response.raise_for_status()
+        if response.status_code == 200:
+            self.page_cache.store(url, response.content,
+                                  etag=response.headers.get('ETag'),
+                                  last_modified=response.headers.get(
+                                      'Last-Modified'))
+        return response.content
+
+    def _request(self, url, params=None, headers=None):
+        """
+        Make GET request when the rate limiter allows it, and send it
+        again while the site asks to slow down
+        :param url: page url
+        :param params: query params
+        :param headers: request headers
+        :return: requests.Response
+        """
+        for _ in range(self.THROTTLED_RETRIES + 1):
+            self.rate_limiter.wait(url)
+            started = time.perf_counter()
+            response = self.transport.get(url, params=params,
+                                          headers=headers)
+            if not self.rate_limiter.record(
+                    url, response.status_code,
+                    time.perf_counter() - started,
+                    retry_after=response.headers.get('Retry-After')):
+                break
+        return response
 
     def _get_pages_amount(self):
         """
-        Get vacancy pages amount
+        Get vacancy pages amount.
+        Raises PageUnavailable when the vacancy list can not be fetched
         :return: int
         """
-        content = self._get_page_content(url=self.VACANCY_LIST_URL)
-        d = pq(content)
+        return self._get_first_list_page()[0]
 
-        pages_amount = int(d('.nav_item:last a').text())
-        logging.info('Count of vacancies pages is {}'.format(pages_amount))
-        return pages_amount
+    def _get_first_list_page(self, content=None):
+        """
+        Fetch the first vacancy list page once for both the pages amount
+        and its vacancies, and detect the page size from its rows.
+        Raises PageUnavailable when the vacancy list can not be fetched
+        or has no vacancy rows, e.g. a maintenance page or a changed
+        layout, so the previous output is kept
+        :param content: already fetched page content
+        :return: tuple (int pages amount, list of Vacancy)
+        """
+        with self.metrics.span('get_common_vacancy_info', page=0):
+            if content is None:
+                content = self._get_page_content(url=self.VACANCY_LIST_URL)
+            if content is None:
+                raise PageUnavailable(self.VACANCY_LIST_URL)
+            try:
+                pages_amount, vacancy_info_list = \
+                    self.extractor.list_page(content)
+            except ValueError:
+                # no pager when all vacancies fit on one page
+                pages_amount = 1
+                vacancy_info_list = self.extractor.common_vacancy_info(
+                    content)
+            if not vacancy_info_list:
+                raise PageUnavailable(self.VACANCY_LIST_URL,
+                                      'no vacancy rows on the list page')
 
-    def _get_common_vacancy_info(self, page=0):
+        if pages_amount > 1 and vacancy_info_list:
+            self.page_size = len(vacancy_info_list)
+        logging.info('Count of vacancies pages is {}, {} vacancies per '
+                     'page'.format(pages_amount, self.page_size))
+        return pages_amount, vacancy_info_list
+
+    def _get_list_page(self, page):
         """
-        Get common vacancy info from vacancy list page
+        Get vacancies of list page
         :param page: int page number
-        :return: list of common vacancy info
+        :return: list of Vacancy or None when the page can not be fetched
         """
-        vacancy_info_list = []
-        params = {'start': page * 20}
         content = self._get_page_content(url=self.VACANCY_LIST_URL,
-                                         params=params)
-        d = pq(content)
+                                         params=self._page_params(page))
+        if content is None:
+            return None
+        return self._get_common_vacancy_info(page, content=content)
 
-        rows = d('#joboffers tbody tr').items()
-        for row in rows:
-            url = row.find('.real_table_col1 a').attr('href')
-            identifier = re.match(r'(.)*-j(?P<id>\d+).html', url)
-            try:
-                identifier = identifier.group('id')
-            except Exception as e:
-                logging.info(
-                    'Can not get identifier from url {}'.format(str(e)))
-
-            common_info = {
-                'url': url,
-                'identifier': identifier,
-                'title': row.find('.real_table_col1 a').text(),
-                'location': row.find('.real_table_col2').text(),
-                'position': row.find('.real_table_col4').text()
-            }
-            vacancy_info_list.append(common_info)
-        logging.info('Urls parsed')
+    def _iter_list_pages(self, executor):
+        """
+        Crawl vacancy list in one pass: the first page gives the pages
+        amount and its vacancies, the remaining pages are fetched
+        concurrently in order. Stops early when a page has no new
+        vacancies, e.g. when the site has fewer pages than the pager shows
+        :param executor: executor to fetch pages in
+        :return: generator of lists of Vacancy
+        """
+        pages_amount, vacancy_info_list = self._get_first_list_page()
+        seen = set(vacancy_key(info_item) for info_item in vacancy_info_list)
+        yield vacancy_info_list
+
+        pages = iter(range(1, pages_amount))
+        pending = deque()
+
+        def submit():
+            page = next(pages, None)
+            if page is not None:
+                pending.append((page, executor.submit(self._get_list_page,
+                                                      page)))
+
+        for _ in range(max(self.max_workers, 1)):
+            submit()
+        while pending:
+            page, future = pending.popleft()
+            new = self._new_list_vacancies(page, pages_amount,
+                                           future.result(), seen)
+            if new is None:
+                for _, future in pending:
+                    future.cancel()
+                return
+            if new:
+                yield new
+            submit()
+
+    def _new_list_vacancies(self, page, pages_amount, vacancy_info_list,
+                            seen):
+        """
+        Vacancies of a list page after the first one which were not seen
+        on the pages before it
+        :param page: int page number
+        :param pages_amount: int pages amount shown by the pager
+        :param vacancy_info_list: list of Vacancy or None when the page
+        can not be fetched
+        :param seen: set of keys of vacancies seen so far, updated
+        :return: list of new Vacancy, empty when the page is skipped, or
+        None when the list finished early
+        """
+        if not vacancy_info_list:
+            # no rows, like a maintenance page or a changed layout, is not
+            # the end of the list
+            self._skip_list_page(page)
+            return []
+
+        new = [info_item for info_item in vacancy_info_list
+               if vacancy_key(info_item) not in seen]
+        if not new:
+            self._finish_list_early(page, pages_amount)
+            return None
+        seen.update(vacancy_key(info_item) for info_item in new)
+        return new
+
+    def _finish_list_early(self, page, pages_amount):
+        """
+        Stop crawling the vacancy list before its last page
+        :param page: int page without new vacancies
+        :param pages_amount: int pages amount shown by the pager
+        """
+        logging.info('No new vacancies on page {} of {}, list finished '
+                     'early'.format(page, pages_amount))
+        if self._delta_writer is not None:
+            # vacancies of the pages not crawled are unknown, do not
+            # report them removed
+            self._delta_writer.keep_all()
+
+    def _skip_list_page(self, page):
+        """
+        Leave out list page which can not be fetched or has no vacancy rows
+        :param page: int page number
+        """
+        logging.info('Vacancy list page {} skipped'.format(page))
+        self.metrics.inc('skipped', kind='list_page')
+        if self._delta_writer is not None:
+            # vacancies of the page are unknown, do not report them removed
+            self._delta_writer.keep_all()
+
+    def _get_common_vacancy_info(self, page=0, content=None):
+        """
+        Get common vacancy info from vacancy list page
+        :param page: int page number
+        :param content: already fetched page content
+        :return: list of Vacancy without description, empty when the page
+        can not be fetched
+        """
+        with self.metrics.span('get_common_vacancy_info', page=page):
+            if content is None:
+                content = self._get_page_content(url=self.VACANCY_LIST_URL,
+                                                 params=self._page_params(
+                                                     page))
+            if content is None:
+                self._skip_list_page(page)
+                return []
+
+            vacancy_info_list = self.extractor.common_vacancy_info(content)
+        logging.info('Urls parsed from page {}: {}'.format(
+            page, len(vacancy_info_list)))
         return vacancy_info_list
 
-    def _get_vacancy_data(self, vacancy_url=None):
+    def _page_params(self, page):
+        """
+        Query params of vacancy list page
+        :param page: int page number
+        :return: dict
+        """
+        return {'start': page * self.page_size}
+
+    def _get_vacancy_data(self, vacancy_url=None, content=None):
         """
         Get data from vacancy page
         :param vacancy_url: vacancy url
+        :param content: already fetched page content
         :return: dict with vacancy data
         """
-        content = self._get_page_content(url=vacancy_url)
-        d = pq(content)
+        with self.metrics.span('get_vacancy_data', url=vacancy_url):
+            if content is None:
+                content = self._get_page_content(url=vacancy_url)
 
-        logging.info('Vacancies data got')
-        content = d('.emp_nr_innerframe')
+            vacancy_data = self.extractor.vacancy_data(content)
+        logging.info('Vacancy data got: {}'.format(vacancy_url))
+        return vacancy_data
 
-        search_from_el = d('.trenner')
-        details = search_from_el.nextAll().filter(
-            lambda i, this: not pq(this).hasClass('abschluss'))
+    @property
+    def _record_version(self):
+        """
+        Version of cached vacancy data, parsed by the current extractor
+        """
+        return '{}:{}'.format(self.extractor_name, VACANCY_DATA_VERSION)
 
-        introduction = content.find('.einleitungstext').text()
-        short_description = content.find('.mitteltext').text()
-        details = details.text()
-        conclusion = content.find('.abschluss').text()
+    def _get_cached_vacancy_data(self, info_item, content):
+        """
+        Get vacancy data parsed on previous run if the page did not change
+        :param info_item: Vacancy with common vacancy info
+        :param content: vacancy page content
+        :return: dict with vacancy data or None
+        """
+        if self.page_cache is None:
+            return None
 
-        vacancy_data = {
-            'description': introduction + short_description + details + conclusion
-        }
+        record = self.page_cache.get_record(info_item['identifier'],
+                                            self._record_version)
+        if record and record[0] == self.page_cache.content_hash(content):
+            self.metrics.inc('cache_hits', cache='vacancy')
+            return record[1]
+        return None
 
-        return vacancy_data
+    def _cache_vacancy_data(self, info_item, content, vacancy_data):
+        """
+        Remember vacancy data parsed from page for the next runs
+        :param info_item: Vacancy with common vacancy info
+        :param content: vacancy page content
+        :param vacancy_data: dict with vacancy data
+        """
+        if self.page_cache is not None and content:
+            self.page_cache.set_record(info_item['identifier'],
+                                       self._record_version,
+                                       self.page_cache.content_hash(content),
+                                       vacancy_data)
 
-    def _save_to_xml(self, vacancy_list):
+    def _complete_vacancy(self, info_item, vacancy_data):
         """
-        Save parsed vacancies to xml file
-        :param vacancy_list: list of vacancies info
-        :return: str filepath
+        Add data parsed from vacancy page to common vacancy info
+        :param info_item: Vacancy with common vacancy info
+        :param vacancy_data: dict with vacancy data
+        :return: Vacancy
         """
-        root = etree.Element('vacancies')
-        for data in vacancy_list:
-            vacancy = etree.SubElement(root, 'position')
-            etree.SubElement(vacancy, 'link').text = data['url']
-            etree.SubElement(vacancy, 'identifier').text = data['identifier']
-            etree.SubElement(vacancy, 'title').text = data['title']
-            etree.SubElement(vacancy, 'start_date')
-            etree.SubElement(vacancy, 'kind')
-            etree.SubElement(vacancy, 'description').text = \
-                etree.CDATA(data['description'])
-            etree.SubElement(vacancy, 'top_location').text = data['location']
-            locations = etree.SubElement(vacancy, 'locations')
-            etree.SubElement(locations, 'location').text = data['location']
-            etree.SubElement(vacancy, 'images')
-            company = etree.SubElement(vacancy, 'company')
-            etree.SubElement(company, 'name').text = 'NORDSEE GmbH'
-            address = etree.SubElement(company, 'address')
-            etree.SubElement(address, 'street')
-            etree.SubElement(address, 'zip')
-            etree.SubElement(address, 'city').text = data['location']
-            etree.SubElement(vacancy, 'contact_email').text = \
-                'fallback@jobufo.com'
+        info_item.set_description(vacancy_data['description'],
+                                  compress=self.compress_descriptions)
+        return info_item
 
+    def _skip_vacancy(self, info_item):
+        """
+        Leave out vacancy which page can not be fetched, instead of
+        writing it with empty description
+        :param info_item: Vacancy with common vacancy info
+        """
+        logging.info('Vacancy {} skipped'.format(info_item['url']))
+        self.metrics.inc('skipped', kind='vacancy')
+        if self._delta_writer is not None:
+            self._delta_writer.keep(vacancy_key(info_item))
+
+    def _get_vacancy(self, info_item, content=None):
+        """
+        Get full vacancy info, reusing data parsed on previous run
+        when the vacancy page did not change
+        :param info_item: Vacancy with common vacancy info
+        :param content: already fetched vacancy page content
+        :return: Vacancy or None when the page can not be fetched
+        """
+        if content is None:
+            content = self._get_page_content(url=info_item['url'])
+        if content is None:
+            self._skip_vacancy(info_item)
+            return None
+
+        vacancy_data = self._get_cached_vacancy_data(info_item, content)
+        if vacancy_data is None:
+            vacancy_data = self._get_vacancy_data(info_item['url'],
+                                                  content=content)
+            self._cache_vacancy_data(info_item, content, vacancy_data)
+
+        return self._complete_vacancy(info_item, vacancy_data)
+
+    def _get_output_filepath(self, filename=None):
+        """
+        Path of the file to export vacancies to
+        :param filename: file name, by default OUTPUT_FILENAME
+        :return: str filepath
+        """
         current_dir = os.path.dirname(os.path.realpath(__file__))
         dir_to_export = os.path.join(current_dir, self.OUTPUT_DIR)
 
@@ -153,32 +460,206 @@ class NordseeParser:
         if not os.path.exists(dir_to_export):
             os.makedirs(dir_to_export)
 
-        filepath = os.path.join(dir_to_export, self.OUTPUT_FILENAME)
+        return os.path.join(dir_to_export, filename or self.OUTPUT_FILENAME)
+
+    def _save_to_xml(self, vacancy_list):
+        """
+        Save parsed vacancies to xml file
+        :param vacancy_list: list of Vacancy
+        :return: str filepath
+        """
+        with self.metrics.span('save_to_xml', vacancies=len(vacancy_list)):
+            root = etree.Element('vacancies')
+            for data in vacancy_list:
+                root.append(build_position(data))
 
-        tree = etree.ElementTree(root)
-        tree.write(filepath, pretty_print=True, xml_declaration=True,
-                   encoding='utf-8')
+            filepath = self._get_output_filepath()
+
+            tree = etree.ElementTree(root)
+            tree.write(filepath, pretty_print=True, xml_declaration=True,
+                       encoding='utf-8')
         return filepath
 
-    def run(self):
+    def _write_to_sink(self, vacancies, sink):
         """
-        Run parsing process
-        :return:
+        Write vacancies to sink as soon as each of them is parsed
+        :param vacancies: iterable of vacancies info
+        :param sink: XmlSink, JsonLinesSink, CallbackSink or alike
+        :return: sink
+        """
+        with self.metrics.span('write_to_sink',
+                               sink=sink.__class__.__name__), sink:
+            for data in vacancies:
+                sink.write(data)
+        logging.info('{} vacancies written'.format(sink.count))
+        return sink
+
+    def _stream_to_xml(self, vacancies):
+        """
+        Write vacancies to xml file as soon as each of them is parsed
+        :param vacancies: iterable of vacancies info
+        :return: str filepath
+        """
+        filepath = self._get_output_filepath()
+        self._write_to_sink(vacancies, XmlSink(filepath))
+        return filepath
+
+    def _write_delta(self, vacancies):
+        """
+        Pass vacancies through, writing the delta feed against the index
+        of the previous run. Delta and index are written only when all
+        vacancies passed
+        :param vacancies: iterable of Vacancy
+        :return: generator of Vacancy
+        """
+        index = VacancyIndex(self._get_output_filepath(self.INDEX_FILENAME))
+        self._delta_writer = DeltaXmlWriter(
+            self._get_output_filepath(self.DELTA_FILENAME), index)
+        try:
+            with self._delta_writer as delta:
+                for vacancy in vacancies:
+                    delta.write(vacancy)
+                    yield vacancy
+            logging.info('Delta: {} added, {} changed, {} removed'.format(
+                len(delta.added), len(delta.changed), len(delta.removed)))
+        finally:
+            self._delta_writer = None
+
+    def _iter_output(self):
+        """
+        Vacancies to write, passed through the delta writer when enabled
+        :return: iterator of Vacancy
         """
-        vacancy_list = []
-        pages_amount = self._get_pages_amount()
+        vacancies = self.iter_vacancies()
+        if self.delta:
+            vacancies = self._write_delta(vacancies)
+        return vacancies
 
-        for page in range(pages_amount):
-            vacancy_common_info = self._get_common_vacancy_info(page)
-            for info_item in vacancy_common_info:
-                vacancy_data = self._get_vacancy_data(info_item['url'])
-                vacancy_data.update(info_item)
-                vacancy_list.append(vacancy_data)
+    def iter_vacancies(self, queue_size=50, enrichers=()):
+        """
+        Lazily crawl vacancies. Fetching, parsing and consuming overlap,
+        so the first vacancy is available long before the crawl finishes.
+        Vacancies are yielded in the order of the vacancy list pages.
+        With journal, vacancies are yielded once all retry passes are done
+        :param queue_size: max amount of vacancies waiting between stages
+        :param enrichers: callables taking and returning vacancy info
+        :return: generator of Vacancy
+        """
+        if self.journal is not None:
+            return iter(CheckpointedCrawl(self, self.journal,
+                                          retries=self.retries,
+                                          enrichers=enrichers))
+        return iter(VacancyPipeline(self, queue_size=queue_size,
+                                    enrichers=enrichers))
+
+    def _collect_vacancies(self):
+        """
+        Fetch all vacancies
+        :return: list of Vacancy
+        """
+        return list(self.iter_vacancies())
 
-        self._save_to_xml(vacancy_list)
+    def run(self, stream=False, sink=None):
+        """
+        Run parsing process
+        :param stream: write every vacancy to file as soon as it is parsed
+        instead of keeping all of them in memory until the end
+        :param sink: sink to stream vacancies to instead of the xml file
+        :return:
+        """
+        with self.metrics.span('run'):
+            if sink is not None:
+                self._write_to_sink(self._iter_output(), sink)
+            elif stream:
+                self._stream_to_xml(self._iter_output())
+            else:
+                self._save_to_xml(list(self._iter_output()))
+        logging.info('Transport stats: {}'.format(
+            self.transport.stats.summary()))
+        logging.info('Metrics: {}'.format(self.metrics.write_snapshot()))
         return True
 
 
 if __name__ == "__main__":
-    parser = NordseeParser()
-    parser.run()
+    logging.basicConfig(filename='logs.log', level=logging.INFO)
+
+    arg_parser = argparse.ArgumentParser(description='Parse Nordsee vacancies')
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help='max amount of pages fetched at once')
+    arg_parser.add_argument('--rate-limit', type=float, default=None,
+                            help='max requests per second to the site')
+    arg_parser.add_argument('--adaptive-rate', action='store_true',
+                            help='adapt the rate to latency and 429/503 '
+                                 'responses, starting from --rate-limit')
+    arg_parser.add_argument('--cache-size', type=int, default=200,
+                            help='max size of the page cache in MB')
+    arg_parser.add_argument('--full-refresh', action='store_true',
+                            help='download and parse every page again')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='write vacancies to file while parsing')
+    arg_parser.add_argument('--extractor', choices=sorted(EXTRACTORS),
+                            default='pyquery', help='html extraction backend')
+    arg_parser.add_argument('--parse-workers', type=int, default=0,
+                            help='amount of processes to parse pages in')
+    arg_parser.add_argument('--jsonl', metavar='PATH',
+                            help='stream vacancies to json lines file')
+    arg_parser.add_argument('--format', choices=sorted(SINKS),
+                            help='stream vacancies to nordsee.<extension> '
+                                 'in this format instead of nordsee.xml')
+    arg_parser.add_argument('--compress-descriptions', action='store_true',
+                            help='keep descriptions compressed in memory')
+    arg_parser.add_argument('--metrics-jsonl', metavar='PATH',
+                            help='append timing spans and counters to '
+                                 'json lines file')
+    arg_parser.add_argument('--metrics-port', type=int, default=None,
+                            help='serve Prometheus metrics on this port')
+    arg_parser.add_argument('--delta', action='store_true',
+                            help='also write vacancies added, changed and '
+                                 'removed since the previous run')
+    arg_parser.add_argument('--journal', metavar='PATH',
+                            help='record progress in sqlite journal to '
+                                 'resume stopped crawl and retry failed pages')
+    arg_parser.add_argument('--retries', type=int, default=2,
+                            help='passes retrying failed pages with journal')
+    arg_parser.add_argument('--fake-useragent', action='store_true',
+                            help='pick user agent from the fake_useragent '
+                                 'database instead of the bundled list')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='write a profile report and collapsed '
+                                 'stacks of the run to --profile-dir')
+    arg_parser.add_argument('--profile-dir', default='profiles',
+                            help='directory for profile files')
+    args = arg_parser.parse_args()
+
+    cache_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             NordseeParser.CACHE_DIR)
+    page_cache = PageCache(cache_dir, max_size=args.cache_size * 1024 * 1024,
+                           refresh=args.full_refresh)
+    exporter = (JsonLinesExporter(args.metrics_jsonl)
+                if args.metrics_jsonl else None)
+    metrics = Metrics(exporter)
+    parser = NordseeParser(max_workers=args.workers,
+                           rate_limit=args.rate_limit,
+                           adaptive_rate=args.adaptive_rate,
+                           page_cache=page_cache,
+                           extractor=args.extractor,
+                           parse_workers=args.parse_workers,
+                           metrics=metrics,
+                           compress_descriptions=args.compress_descriptions,
+                           journal=(CrawlJournal(args.journal)
+                                    if args.journal else None),
+                           retries=args.retries,
+                           delta=args.delta,
+                           fake_useragent=args.fake_useragent)
+    sink = JsonLinesSink(args.jsonl) if args.jsonl else None
+    if args.format is not None:
+        sink = create_sink(args.format, parser._get_output_filepath(
+            'nordsee.{}'.format(sink_extension(args.format))))
+    if args.metrics_port is not None:
+        MetricsServer(metrics, host='0.0.0.0', port=args.metrics_port).start()
+    try:
+        with Profiler(args.profile_dir, 'vacancy_parser', metrics=metrics,
+                      enabled=args.profile):
+            parser.run(stream=args.stream, sink=sink)
+    finally:
+        metrics.close()
@@ -0,0 +1,94 @@
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class WaitTimeout(Exception):
+    """
+    Condition of an application step was not met in time
+    """
+
+    def __init__(self, step, condition, timeout):
+        """
+        :param step: name of the step
+        :param condition: description of the awaited condition
+        :param timeout: seconds waited
+        """
+        self.step = step
+        self.condition = condition
+        self.timeout = timeout
+        super().__init__('{}: {} not met within {}s'.format(
+            step, condition, timeout))
+
+    def to_dict(self):
+        return {'step': self.step, 'condition': self.condition,
+                'timeout': self.timeout}
+
+
+class StepTimings:
+    """
+    Time spent by every step, split into waiting for the page and working
+    """
+
+    def __init__(self):
+        self.steps = OrderedDict()
+        self._current = None
+
+    @contextmanager
+    def step(self, name):
+        """
+        Measure step
+        :param name: name of the step
+        """
+        timing = self.steps.setdefault(name, {'wait': 0.0, 'work': 0.0})
+        previous, self._current = self._current, timing
+        started = time.perf_counter()
+        wait_before = timing['wait']
+        try:
+            yield timing
+        finally:
+            elapsed = time.perf_counter() - started
+            timing['work'] += elapsed - (timing['wait'] - wait_before)
+            self._current = previous
+
+    def add_wait(self, seconds):
+        """
+        Count seconds as waiting of the current step
+        :param seconds: float
+        """
+        if self._current is not None:
+            self._current['wait'] += seconds
+
+    def as_dict(self):
+        return OrderedDict((name, dict(timing))
+                           for name, timing in self.steps.items())
+
+
+def wait_for(driver, condition, step, description, timeout, poll_interval,
+             timings=None):
+    """
+    Explicitly wait for condition with WebDriverWait
+    :param driver: selenium WebDriver
+    :param condition: callable taking driver, returning truthy value when met,
+    e.g. one of selenium expected_conditions
+    :param step: name of the step for the timeout error
+    :param description: description of the condition for the timeout error
+    :param timeout: max seconds to wait
+    :param poll_interval: seconds between condition checks
+    :param timings: StepTimings to count waiting time in
+    :return: value returned by the condition
+    """
+    # selenium is loaded with the browser, not with the module
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    started = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout,
+                             poll_frequency=poll_interval).until(condition)
+    except TimeoutException:
+        raise WaitTimeout(step, description, timeout)
+    finally:
+        if timings is not None:
+            timings.add_wait(time.perf_counter() - started)
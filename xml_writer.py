@@ -0,0 +1,135 @@
+import os
+
+from lxml import etree
+
+from compression import open_output
+
+
+def build_position(data, compact=False):
+    """
+    Build <position> element for vacancy
+    :param data: Vacancy or dict with vacancy info
+    :param compact: leave out elements without content
+    :return: etree.Element
+    """
+    if compact:
+        return build_compact_position(data)
+
+    vacancy = etree.Element('position')
+    etree.SubElement(vacancy, 'link').text = data['url']
+    etree.SubElement(vacancy, 'identifier').text = data['identifier']
+    etree.SubElement(vacancy, 'title').text = data['title']
+    etree.SubElement(vacancy, 'start_date')
+    etree.SubElement(vacancy, 'kind')
+    etree.SubElement(vacancy, 'description').text = \
+        etree.CDATA(data['description'])
+    etree.SubElement(vacancy, 'top_location').text = data['location']
+    locations = etree.SubElement(vacancy, 'locations')
+    etree.SubElement(locations, 'location').text = data['location']
+    etree.SubElement(vacancy, 'images')
+    company = etree.SubElement(vacancy, 'company')
+    etree.SubElement(company, 'name').text = 'NORDSEE GmbH'
+    address = etree.SubElement(company, 'address')
+    etree.SubElement(address, 'street')
+    etree.SubElement(address, 'zip')
+    etree.SubElement(address, 'city').text = data['location']
+    etree.SubElement(vacancy, 'contact_email').text = \
+        'fallback@jobufo.com'
+    return vacancy
+
+
+def build_compact_position(data):
+    """
+    Build <position> element with the layout of build_position, leaving
+    out elements without content (start_date, kind, images, street, zip)
+    :param data: Vacancy or dict with vacancy info
+    :return: etree.Element
+    """
+    vacancy = etree.Element('position')
+
+    def add(parent, tag, text):
+        if text:
+            etree.SubElement(parent, tag).text = text
+
+    add(vacancy, 'link', data['url'])
+    add(vacancy, 'identifier', data['identifier'])
+    add(vacancy, 'title', data['title'])
+    if data['description']:
+        etree.SubElement(vacancy, 'description').text = \
+            etree.CDATA(data['description'])
+    location = data['location']
+    add(vacancy, 'top_location', location)
+    if location:
+        locations = etree.SubElement(vacancy, 'locations')
+        etree.SubElement(locations, 'location').text = location
+    company = etree.SubElement(vacancy, 'company')
+    etree.SubElement(company, 'name').text = 'NORDSEE GmbH'
+    if location:
+        address = etree.SubElement(company, 'address')
+        etree.SubElement(address, 'city').text = location
+    etree.SubElement(vacancy, 'contact_email').text = \
+        'fallback@jobufo.com'
+    return vacancy
+
+
+class StreamingXmlWriter:
+    """
+    Write <position> elements to file one by one as they are parsed.
+    The output is written to a temporary file which replaces `filepath`
+    only when writing finished without errors, so a crashed crawl keeps
+    the previous file and leaves the partial one next to it
+    """
+
+    TMP_SUFFIX = '.part'
+
+    def __init__(self, filepath, pretty_print=True, compact=False,
+                 compression=None):
+        """
+        Init writer
+        :param filepath: final file path
+        :param pretty_print: indent position elements
+        :param compact: leave out elements without content
+        :param compression: None, 'gzip' or 'zstd' to compress the file
+        while it is written
+        """
+        self.filepath = filepath
+        self.tmp_filepath = filepath + self.TMP_SUFFIX
+        self.pretty_print = pretty_print
+        self.compact = compact
+        self.compression = compression
+        self.count = 0
+
+    def __enter__(self):
+        self._file = open_output(self.tmp_filepath, self.compression)
+        self._xmlfile = etree.xmlfile(self._file, encoding='utf-8')
+        self._xf = self._xmlfile.__enter__()
+        self._xf.write_declaration()
+        self._root = self._xf.element('vacancies')
+        self._root.__enter__()
+        if self.pretty_print:
+            self._xf.write('\n')
+        return self
+
+    def write(self, data):
+        """
+        Write vacancy and flush it to disk, compressed output is flushed
+        only at the end to keep its ratio
+        :param data: Vacancy or dict with vacancy info
+        """
+        self._xf.write(build_position(data, compact=self.compact),
+                       pretty_print=self.pretty_print)
+        if self.compression is None:
+            self._xf.flush()
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self._root.__exit__(None, None, None)
+            self._xmlfile.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._file.close()
+
+        if exc_type is None:
+            os.replace(self.tmp_filepath, self.filepath)
+        return False